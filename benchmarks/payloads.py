@@ -0,0 +1,65 @@
+"""
+FlightXML responses for the stub server: the recorded sample responses in benchmarks/fixtures, scaled up to any payload
+size, and paging over them the way FlightXML pages with howMany/offset.
+
+Every fixture file is named after its method and holds the value of "<Method>Result".
+"""
+import glob
+import itertools
+import json
+import os
+import string
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """
+    Return a dict of FlightXML method name => recorded result, ready to be passed to StubServer.
+    """
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path) as f:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+    return fixtures
+
+
+def records_of(result, key="data"):
+    return result[key] if isinstance(result, dict) else result
+
+
+def scale_schedules(flights, count, day=86400):
+    """
+    count ScheduledFlightStruct records repeating the recorded flights under new idents, one copy per day.
+    """
+    output = []
+    for copy in range(count // len(flights) + 1):
+        for flight in flights:
+            if len(output) == count:
+                return output
+            flight = dict(flight)
+            flight["ident"] = "{}{}".format(flight["ident"][:3], (int(flight["ident"][3:]) + copy) % 10000)
+            flight["departuretime"] += copy * day
+            flight["arrivaltime"] += copy * day
+            output.append(flight)
+    return output
+
+
+def scale_airports(count):
+    """
+    count distinct four letter airport codes, the size of an AllAirports response.
+    """
+    codes = ("".join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=4))
+    return list(itertools.islice(codes, count))
+
+
+def paged(records, key="data"):
+    """
+    Result callable for StubServer answering howMany/offset requests with a page of records and its next_offset.
+    """
+    def page(params):
+        how_many = int(params.get("howMany", 15))
+        offset = int(params.get("offset", 0))
+        end = offset + how_many
+        return {key: records[offset:end], "next_offset": end if end < len(records) else -1}
+    return page
@@ -0,0 +1,105 @@
+"""
+Minimal local stand-in for the FlightXML2 JSON endpoint used by the benchmarks.
+
+Every POST to /json/FlightXML2/<Method> is answered with {"<Method>Result": ...}. The server speaks HTTP/1.1 so clients
+that keep connections alive can reuse them.
+"""
+import gzip
+import json
+import threading
+import time
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:     # Python 2
+    from urlparse import parse_qsl
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:     # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+DEFAULT_RESULT = {"data": {"manufacturer": "IAI", "type": "Gulfstream G200", "description": "twin-jet"}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        params = dict(parse_qsl(self.rfile.read(length).decode("utf-8"))) if length else {}
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        latency = self.server.latency(method, params) if callable(self.server.latency) else self.server.latency
+        if latency:
+            time.sleep(latency)
+        result = self.server.results.get(method, DEFAULT_RESULT)
+        if callable(result):
+            result = result(params)
+        body = json.dumps({"{}Result".format(method): result}).encode("utf-8")
+        self.send_response(200)
+        if self.server.compress and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body, 1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietThreadingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops connections opened by concurrent clients, which then wait for a SYN retransmit
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients hanging up early (cancelled or hedged requests) are expected
+        pass
+
+
+class StubServer(object):
+    """
+    Runs a StubHandler server on a background thread.
+
+        with StubServer() as server:
+            client = Client("user", "key", base_url=server.base_url)
+
+    results     optional mapping of FlightXML method name to the value returned as its "<Method>Result", or to a
+                callable taking the dict of posted form parameters and returning that value, see benchmarks.payloads
+    latency     seconds every response is delayed, or a callable taking the method name and the form parameters and
+                returning the delay
+    compress    gzip responses to clients accepting it
+    """
+    def __init__(self, results=None, host="127.0.0.1", port=0, latency=0.0, compress=False):
+        self.httpd = QuietThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.results = results or {}
+        self.httpd.latency = latency
+        self.httpd.compress = compress
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{}:{}/json/FlightXML2/".format(host, port)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
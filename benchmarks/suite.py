@@ -0,0 +1,247 @@
+"""
+Offline benchmark suite, runs Client against a local stub server serving the recorded fixtures.
+
+    python -m benchmarks.suite [--quick] [--latency SECONDS] [--output results.json] [--compare baseline.json]
+
+Measures call throughput and latency under concurrency, the cost of pagination, decode time of large AllAirports and
+AirlineFlightSchedules payloads in every result mode, and memory per decoded record. Every result is one
+{"benchmark", "params", "value", "unit", "higher_is_better"} entry, --output writes them as JSON and --compare exits
+non-zero when a value is more than --tolerance worse than in a baseline written earlier.
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.payloads import load_fixtures, paged, records_of, scale_airports, scale_schedules
+from benchmarks.stub_server import StubServer
+from flightaware.async_client import AsyncClient, aiohttp
+from flightaware.client import STREAM_CHUNK_SIZE, Client, ResultMode, unwrap_result
+from flightaware.decoding import ArrayStreamParser, loads, orjson
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+START = datetime.datetime(2014, 5, 13)
+
+
+def result(benchmark, params, value, unit, higher_is_better=True, **extra):
+    entry = {"benchmark": benchmark, "params": params, "value": value, "unit": unit, "higher_is_better": higher_is_better}
+    entry.update(extra)
+    return entry
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return dict(("p{}".format(p), ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))] * 1000) for p in (50, 95, 99))
+
+
+def bench_concurrency(base_url, calls, concurrency):
+    def call(_):
+        start = time.perf_counter()
+        client.airport_info("KBNA")
+        return time.perf_counter() - start
+
+    with Client("user", "key", base_url=base_url, pool_maxsize=concurrency, coalesce=False) as client:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            latencies = list(executor.map(call, range(calls)))
+            elapsed = time.perf_counter() - start
+    return result("client_throughput", {"concurrency": concurrency, "calls": calls}, calls / elapsed, "calls/s",
+                  latency_ms=percentiles(latencies))
+
+
+def bench_async_concurrency(base_url, calls, concurrency):
+    async def run():
+        async with AsyncClient("user", "key", base_url=base_url, max_in_flight=concurrency, coalesce=False) as client:
+            async def call():
+                start = time.perf_counter()
+                await client.airport_info("KBNA")
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*[call() for _ in range(calls)])
+            return latencies, time.perf_counter() - start
+
+    latencies, elapsed = asyncio.run(run())
+    return result("async_client_throughput", {"concurrency": concurrency, "calls": calls}, calls / elapsed, "calls/s",
+                  latency_ms=percentiles(latencies))
+
+
+def bench_pagination(base_url, total, page_size, prefetch):
+    with Client("user", "key", base_url=base_url) as client:
+        start = time.perf_counter()
+        pages = client.iter_airline_flight_schedules(START, START + datetime.timedelta(days=1), page_size=page_size, prefetch=prefetch)
+        count = sum(1 for _ in pages)
+        elapsed = time.perf_counter() - start
+    assert count == total, count
+    return result("pagination", {"records": total, "page_size": page_size, "prefetch": prefetch}, total / elapsed,
+                  "records/s", pages=-(-total // page_size))
+
+
+def bench_decode(method, body, result_mode, repeat):
+    """
+    Time parsing and decoding one response body the way Client does after the transfer.
+    """
+    client = Client("user", "key", result_mode=result_mode)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client._decode(method, unwrap_result(method, loads(body)))
+        timings.append(time.perf_counter() - start)
+    client.close()
+    return min(timings)
+
+
+def measure_memory(method, body, result_mode):
+    """
+    Bytes held by one decoded response, measured with tracemalloc.
+    """
+    client = Client("user", "key", result_mode=result_mode)
+    gc.collect()
+    tracemalloc.start()
+    decoded = client._decode(method, unwrap_result(method, loads(body)))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+    client.close()
+    return size
+
+
+def stream_body(method, body):
+    parser = ArrayStreamParser(["{}Result".format(method), "data"])
+    count = 0
+    for start in range(0, len(body), STREAM_CHUNK_SIZE):
+        count += len(parser.feed(body[start:start + STREAM_CHUNK_SIZE]))
+    return count + len(parser.close())
+
+
+def peak_memory(function):
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def decode_benchmarks(fixtures, airports, schedules, repeat):
+    payloads = (
+        ("AllAirports", {"data": scale_airports(airports)}, airports),
+        ("AirlineFlightSchedules", {"next_offset": -1, "data": scale_schedules(records_of(fixtures["AirlineFlightSchedules"]), schedules)}, schedules),
+    )
+    results = []
+    for method, value, count in payloads:
+        body = json.dumps({"{}Result".format(method): value}).encode("utf-8")
+        modes = [ResultMode.DICT] if method == "AllAirports" else [ResultMode.DICT, ResultMode.RECORDS, ResultMode.COLUMNS]
+        for mode in modes:
+            params = {"method": method, "records": count, "result_mode": mode, "bytes": len(body)}
+            seconds = bench_decode(method, body, mode, repeat)
+            results.append(result("decode", params, seconds * 1000, "ms", higher_is_better=False,
+                                  records_per_second=count / seconds))
+            results.append(result("memory_per_record", params, measure_memory(method, body, mode) / float(count), "bytes",
+                                  higher_is_better=False))
+        params = {"method": method, "records": count, "bytes": len(body)}
+        start = time.perf_counter()
+        stream_body(method, body)
+        seconds = time.perf_counter() - start
+        results.append(result("stream_decode", params, seconds * 1000, "ms", higher_is_better=False,
+                              records_per_second=count / seconds))
+        for mode, function in (("full", lambda: loads(body)), ("stream", lambda: stream_body(method, body))):
+            results.append(result("peak_decode_memory", dict(params, mode=mode), peak_memory(function) / 1024.0, "KiB",
+                                  higher_is_better=False))
+    return results
+
+
+def run(quick=False, latency=0.002):
+    fixtures = load_fixtures()
+    calls = 200 if quick else 2000
+    total = 1000 if quick else 10000
+    flights = scale_schedules(records_of(fixtures["AirlineFlightSchedules"]), total)
+    fixtures["AirlineFlightSchedules"] = paged(flights)
+    fixtures["SetMaximumResultSize"] = {}
+
+    results = []
+    with StubServer(fixtures, latency=latency) as server:
+        for concurrency in (1, 8, 32):
+            results.append(bench_concurrency(server.base_url, calls, concurrency))
+        if aiohttp is not None:
+            for concurrency in (8, 32, 100):
+                results.append(bench_async_concurrency(server.base_url, calls, concurrency))
+        for page_size in (15, 100, 1000):
+            for prefetch in (False, True):
+                results.append(bench_pagination(server.base_url, total, page_size, prefetch))
+    results.extend(decode_benchmarks(load_fixtures(), 5000 if quick else 50000, 2000 if quick else 20000, 3 if quick else 5))
+    return {
+        "meta": {
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": numpy.__version__ if numpy is not None else None,
+            "orjson": orjson.__version__ if orjson is not None else None,
+            "quick": quick,
+            "latency": latency,
+        },
+        "results": results,
+    }
+
+
+def _key(entry):
+    return entry["benchmark"], json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    Return the current results that are more than tolerance (a fraction) worse than the matching baseline results.
+    """
+    previous = dict((_key(entry), entry) for entry in baseline["results"])
+    regressions = []
+    for entry in current["results"]:
+        old = previous.get(_key(entry))
+        if old is None or not old["value"]:
+            continue
+        change = (entry["value"] - old["value"]) / float(old["value"])
+        if (change < -tolerance) if entry["higher_is_better"] else (change > tolerance):
+            regressions.append(dict(entry, baseline=old["value"], change=change))
+    return regressions
+
+
+def describe(entry):
+    params = " ".join("{}={}".format(name, value) for name, value in sorted(entry["params"].items()))
+    return "{:<24} {:>12.1f} {:<9} {}".format(entry["benchmark"], entry["value"], entry["unit"], params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller payloads and fewer calls")
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds the stub server delays every response")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON written by an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed fraction a value may be worse than the baseline")
+    args = parser.parse_args(argv)
+
+    report = run(quick=args.quick, latency=args.latency)
+    for entry in report["results"]:
+        print(describe(entry))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for entry in regressions:
+            print("REGRESSION {} ({:+.0%} against {:.1f})".format(describe(entry), entry["change"], entry["baseline"]))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+Compares calls per second of one-shot requests.post calls (a new connection per call) against the pooled keep-alive
+session owned by Client, both talking to a local stub server.
+
+    python -m benchmarks.transport_benchmark [calls]
+"""
+import os
+import sys
+import time
+
+import requests
+
+from benchmarks.stub_server import StubServer
+from flightaware.client import Client
+
+
+def bench_unpooled(base_url, calls):
+    client = Client("user", "key", base_url=base_url)
+    url = os.path.join(base_url, "AircraftType")
+    start = time.time()
+    for _ in range(calls):
+        requests.post(url=url, data={"type": "GALX"}, auth=client.auth, headers=client.headers).json()
+    elapsed = time.time() - start
+    client.close()
+    return calls / elapsed
+
+
+def bench_pooled(base_url, calls):
+    with Client("user", "key", base_url=base_url) as client:
+        start = time.time()
+        for _ in range(calls):
+            client.aircraft_type("GALX")
+        elapsed = time.time() - start
+    return calls / elapsed
+
+
+def main(calls=500):
+    with StubServer() as server:
+        unpooled = bench_unpooled(server.base_url, calls)
+        pooled = bench_pooled(server.base_url, calls)
+    print("requests.post  {:8.1f} calls/s".format(unpooled))
+    print("pooled Client  {:8.1f} calls/s".format(pooled))
+    print("speedup        {:8.2f}x".format(pooled / unpooled))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,215 @@
+"""
+Receiver for FlightXML push alerts.
+
+FlightAware POSTs a JSON document to the endpoint registered with Client.register_alert_endpoint every time an alert
+set with Client.set_alert triggers. AlertReceiver is an asyncio HTTP server accepting those callbacks: each body is
+validated, decoded into an Alert and put on a bounded queue, from which worker tasks dispatch it to the registered
+handlers. When the handlers fall behind and the queue stays full for put_timeout seconds, callbacks are answered with
+503 so FlightAware delivers them again later instead of the receiver buffering without bound.
+
+    async def on_arrival(alert):
+        print(alert.flight["ident"], "arrived")
+
+    async with AlertReceiver(token="s3cret") as receiver:
+        receiver.add_handler(on_arrival, eventcode="arrival")
+        await receiver.start(port=8080)
+        client.register_alert_endpoint("https://example.com:8080/flightaware/alerts?token=s3cret")
+        await receiver.wait_closed()
+
+Requires the aiohttp package.
+"""
+import asyncio
+import collections
+import hmac
+import inspect
+import logging
+
+try:
+    from aiohttp import web
+except ImportError:     # optional dependency, only needed by AlertReceiver
+    web = None
+
+from flightaware.decoding import loads
+from flightaware.pagination import FlightAwareError
+from flightaware.records import record_type
+
+logger = logging.getLogger("flightaware.alerts")
+
+DEFAULT_PATH = "/flightaware/alerts"
+MAX_BODY_SIZE = 256 * 1024
+
+Alert = record_type("Alert", [
+    "alert_id", "eventcode", "summary", "short_desc", "long_desc", "flight",
+], "One pushed alert, flight is the FlightInfoEx style dict of the flight.")
+
+
+class InvalidAlert(FlightAwareError):
+    """
+    Raised by decode_alert for a body that is not a FlightXML alert.
+    """
+
+
+def decode_alert(body):
+    """
+    Validate and decode one alert callback body.
+    """
+    try:
+        data = loads(body)
+    except ValueError as e:
+        raise InvalidAlert("body is not JSON: {}".format(e))
+    if not isinstance(data, dict):
+        raise InvalidAlert("body is not a JSON object")
+    if not isinstance(data.get("eventcode"), str):
+        raise InvalidAlert("missing eventcode")
+    if not isinstance(data.get("flight"), dict):
+        raise InvalidAlert("missing flight")
+    try:
+        data["alert_id"] = int(data.get("alert_id"))
+    except (TypeError, ValueError):
+        raise InvalidAlert("missing alert_id")
+    return Alert.from_dict(data)
+
+
+class AlertReceiver(object):
+    """
+    path            URL path accepting callbacks
+    token           optional shared secret, callbacks must then carry it as the "token" query parameter of the address
+                    registered with RegisterAlertEndpoint
+    queue_size      alerts buffered between the HTTP server and the handlers
+    workers         handler tasks draining the queue, alerts of different flights may be handled out of order
+    put_timeout     seconds a callback waits for room in a full queue before it is answered with 503
+    drain_timeout   seconds stop() waits for the queued alerts to be dispatched before it cancels the workers
+    """
+    def __init__(self, path=DEFAULT_PATH, token=None, queue_size=10000, workers=4, put_timeout=1.0,
+                 max_body_size=MAX_BODY_SIZE, drain_timeout=30.0):
+        if web is None:
+            raise ImportError("AlertReceiver requires the aiohttp package")
+        self.path = path
+        self.token = token
+        self.queue_size = queue_size
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.drain_timeout = drain_timeout
+        self.max_body_size = max_body_size
+        self.received = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.dispatched = 0
+        self.handler_errors = 0
+        self._handlers = collections.defaultdict(list)     # eventcode (None for every event) => handlers
+        self._queue = None
+        self._tasks = []
+        self._runner = None
+        self._closed = None
+
+    def add_handler(self, handler, eventcode=None):
+        """
+        Call handler(alert) for every alert, or only for alerts of eventcode ("filed", "departure", "arrival",
+        "diverted", "cancelled", ...). Coroutine functions are awaited, plain functions must not block.
+        """
+        self._handlers[eventcode].append(handler)
+
+    def remove_handler(self, handler, eventcode=None):
+        self._handlers[eventcode].remove(handler)
+
+    def application(self):
+        """
+        The aiohttp application serving the callbacks, to mount into an existing aiohttp server.
+        """
+        app = web.Application(client_max_size=self.max_body_size)
+        app.router.add_post(self.path, self.handle)
+        app.on_startup.append(lambda app: self._start_workers())
+        app.on_cleanup.append(lambda app: self._stop_workers())
+        return app
+
+    async def start(self, host="0.0.0.0", port=8080):
+        self._runner = web.AppRunner(self.application(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        logger.info("receiving alerts on %s:%s%s", host, port, self.path)
+        return site
+
+    async def stop(self):
+        """
+        Stop accepting callbacks, dispatch the alerts already queued and stop the workers. Alerts still queued after
+        drain_timeout seconds, behind a stuck handler for instance, are dropped.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def wait_closed(self):
+        if self._closed is not None:
+            await self._closed.wait()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def _start_workers(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._closed = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def _stop_workers(self):
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("alert handlers did not finish within %ss, dropping %s queued alerts", self.drain_timeout,
+                           self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._closed.set()
+
+    async def handle(self, request):
+        if self.token is not None and not hmac.compare_digest(request.query.get("token", ""), self.token):
+            self.rejected += 1
+            return web.Response(status=403)
+        try:
+            alert = decode_alert(await request.read())
+        except InvalidAlert as e:
+            self.rejected += 1
+            logger.warning("rejected alert callback: %s", e)
+            return web.Response(status=400, text=str(e))
+        try:
+            await asyncio.wait_for(self._queue.put(alert), self.put_timeout)
+        except asyncio.TimeoutError:
+            # backpressure: FlightAware retries failed deliveries, a deferred alert is received when it is accepted
+            self.deferred += 1
+            return web.Response(status=503, headers={"Retry-After": "30"})
+        self.received += 1
+        return web.Response(text="OK")
+
+    async def _work(self):
+        while True:
+            alert = await self._queue.get()
+            try:
+                await self.dispatch(alert)
+            finally:
+                self._queue.task_done()
+
+    async def dispatch(self, alert):
+        for handler in self._handlers.get(None, []) + self._handlers.get(alert.eventcode, []):
+            try:
+                result = handler(alert)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                self.handler_errors += 1
+                logger.exception("alert handler %r failed for alert %s", handler, alert.alert_id)
+        self.dispatched += 1
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "deferred": self.deferred,
+            "dispatched": self.dispatched,
+            "handler_errors": self.handler_errors,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
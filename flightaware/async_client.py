@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+except ImportError:     # optional dependency, only needed by AsyncClient
+    aiohttp = None
+
+from flightaware.cache import MISSING, cache_key
+from flightaware.client import (Client, ResultMode, BASE_URL, DEFAULT_POOL_CONNECTIONS, DEFAULT_STREAM_THRESHOLD,
+                                DEFAULT_TIMEOUT, STREAM_CHUNK_SIZE, transferred_bytes, unwrap_result)
+from flightaware.coalesce import AsyncSingleFlight
+from flightaware.decoding import ArrayStreamParser, array_items, loads
+from flightaware.pagination import FlightAwareError, aiter_pages
+from flightaware.resilience import WRITE_METHODS
+from flightaware.scheduler import is_throttled
+
+logger = logging.getLogger("flightaware.async_client")
+
+DEFAULT_MAX_IN_FLIGHT = 100
+
+
+async def _on_connection_create_start(session, context, params):
+    context.trace_request_ctx["connect_start"] = time.perf_counter()
+
+
+async def _on_connection_create_end(session, context, params):
+    timings = context.trace_request_ctx
+    timings["connect"] = time.perf_counter() - timings["connect_start"]
+
+
+def _authorization(username, password):
+    # newer aiohttp deprecates BasicAuth and the auth argument of ClientSession in favour of a plain header
+    if hasattr(aiohttp, "encode_basic_auth"):
+        return aiohttp.encode_basic_auth(username, password)
+    return aiohttp.BasicAuth(username, password).encode()
+
+
+def _trace_config():
+    # times opening new connections, pooled connections are reused without any connect phase
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(_on_connection_create_start)
+    trace.on_connection_create_end.append(_on_connection_create_end)
+    return trace
+
+
+class AsyncClient(Client):
+    """
+    asyncio flavour of Client built on aiohttp.
+
+    Every FlightXML method of Client is available with the same arguments but returns a coroutine:
+
+        async with AsyncClient(username, api_key) as client:
+            infos = await asyncio.gather(*[client.airport_info(code) for code in codes])
+
+    All calls share one aiohttp connection pool. At most max_in_flight requests are outstanding at any time, further
+    calls wait for a slot.
+
+    max_in_flight       maximum number of concurrent requests
+    pool_maxsize        maximum number of open connections per host
+    pool_connections    maximum number of open connections in total
+    """
+    def __init__(self, username, api_key, base_url=BASE_URL, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_MAX_IN_FLIGHT, timeout=DEFAULT_TIMEOUT,
+                 cache=None, cache_ttls=None, result_mode=ResultMode.DICT, coalesce=True, scheduler=None, policy=None,
+                 instrumentation=None, transport=None, stream_threshold=DEFAULT_STREAM_THRESHOLD):
+        if aiohttp is None:
+            raise ImportError("AsyncClient requires the aiohttp package")
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+        super(AsyncClient, self).__init__(username, api_key, base_url=base_url, pool_connections=pool_connections,
+                                          pool_maxsize=pool_maxsize, timeout=timeout, cache=cache, cache_ttls=cache_ttls,
+                                          result_mode=result_mode, coalesce=coalesce, scheduler=scheduler, policy=policy,
+                                          instrumentation=instrumentation, transport=transport,
+                                          stream_threshold=stream_threshold)
+
+    def _create_session(self):
+        # aiohttp sessions must be created inside a running event loop, see _get_session
+        return None
+
+    def _create_coalescer(self):
+        return AsyncSingleFlight()
+
+    def _get_session(self):
+        if self.session is None:
+            if isinstance(self.timeout, (tuple, list)):
+                connect, read = self.timeout
+            else:
+                connect = read = self.timeout
+            connector = aiohttp.TCPConnector(limit=max(self.pool_connections, self.pool_maxsize), limit_per_host=self.pool_maxsize)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=dict(self.headers, Authorization=_authorization(self.auth.username, self.auth.password)),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+                trace_configs=[_trace_config()] if self.instrumentation is not None else None,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self.session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("use 'async with' with AsyncClient")
+
+    async def close(self):
+        """
+        Close the shared connection pool.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def lat_lng_to_distance(self, lat1, lon1, lat2, lon2):
+        return super(AsyncClient, self).lat_lng_to_distance(lat1, lon1, lat2, lon2)
+
+    async def lat_lng_to_heading(self, lat1, lon1, lat2, lon2):
+        return super(AsyncClient, self).lat_lng_to_heading(lat1, lon1, lat2, lon2)
+
+    async def _paginate(self, call, page_size=None, key=None, offset=0, prefetch=True):
+        """
+        The iter_* methods of AsyncClient return async generators, use them with "async for".
+        """
+        page_size = await self.ensure_result_size(page_size)
+        async for record in aiter_pages(call, page_size, key=key, offset=offset, prefetch=prefetch):
+            yield record
+
+    async def ensure_result_size(self, page_size=None):
+        page_size = page_size or self.max_result_size
+        if page_size > self.max_result_size:
+            await self.set_maximum_result_sizes(page_size)
+        return page_size
+
+    async def _request(self, method, data=None, transform=None):
+        key, final = self._cache_lookup(method, data)
+        if final is MISSING:
+            if self.coalescer is None or method in WRITE_METHODS:
+                final = await self._fetch(method, data)
+            else:
+                leader = []
+                final = await self.coalescer.do(key or cache_key(method, data), lambda: leader.append(True) or self._fetch(method, data))
+                self._count_coalesced(method, leader)
+            self._cache_store(key, method, final)
+        return self._decode(method, final, transform)
+
+    async def _fetch(self, method, data=None):
+        if self.transport is None:
+            return await self._transmit(method, data)
+        return await self.transport.call_async(method, data, lambda: self._transmit(method, data))
+
+    async def _transmit(self, method, data=None):
+        if self.policy is None:
+            return await self._send(method, data)
+        return await self.policy.call_async(method, lambda: self._send(method, data))
+
+    async def _send(self, method, data=None):
+        url = os.path.join(self.base_url, method)
+        logger.debug("POST\n%s\n%s\n", url, data)
+
+        # requests silently drops None form values, aiohttp does not
+        form = None
+        if data is not None:
+            form = dict((name, str(value)) for name, value in data.items() if value is not None)
+
+        session = self._get_session()
+        if self.scheduler is not None:
+            await self.scheduler.acquire_async(method)
+        timings = {}
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, data=form, trace_request_ctx=timings) as r:
+                    received = time.perf_counter()
+                    if self.scheduler is not None and is_throttled(r.status):
+                        self.scheduler.report(method, True)
+                        r.raise_for_status()
+                    body = await r.read()
+                    read = time.perf_counter()
+                    result = loads(body)
+            except Exception as e:
+                if self.instrumentation is not None:
+                    self.instrumentation.error(method, e)
+                raise
+        final = unwrap_result(method, result)
+        if self.instrumentation is not None:
+            connect = timings.get("connect")
+            self.instrumentation.request(method, connect, received - start - (connect or 0.0), read - received,
+                                         time.perf_counter() - read, len(urlencode(form or {})),
+                                         transferred_bytes(r.headers.get("Content-Length"), len(body)), r.status, final)
+        if self.scheduler is not None:
+            self.scheduler.report(method, is_throttled(r.status, final))
+        return final
+
+    async def _stream(self, method, data=None, key="data"):
+        """
+        The stream_* methods of AsyncClient return async generators, use them with "async for".
+        """
+        url = os.path.join(self.base_url, method)
+        logger.debug("POST (streamed)\n%s\n%s\n", url, data)
+        form = None
+        if data is not None:
+            form = dict((name, str(value)) for name, value in data.items() if value is not None)
+
+        session = self._get_session()
+        if self.scheduler is not None:
+            await self.scheduler.acquire_async(method)
+        path = ["{}Result".format(method), key]
+        received = 0
+        timings = {}
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, data=form, trace_request_ctx=timings) as r:
+                    headers = time.perf_counter()
+                    if self.scheduler is not None:
+                        self.scheduler.report(method, is_throttled(r.status))
+                    r.raise_for_status()
+                    if self._streamed(r.headers.get("Content-Length")):
+                        parser = ArrayStreamParser(path)
+                        async for chunk in r.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            received += len(chunk)
+                            for item in parser.feed(chunk):
+                                yield item
+                        for item in parser.close():
+                            yield item
+                        meta = parser.meta
+                    else:
+                        body = await r.read()
+                        received = len(body)
+                        items, meta = array_items(loads(body), path)
+                        for item in items:
+                            yield item
+            except Exception as e:
+                if self.instrumentation is not None:
+                    self.instrumentation.error(method, e)
+                raise
+        if self.instrumentation is not None:
+            connect = timings.get("connect")
+            self.instrumentation.request(method, connect, headers - start - (connect or 0.0), time.perf_counter() - headers,
+                                         None, len(urlencode(form or {})),
+                                         transferred_bytes(r.headers.get("Content-Length"), received), r.status, meta)
+        if "error" in meta:
+            raise FlightAwareError(meta["error"])
@@ -0,0 +1,302 @@
+"""
+Birdseye search queries and region-tiled sweeps.
+
+Query builds expressions in the FlightXML Birdseye search syntax, a list of {operator key value} terms that must all
+match:
+
+    Query().range("alt", 10000, 45000).match("ident", "SWA*").orig_or_dest("KBNA")
+
+TiledSearch sweeps a bounding box with SearchBirdseyeInFlight or SearchBirdseyePositions. FlightXML caps the results
+of one query, so the box is cut into tiles that are queried in parallel; a tile that comes back full is split into
+four and its quarters are queried again, down to min_tile degrees where the remaining pages are read with offset.
+Results are merged and deduplicated by faFlightID (and timestamp, for positions). The leaf tiles of a sweep are kept,
+so the next sweep of the same box starts from the split that the traffic needed last time.
+"""
+import logging
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from flightaware.client import ResultMode
+from flightaware.pagination import FlightAwareError
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+logger = logging.getLogger("flightaware.birdseye")
+
+# error messages FlightXML answers an empty search with
+NO_RESULTS_ERRORS = ("no data", "no results", "no match", "not found")
+
+_BARE = re.compile(r"^[^\s{}\[\]\"\\;$]+$")
+
+
+def _quote(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return "{" + " ".join(_quote(item) for item in value) + "}"
+    value = str(value)
+    if _BARE.match(value):
+        return value
+    if "{" in value or "}" in value or "\\" in value:
+        raise ValueError("cannot quote {!r} for a Birdseye query".format(value))
+    return "{" + value + "}"
+
+
+class Query(object):
+    """
+    Immutable Birdseye search expression, every method returns a new Query with one more term. str() gives the
+    expression passed as the query argument of the search methods.
+
+    Common keys: alt (hundreds of feet), gs (knots), lat, lon, ident, type, prefix, suffix, orig, dest, heading,
+    updateType, fdt (filed departure time), ete, timestamp.
+    """
+    def __init__(self, terms=()):
+        self.terms = tuple(terms)
+
+    def term(self, *words):
+        return Query(self.terms + ("{" + " ".join(_quote(word) for word in words) + "}", ))
+
+    def __str__(self):
+        return " ".join(self.terms)
+
+    def __repr__(self):
+        return "Query({!r})".format(str(self))
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.terms == other.terms
+
+    def __hash__(self):
+        return hash(self.terms)
+
+    def __add__(self, other):
+        return Query(self.terms + other.terms)
+
+    def eq(self, key, value):
+        return self.term("=", key, value)
+
+    def ne(self, key, value):
+        return self.term("!=", key, value)
+
+    def lt(self, key, value):
+        return self.term("<", key, value)
+
+    def le(self, key, value):
+        return self.term("<=", key, value)
+
+    def gt(self, key, value):
+        return self.term(">", key, value)
+
+    def ge(self, key, value):
+        return self.term(">=", key, value)
+
+    def match(self, key, pattern):
+        """
+        key matches the glob pattern, for example match("ident", "SWA*").
+        """
+        return self.term("match", key, pattern)
+
+    def notmatch(self, key, pattern):
+        return self.term("notmatch", key, pattern)
+
+    def range(self, key, low, high):
+        """
+        low <= key <= high.
+        """
+        return self.term("range", key, low, high)
+
+    def isin(self, key, values):
+        return self.term("in", key, list(values))
+
+    def orig_or_dest(self, airports):
+        return self.term("orig_or_dest", list(airports) if isinstance(airports, (list, tuple)) else [airports])
+
+    def airline(self, enabled=True):
+        return self.term("airline", bool(enabled))
+
+    def aircraft_type(self, pattern):
+        return self.term("aircraftType", pattern)
+
+    def ident(self, pattern):
+        return self.term("ident", pattern)
+
+    def ident_or_reg(self, pattern):
+        return self.term("ident_or_reg", pattern)
+
+    def true(self, key):
+        return self.term("true", key)
+
+    def false(self, key):
+        return self.term("false", key)
+
+    def null(self, key):
+        return self.term("null", key)
+
+    def notnull(self, key):
+        return self.term("notnull", key)
+
+    def box(self, low_latitude, low_longitude, high_latitude, high_longitude):
+        """
+        Positions inside the latitude/longitude box, edges included.
+        """
+        return self.range("lat", _degrees(low_latitude), _degrees(high_latitude)).range(
+            "lon", _degrees(low_longitude), _degrees(high_longitude))
+
+
+def _degrees(value):
+    return "{:.6f}".format(value).rstrip("0").rstrip(".")
+
+
+class Tile(tuple):
+    """
+    (low latitude, low longitude, high latitude, high longitude)
+    """
+    __slots__ = ()
+
+    def __new__(cls, low_latitude, low_longitude, high_latitude, high_longitude):
+        return tuple.__new__(cls, (low_latitude, low_longitude, high_latitude, high_longitude))
+
+    @property
+    def size(self):
+        return max(self[2] - self[0], self[3] - self[1])
+
+    def split(self):
+        low_latitude, low_longitude, high_latitude, high_longitude = self
+        latitude = (low_latitude + high_latitude) / 2.0
+        longitude = (low_longitude + high_longitude) / 2.0
+        return [Tile(low_latitude, low_longitude, latitude, longitude), Tile(low_latitude, longitude, latitude, high_longitude),
+                Tile(latitude, low_longitude, high_latitude, longitude), Tile(latitude, longitude, high_latitude, high_longitude)]
+
+
+def grid(box, tile_size):
+    """
+    Cut box into tiles of at most tile_size degrees.
+    """
+    low_latitude, low_longitude, high_latitude, high_longitude = box
+    rows = max(1, int(-(-(high_latitude - low_latitude) // tile_size)))
+    columns = max(1, int(-(-(high_longitude - low_longitude) // tile_size)))
+    height = (high_latitude - low_latitude) / float(rows)
+    width = (high_longitude - low_longitude) / float(columns)
+    return [Tile(low_latitude + row * height, low_longitude + column * width,
+                 low_latitude + (row + 1) * height, low_longitude + (column + 1) * width)
+            for row in range(rows) for column in range(columns)]
+
+
+class SearchKind(object):
+    IN_FLIGHT = "SearchBirdseyeInFlight"
+    POSITIONS = "SearchBirdseyePositions"
+
+
+class TiledSearch(object):
+    """
+    client          Client in ResultMode.DICT, tile results are merged as dicts; its pool serves max_workers tile
+                    queries at once
+    query           Query every tile query starts from, the tile box is added to it
+    kind            SearchKind.IN_FLIGHT (one record per aircraft) or SearchKind.POSITIONS (position reports)
+    unique_flights  for POSITIONS, only the first position of each flight
+    page_size       results per query, the client's maximum result size by default; raised with SetMaximumResultSize
+    max_workers     tiles queried in parallel
+    initial_tile    degrees of the tiles a fresh sweep starts with
+    min_tile        tiles are not split below this many degrees, the pages of a full one are read with offset instead
+    """
+    def __init__(self, client, query=None, kind=SearchKind.IN_FLIGHT, unique_flights=False, page_size=None,
+                 max_workers=16, initial_tile=10.0, min_tile=0.25):
+        if client.result_mode != ResultMode.DICT:
+            raise ValueError("TiledSearch needs a client in ResultMode.DICT")
+        self.client = client
+        self.query = query if query is not None else Query()
+        self.kind = kind
+        self.unique_flights = unique_flights
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.initial_tile = initial_tile
+        self.min_tile = min_tile
+        self.queries = 0
+        self.splits = 0
+        self._leaves = {}           # box => leaf tiles of its last sweep
+        self._lock = threading.Lock()
+
+    def _search(self, query, how_many, offset):
+        with self._lock:
+            self.queries += 1
+        if self.kind == SearchKind.IN_FLIGHT:
+            result = self.client.search_birdseye_in_flight(query, how_many=how_many, offset=offset)
+            records = result.get("aircraft") if isinstance(result, dict) and "error" not in result else result
+        else:
+            result = self.client.search_birdseye_positions(query, unique_flights=self.unique_flights, how_many=how_many,
+                                                           offset=offset)
+            records = result
+        if isinstance(records, dict) and "error" in records:
+            message = str(records["error"])
+            if any(text in message.lower() for text in NO_RESULTS_ERRORS):
+                return []
+            raise FlightAwareError(message)
+        return records or []
+
+    def query_tile(self, tile, page_size):
+        """
+        Return (records, full) for one tile, full is True when the tile holds more than one page.
+        """
+        records = self._search(self.query.box(*tile), page_size, 0)
+        return records, len(records) >= page_size
+
+    def read_remaining(self, tile, page_size):
+        """
+        Page through a tile that cannot be split any further.
+        """
+        query = self.query.box(*tile)
+        offset = page_size
+        records = []
+        while True:
+            page = self._search(query, page_size, offset)
+            records.extend(page)
+            if len(page) < page_size:
+                return records
+            offset += page_size
+
+    def key(self, record):
+        fa_flight_id = record.get("faFlightID")
+        if not fa_flight_id:
+            # aircraft without a flight id (unfiled VFR traffic) are told apart by where and when they were seen
+            return tuple(record.get(field) for field in ("ident", "latitude", "longitude", "timestamp"))
+        if self.kind == SearchKind.IN_FLIGHT or self.unique_flights:
+            return fa_flight_id
+        return fa_flight_id, record.get("timestamp")
+
+    def sweep(self, box):
+        """
+        Return every record inside box (low latitude, low longitude, high latitude, high longitude), deduplicated.
+        """
+        box = tuple(box)
+        page_size = self.client.ensure_result_size(self.page_size)
+
+        merged = {}
+        leaves = []
+        tiles = self._leaves.get(box) or grid(box, self.initial_tile)
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = dict((executor.submit(self.query_tile, tile, page_size), (tile, False)) for tile in tiles)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile, remaining = pending.pop(future)
+                    records, full = (future.result(), False) if remaining else future.result()
+                    for record in records:
+                        merged.setdefault(self.key(record), record)
+                    if remaining:
+                        continue
+                    if not full:
+                        leaves.append(tile)
+                    elif tile.size / 2.0 >= self.min_tile:
+                        # the parent's records are kept, the quarters fill in the rest
+                        with self._lock:
+                            self.splits += 1
+                        for quarter in tile.split():
+                            pending[executor.submit(self.query_tile, quarter, page_size)] = (quarter, False)
+                    else:
+                        leaves.append(tile)
+                        pending[executor.submit(self.read_remaining, tile, page_size)] = (tile, True)
+        self._leaves[box] = leaves
+        logger.debug("swept %s with %s queries into %s records", box, self.queries, len(merged))
+        return list(merged.values())
+
+    def stats(self):
+        return {"queries": self.queries, "splits": self.splits, "tiles": dict((box, len(tiles)) for box, tiles in self._leaves.items())}
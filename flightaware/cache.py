@@ -0,0 +1,172 @@
+"""
+Response caches for the reference-data FlightXML methods (airports, airlines, aircraft types, ...).
+
+A cache is any object with get(key) -> value or MISSING, and set(key, value, ttl). Cached values are shared between
+callers and must be treated as read-only.
+"""
+import collections
+import json
+import sqlite3
+import threading
+import time
+
+MISSING = object()
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Seconds a successful response stays cached, by FlightXML method. Methods not listed here are never cached.
+DEFAULT_CACHE_TTLS = {
+    "AircraftType": 30 * DAY,
+    "AirlineInfo": 7 * DAY,
+    "AirportInfo": 7 * DAY,
+    "AllAirlines": DAY,
+    "AllAirports": DAY,
+    # navigation data changes on 28-day AIRAC cycle dates, a day bounds how long a decoded route outlives a cycle change
+    "DecodeRoute": DAY,
+    "ZipcodeInfo": 30 * DAY,
+}
+
+
+def cache_key(method, data=None):
+    """
+    Stable key for a FlightXML call. None values are dropped the same way requests drops them from the form body.
+    """
+    params = sorted((key, value) for key, value in (data or {}).items() if value is not None)
+    return json.dumps([method, params], separators=(",", ":"), default=str)
+
+
+class MemoryCache(object):
+    """
+    Thread-safe in-process LRU cache with per-entry expiry.
+
+    maxsize     maximum number of entries, the least recently used entry is evicted first
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._data)}
+
+
+class SqliteCache(object):
+    """
+    On-disk cache stored in a sqlite database so cached responses survive restarts.
+
+    path    database file, created if it does not exist
+    """
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires REAL, value TEXT)")
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry if entry is MISSING else entry[1]
+
+    def get_entry(self, key):
+        """
+        Return an (expires, value) tuple or MISSING.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT expires, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > time.time():
+                self.hits += 1
+                return row[0], json.loads(row[1])
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value, ttl):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, time.time() + ttl, json.dumps(value)))
+
+    def purge(self):
+        """
+        Delete expired entries.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        self._db.close()
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+class TieredCache(object):
+    """
+    Memory cache in front of a persistent cache. Disk hits are promoted to memory for the rest of their lifetime.
+    """
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is MISSING and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not MISSING:
+                expires, value = entry
+                self.memory.set(key, value, expires - time.time())
+        return value
+
+    def set(self, key, value, ttl):
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        output = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            output["disk"] = self.disk.stats()
+        return output
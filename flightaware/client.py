@@ -1,16 +1,36 @@
 import os
 import datetime
+import http.cookiejar
 import logging
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+from flightaware import geodesy
+from flightaware.cache import DEFAULT_CACHE_TTLS, MISSING, cache_key
+from flightaware.coalesce import SingleFlight
+from flightaware.columnar import COLUMN_DECODERS
+from flightaware.decoding import ArrayStreamParser, array_items, loads
+from flightaware.pagination import FlightAwareError, iter_pages
+from flightaware.records import RECORD_DECODERS
+from flightaware.resilience import WRITE_METHODS
+from flightaware.scheduler import is_throttled
+
 logger = logging.getLogger("flightaware.client")
 
 BASE_URL = "http://flightxml.flightaware.com/json/FlightXML2/"
 MAX_RECORD_LENGTH = 15
 EPOCH = datetime.datetime(1970, 1, 1)
 
+# Connection pool defaults, see requests.adapters.HTTPAdapter
+DEFAULT_POOL_CONNECTIONS = 10       # number of per-host pools to keep around
+DEFAULT_POOL_MAXSIZE = 10           # maximum keep-alive connections held open per host
+DEFAULT_TIMEOUT = (3.05, 30)        # (connect, read) timeout in seconds
+STREAM_CHUNK_SIZE = 64 * 1024       # bytes read at a time by the stream_* methods
+DEFAULT_STREAM_THRESHOLD = 4 * 1024 * 1024  # smaller responses of the stream_* methods are decoded in one go
+
 
 def to_unix_timestamp(val):
     if val:
@@ -23,10 +43,64 @@ def to_unix_timestamp(val):
     return output
 
 
+def _epoch_seconds(val):
+    # datetime or epoch seconds, 0 and None are left out of the request
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return int(val) or None
+    return to_unix_timestamp(val)
+
+
 def from_unix_timestamp(val):
     return datetime.datetime.fromtimestamp(val)
 
 
+def unwrap_result(method, result):
+    """
+    Strip the {"<Method>Result": {"data": ...}} envelope FlightXML wraps around every response.
+    """
+    final = result
+    key = "{}Result".format(method)
+    if key in result:
+        final = result[key]
+        if isinstance(final, dict) and "data" in final:
+            final = final["data"]
+    return final
+
+
+def transferred_bytes(content_length, decoded):
+    """
+    Size of a response body on the wire: its Content-Length header, which counts gzip-compressed bytes, or else the
+    decoded size of a chunked body.
+    """
+    return int(content_length) if content_length is not None else decoded
+
+
+def add_schedule_times(results):
+    for item in results:
+        item["departure_time"] = from_unix_timestamp(item["departuretime"])
+        item["arrival_time"] = from_unix_timestamp(item["arrivaltime"])
+    return results
+
+
+class AlertEvent(object):
+    FILED = "e_filed"
+    DEPARTURE = "e_departure"
+    ARRIVAL = "e_arrival"
+    DIVERTED = "e_diverted"
+    CANCELLED = "e_cancelled"
+
+
+def alert_channels(events=(AlertEvent.FILED, AlertEvent.DEPARTURE, AlertEvent.ARRIVAL, AlertEvent.DIVERTED,
+                           AlertEvent.CANCELLED), channel=16):
+    """
+    SetAlert channels argument delivering events on channel, 16 is the FlightXML push channel.
+    """
+    return "{{{} {}}}".format(channel, " ".join(events))
+
+
+DEFAULT_ALERT_CHANNELS = alert_channels()
+
+
 class TrafficFilter(object):
     """
     "ga" to show only general aviation traffic
@@ -45,27 +119,270 @@ class AirlineInsightReportType(object):
     CARRIERS_BY_CARGO_WEIGHT = 4                # Carriers by most cargo weight
 
 
+class ResultMode(object):
+    """
+    "dict" returns the decoded JSON as is
+    "columns" returns list responses as column arrays, see flightaware.columnar
+    "records" returns the main structures as compact record objects, see flightaware.records
+    """
+    DICT = "dict"
+    COLUMNS = "columns"
+    RECORDS = "records"
+
+
+# Per result mode, FlightXML method name => decoder replacing the method's own dict post-processing
+RESULT_DECODERS = {
+    ResultMode.DICT: {},
+    ResultMode.COLUMNS: COLUMN_DECODERS,
+    ResultMode.RECORDS: RECORD_DECODERS,
+}
+
+
 class Client(object):
-    def __init__(self, username, api_key):
+    """
+    FlightXML2 client.
+
+    Every client owns a keep-alive requests.Session so consecutive calls reuse pooled TCP (and TLS) connections instead
+    of paying for connection setup on each call. requests does not promise that a Session is thread-safe, sharing a
+    client between threads relies on this one being used narrowly: its auth and headers are set once here, every call
+    is a stateless form POST through one pooled HTTPAdapter (urllib3 pools are thread-safe), and cookies are refused so
+    no response changes the session.
+
+    pool_connections    number of per-host connection pools to cache
+    pool_maxsize        maximum number of connections kept open per host
+    pool_block          if True, never open more than pool_maxsize connections per host and wait for a free one instead
+    timeout             (connect, read) timeout tuple, or a single number used for both, or None to wait forever
+    cache               optional response cache (see flightaware.cache) for the methods listed in cache_ttls
+    cache_ttls          mapping of FlightXML method name to seconds a response is cached, defaults to DEFAULT_CACHE_TTLS
+    result_mode         one of ResultMode, how list responses are returned
+    coalesce            if True, concurrent identical calls (same method and parameters) share one request, the number
+                        of requests saved is in coalescer.stats(); write methods (resilience.WRITE_METHODS) are never shared
+    scheduler           optional flightaware.scheduler.RateScheduler every request has to pass before it is sent
+    policy              optional flightaware.resilience.RequestPolicy adding hedging, retries and a circuit breaker
+    instrumentation     optional flightaware.metrics.Instrumentation collecting per-method latencies, byte counts, errors
+                        and cache and coalescing hits
+    transport           optional flightaware.replay.ReplayTransport recording responses to an archive or replaying them
+    stream_threshold    the stream_* methods decode a response incrementally only from this Content-Length on (bytes on
+                        the wire, compressed or not), smaller ones are decoded with loads() which is many times faster;
+                        0 always streams, and so do responses without a Content-Length
+
+    Use close() or the client as a context manager to release pooled connections.
+    """
+    def __init__(self, username, api_key, base_url=BASE_URL, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False, timeout=DEFAULT_TIMEOUT, cache=None, cache_ttls=None,
+                 result_mode=ResultMode.DICT, coalesce=True, scheduler=None, policy=None, instrumentation=None,
+                 transport=None, stream_threshold=DEFAULT_STREAM_THRESHOLD):
         self.auth = HTTPBasicAuth(username, api_key)
         self.headers = {
+            "Accept-Encoding": "gzip, deflate",
             "Content-Type": "application/x-www-form-urlencoded",
         }
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.cache = cache
+        self.cache_ttls = DEFAULT_CACHE_TTLS if cache_ttls is None else cache_ttls
+        self.max_result_size = MAX_RECORD_LENGTH
+        self.result_mode = result_mode
+        self.coalescer = self._create_coalescer() if coalesce else None
+        self.scheduler = scheduler
+        self.policy = policy
+        self.instrumentation = instrumentation
+        self.transport = transport
+        self.stream_threshold = stream_threshold
+        self.session = self._create_session()
+
+    def _create_session(self):
+        session = requests.Session()
+        session.auth = self.auth
+        session.headers.update(self.headers)
+        # FlightXML authenticates every request, a cookie set by one response must not leak into another thread's call
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _create_coalescer(self):
+        return SingleFlight()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close all pooled connections. The client must not be used afterwards.
+        """
+        self.session.close()
+
+    def _request(self, method, data=None, transform=None):
+        """
+        POST a FlightXML method and return its unwrapped result.
 
-    def _request(self, method, data=None):
-        url = os.path.join(BASE_URL, method)
+        transform   optional callable applied to the unwrapped result before it is returned
+        """
+        key, final = self._cache_lookup(method, data)
+        if final is MISSING:
+            if self.coalescer is None or method in WRITE_METHODS:
+                final = self._fetch(method, data)
+            else:
+                leader = []
+                final = self.coalescer.do(key or cache_key(method, data), lambda: leader.append(True) or self._fetch(method, data))
+                self._count_coalesced(method, leader)
+            self._cache_store(key, method, final)
+        return self._decode(method, final, transform)
+
+    def _count_coalesced(self, method, leader):
+        # the coalescer only calls the function of the first caller, the others were answered by its request
+        if self.instrumentation is not None and not leader:
+            self.instrumentation.coalesced(method)
+
+    def _fetch(self, method, data=None):
+        if self.transport is None:
+            return self._transmit(method, data)
+        return self.transport.call(method, data, lambda: self._transmit(method, data))
+
+    def _transmit(self, method, data=None):
+        if self.policy is None:
+            return self._send(method, data)
+        return self.policy.call(method, lambda: self._send(method, data))
+
+    def _send(self, method, data=None):
+        """
+        Send one request and return its unwrapped result.
+        """
+        url = os.path.join(self.base_url, method)
+        if self.scheduler is not None:
+            self.scheduler.acquire(method)
         logger.debug("POST\n%s\n%s\n", url, data)
 
-        r = requests.post(url=url, data=data, auth=self.auth, headers=self.headers)
-        result = r.json()
-        final = result
-        key = "{}Result".format(method)
-        if key in result:
-            final = result[key]
-            if "data" in final:
-                final = final["data"]
+        start = time.perf_counter()
+        try:
+            r = self.session.post(url=url, data=data, timeout=self.timeout)
+            received = time.perf_counter()
+            if self.scheduler is not None and is_throttled(r.status_code):
+                self.scheduler.report(method, True)
+                r.raise_for_status()
+            result = loads(r.content)
+        except Exception as e:
+            if self.instrumentation is not None:
+                self.instrumentation.error(method, e)
+            raise
+        final = unwrap_result(method, result)
+        if self.instrumentation is not None:
+            # r.elapsed ends when the response headers are parsed, the rest of the post is reading the body
+            server = r.elapsed.total_seconds()
+            self.instrumentation.request(method, None, server, max(0.0, received - start - server), time.perf_counter() - received,
+                                         len(r.request.body or ""), transferred_bytes(r.headers.get("Content-Length"), len(r.content)),
+                                         r.status_code, final)
+        if self.scheduler is not None:
+            self.scheduler.report(method, is_throttled(r.status_code, final))
         return final
 
+    def _stream(self, method, data=None, key="data"):
+        """
+        POST a FlightXML method and yield the items of its data array as the body arrives, see
+        flightaware.decoding.ArrayStreamParser, or all at once for a body below stream_threshold. Bypasses the cache,
+        coalescing, replay and the request policy, items are plain decoded JSON whatever the result mode.
+        """
+        url = os.path.join(self.base_url, method)
+        if self.scheduler is not None:
+            self.scheduler.acquire(method)
+        logger.debug("POST (streamed)\n%s\n%s\n", url, data)
+
+        path = ["{}Result".format(method), key]
+        received = 0
+        start = time.perf_counter()
+        try:
+            with self.session.post(url=url, data=data, timeout=self.timeout, stream=True) as r:
+                if self.scheduler is not None:
+                    self.scheduler.report(method, is_throttled(r.status_code))
+                r.raise_for_status()
+                if self._streamed(r.headers.get("Content-Length")):
+                    parser = ArrayStreamParser(path)
+                    for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                        received += len(chunk)
+                        for item in parser.feed(chunk):
+                            yield item
+                    for item in parser.close():
+                        yield item
+                    meta = parser.meta
+                else:
+                    received = len(r.content)
+                    items, meta = array_items(loads(r.content), path)
+                    for item in items:
+                        yield item
+        except Exception as e:
+            if self.instrumentation is not None:
+                self.instrumentation.error(method, e)
+            raise
+        if self.instrumentation is not None:
+            server = r.elapsed.total_seconds()
+            self.instrumentation.request(method, None, server, max(0.0, time.perf_counter() - start - server), None,
+                                         len(r.request.body or ""), transferred_bytes(r.headers.get("Content-Length"), received),
+                                         r.status_code, meta)
+        if "error" in meta:
+            raise FlightAwareError(meta["error"])
+
+    def _streamed(self, content_length):
+        """
+        True if a response of content_length bytes (a header value, None when the body is chunked) is worth decoding
+        incrementally.
+        """
+        return content_length is None or int(content_length) >= self.stream_threshold
+
+    def _decode(self, method, result, transform=None):
+        """
+        Apply the result mode's decoder for method, or else the method's own transform.
+        """
+        decoder = RESULT_DECODERS[self.result_mode].get(method)
+        if decoder is not None:
+            return decoder(result)
+        if transform is not None:
+            return transform(result)
+        return result
+
+    def _cache_lookup(self, method, data):
+        """
+        Return a (key, cached result or MISSING) tuple, key is None for uncached methods.
+        """
+        if self.cache is None or method not in self.cache_ttls:
+            return None, MISSING
+        key = cache_key(method, data)
+        result = self.cache.get(key)
+        if self.instrumentation is not None:
+            self.instrumentation.cache(method, result is not MISSING)
+        return key, result
+
+    def _cache_store(self, key, method, result):
+        # error responses are never cached
+        if key is not None and not (isinstance(result, dict) and "error" in result):
+            self.cache.set(key, result, self.cache_ttls[method])
+
+    def _paginate(self, call, page_size=None, key=None, offset=0, prefetch=True):
+        """
+        Iterate over the records of a paged method, see flightaware.pagination. A page_size above the current maximum
+        result size raises it with SetMaximumResultSize first.
+        """
+        page_size = self.ensure_result_size(page_size)
+        return iter_pages(call, page_size, key=key, offset=offset, prefetch=prefetch)
+
+    def ensure_result_size(self, page_size=None):
+        """
+        Raise the maximum result size to page_size with SetMaximumResultSize if it is lower, and return the page size
+        to use, the current maximum for None. Callers paging from several threads call it once before they start so
+        the threads do not race to raise it.
+        """
+        page_size = page_size or self.max_result_size
+        if page_size > self.max_result_size:
+            self.set_maximum_result_sizes(page_size)
+        return page_size
+
     def aircraft_type(self, aircraft_type):
         """
         Given an aircraft type string such as GALX, AircraftType returns information about that type,  comprising the
@@ -114,11 +431,18 @@ class Client(object):
             "howMany": how_many,
             "offset": offset,
         }
-        results = self._request("AirlineFlightSchedules", data)
-        for item in results:
-            item["departure_time"] = from_unix_timestamp(item["departuretime"])
-            item["arrival_time"] = from_unix_timestamp(item["arrivaltime"])
-        return results
+        return self._request("AirlineFlightSchedules", data, add_schedule_times)
+
+    def iter_airline_flight_schedules(self, start_date, end_date, origin=None, destination=None, airline=None, flight_number=None, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every AirlineFlightSchedules record between start_date and end_date, fetching page_size records per
+        call. The next page is fetched in the background while the current one is consumed unless prefetch is False.
+        With ResultMode.COLUMNS one Columns batch is yielded per page instead.
+        """
+        def call(how_many, page_offset):
+            return self.airline_flight_schedules(start_date, end_date, origin=origin, destination=destination, airline=airline,
+                                                 flight_number=flight_number, how_many=how_many, offset=page_offset)
+        return self._paginate(call, page_size, offset=offset, prefetch=prefetch)
 
     def airline_info(self, airline):
         """
@@ -190,6 +514,13 @@ class Client(object):
         """
         return self._request("AllAirlines")
 
+    def stream_all_airlines(self):
+        """
+        Yield the AllAirlines identifiers as the response arrives, memory stays bounded by one chunk of the body.
+        Responses below stream_threshold are decoded in one go instead.
+        """
+        return self._stream("AllAirlines")
+
     def all_airports(self):
         """
         AllAirports returns the ICAO identifiers of all known airports. For airports that do not have an ICAO identifier, the FAA LID identifier will be used.
@@ -197,6 +528,12 @@ class Client(object):
         """
         return self._request("AllAirports")
 
+    def stream_all_airports(self):
+        """
+        Yield the AllAirports identifiers as the response arrives, see stream_all_airlines.
+        """
+        return self._stream("AllAirports")
+
     def block_indent_check(self, ident):
         """
         Given an aircraft identification, returns 1 if the aircraft is blocked from public tracking, 0 if it is not.
@@ -219,11 +556,33 @@ class Client(object):
         """
         return self._request("CountAllEnrouteAirlineOperations")
 
-    def decode_flight_route(self):
-        raise NotImplementedError
+    def decode_flight_route(self, fa_flight_id):
+        """
+        Given a flight identifier (faFlightID) of a past, current, or future flight, DecodeFlightRoute returns a parsed array
+        of the route, including the name, type, latitude, and longitude of each point. Either a faFlightID or a scheduled
+        ident can be given. See flightaware.routes for a shared waypoint table and simplified routes.
 
-    def decode_route(self):
-        raise NotImplementedError
+        faFlightID	string	unique identifier assigned by FlightAware for the desired flight (or use "ident@departureTime")
+        """
+        data = {"faFlightID": fa_flight_id}
+        return self._request("DecodeFlightRoute", data)
+
+    def decode_route(self, origin, route, destination):
+        """
+        Given an origin airport, destination airport, and a route between them, DecodeRoute returns a parsed array of the
+        route, including the name, type, latitude, and longitude of each point. The route is a space separated string
+        of waypoints, airways, SIDs and STARs.
+
+        origin	string	the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
+        route	string	space separated route, for example "SKWKR1 RIPKI DCT PENNT"
+        destination	string	the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
+        """
+        data = {
+            "origin": origin,
+            "route": route,
+            "destination": destination,
+        }
+        return self._request("DecodeRoute", data)
 
     def arrived(self, airport, how_many=MAX_RECORD_LENGTH, filter=TrafficFilter.ALL, offset=0):
         """
@@ -239,7 +598,21 @@ class Client(object):
         filter	string	can be "ga" to show only general aviation traffic, "airline" to only show airline traffic, or null/empty to show all traffic.
         offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
         """
-        raise NotImplementedError
+        data = {
+            "airport": airport,
+            "howMany": how_many,
+            "filter": filter,
+            "offset": offset,
+        }
+        return self._request("Arrived", data)
+
+    def iter_arrived(self, airport, filter=TrafficFilter.ALL, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every Arrived record for airport, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.arrived(airport, how_many=how_many, filter=filter, offset=page_offset)
+        return self._paginate(call, page_size, key="arrivals", offset=offset, prefetch=prefetch)
 
     def departed(self, airport, how_many=MAX_RECORD_LENGTH, filter=TrafficFilter.ALL, offset=0):
         """
@@ -256,10 +629,51 @@ class Client(object):
         filter	string	can be "ga" to show only general aviation traffic, "airline" to only show airline traffic, or null/empty to show all traffic.
         offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
         """
-        raise NotImplementedError
+        data = {
+            "airport": airport,
+            "howMany": how_many,
+            "filter": filter,
+            "offset": offset,
+        }
+        return self._request("Departed", data)
 
-    def enroute(self):
-        raise NotImplementedError
+    def iter_departed(self, airport, filter=TrafficFilter.ALL, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every Departed record for airport, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.departed(airport, how_many=how_many, filter=filter, offset=page_offset)
+        return self._paginate(call, page_size, key="departures", offset=offset, prefetch=prefetch)
+
+    def enroute(self, airport, how_many=MAX_RECORD_LENGTH, filter=TrafficFilter.ALL, offset=0):
+        """
+        Enroute returns information about flights already in the air heading towards the specified airport and also
+        flights scheduled to arrive at the specified airport. Flights are returned in order of estimated arrival time.
+
+        Times returned are seconds since 1970 (UNIX epoch seconds).
+
+        See also Arrived, Departed, and Scheduled for other airport tracking functionality.
+
+        airport	string	the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
+        howMany	int	determines the number of results. Must be a positive integer value less than or equal to 15, unless SetMaximumResultSize has been called.
+        filter	string	can be "ga" to show only general aviation traffic, "airline" to only show airline traffic, or null/empty to show all traffic.
+        offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
+        """
+        data = {
+            "airport": airport,
+            "howMany": how_many,
+            "filter": filter,
+            "offset": offset,
+        }
+        return self._request("Enroute", data)
+
+    def iter_enroute(self, airport, filter=TrafficFilter.ALL, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every Enroute record for airport, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.enroute(airport, how_many=how_many, filter=filter, offset=page_offset)
+        return self._paginate(call, page_size, key="enroute", offset=offset, prefetch=prefetch)
 
     def fleet_arrived(self):
         raise NotImplementedError
@@ -285,7 +699,7 @@ class Client(object):
         """
         raise NotImplementedError
 
-    def flight_info_ex(self):
+    def flight_info_ex(self, ident, how_many=MAX_RECORD_LENGTH, offset=0):
         """
         FlightInfoEx returns information about flights for a specific tail number (e.g., N12345), or an ident (typically an ICAO airline with flight number, e.g., SWA2558),
         or a FlightAware-assigned unique flight identifier (e.g. faFlightID returned by another FlightXML function).
@@ -297,8 +711,17 @@ class Client(object):
         Times are in integer seconds since 1970 (UNIX epoch time), except for estimated time enroute, which is in hours and minutes.
 
         See FlightInfo for a simpler interface.
+
+        ident	string	requested tail number, ident, or faFlightID
+        howMany	int	maximum number of past flights to obtain. Must be a positive integer value less than or equal to 15, unless SetMaximumResultSize has been called.
+        offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
         """
-        raise NotImplementedError
+        data = {
+            "ident": ident,
+            "howMany": how_many,
+            "offset": offset,
+        }
+        return self._request("FlightInfoEx", data)
 
     def get_flight_id(self, ident, departure_datetime):
         """
@@ -320,11 +743,33 @@ class Client(object):
         return self._request("GetFlightID", data)
 
 
-    def get_historical_track(self):
-        raise NotImplementedError
+    def get_historical_track(self, fa_flight_id):
+        """
+        GetHistoricalTrack looks up a flight's track log by its unique identifier. To obtain the faFlightID, you can use a
+        function such as GetFlightID, FlightInfoEx, or InFlightInfo. The returned track log data will include datapoints
+        from the specified flight, even if that flight is still in-progress.
 
-    def get_last_track(self):
-        raise NotImplementedError
+        The track log is returned as an array of TrackStruct elements (timestamp, latitude, longitude, groundspeed,
+        altitude, altitudeStatus, updateType, altitudeChange). Altitude is in hundreds of feet and groundspeed in knots.
+
+        See flightaware.tracks for compact storage of many tracks.
+
+        faFlightID	string	unique identifier assigned by FlightAware for the desired flight (or use "ident@departureTime")
+        """
+        data = {"faFlightID": fa_flight_id}
+        return self._request("GetHistoricalTrack", data)
+
+    def get_last_track(self, ident):
+        """
+        GetLastTrack looks up a flight's track log by specific tail number (e.g., N12345) or ICAO airline and flight number
+        (e.g., SWA2558). It returns the track log from the current IFR flight or, if the aircraft is not airborne, the most
+        recent IFR flight. It returns an array of positions, with each including the timestamp, longitude, latitude,
+        groundspeed, altitude, altitudestatus, updatetype, and altitudechange.
+
+        ident	string	requested tail number
+        """
+        data = {"ident": ident}
+        return self._request("GetLastTrack", data)
 
     def inbound_flight_info(self):
         raise NotImplementedError
@@ -332,11 +777,35 @@ class Client(object):
     def in_flight_info(self):
         raise NotImplementedError
 
-    def lat_lng_to_distance(self):
-        raise NotImplementedError
+    def lat_lng_to_distance(self, lat1, lon1, lat2, lon2):
+        """
+        Given two latitudes and longitudes, lat1 lon1 lat2 and lon2, respectively, determine the great circle distance
+        between those positions in miles. The returned distance is rounded to the nearest whole mile.
 
-    def lat_lng_to_heading(self):
-        raise NotImplementedError
+        Computed locally, no FlightXML query is made. See flightaware.geodesy.distance_matrix for batches.
+
+        lat1	float	Latitude of point 1
+        lon1	float	Longitude of point 1
+        lat2	float	Latitude of point 2
+        lon2	float	Longitude of point 2
+        """
+        return int(round(geodesy.distance(lat1, lon1, lat2, lon2)))
+
+    def lat_lng_to_heading(self, lat1, lon1, lat2, lon2):
+        """
+        Given two latitudes and longitudes, lat1 lon1 lat2 and lon2, respectively, calculate and return the initial
+        compass heading (where 360 is North) from position one to position two. Quite accurate for relatively short
+        distances but since it assumes the earth is a sphere rather than on irregular oblate sphereoid may be inaccurate
+        for flights around a good chunk of the world, etc.
+
+        Computed locally, no FlightXML query is made. See flightaware.geodesy.heading_matrix for batches.
+
+        lat1	float	Latitude of point 1
+        lon1	float	Longitude of point 1
+        lat2	float	Latitude of point 2
+        lon2	float	Longitude of point 2
+        """
+        return int(round(geodesy.heading(lat1, lon1, lat2, lon2))) or 360
 
     def map_flight(self):
         raise NotImplementedError
@@ -349,7 +818,8 @@ class Client(object):
         Given an airport, return the current raw METAR weather info. If no reports are available at the requested airport
         but are for a nearby airport, then the report from that airport may be returned instead.
 
-        Use the MetarEx function for more functionality, including access to historical weather and parsed.
+        Use the MetarEx function for more functionality, including access to historical weather and parsed, or parse the
+        raw report locally with flightaware.weather.
         airport	string	the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
         """
         data = {"airport": airport}
@@ -379,12 +849,12 @@ class Client(object):
 
     def taf(self, airport):
         """
-        Given an airport, return the terminal area forecast, if available.
-        See NTaf for a more advanced interface.
+        Given an airport, return the terminal area forecast, if available, as the raw TAF string.
+        See NTaf for a more advanced interface, and flightaware.weather for parsing the raw forecast locally.
         airport	string	the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
         """
         data = {"airport": airport}
-        return self._request("NTaf", data)
+        return self._request("Taf", data)
 
     def routes_between_airports(self):
         raise NotImplementedError
@@ -392,23 +862,153 @@ class Client(object):
     def routes_between_airports_ex(self):
         raise NotImplementedError
 
-    def scheduled(self):
-        raise NotImplementedError
+    def scheduled(self, airport, how_many=MAX_RECORD_LENGTH, filter=TrafficFilter.ALL, offset=0):
+        """
+        Scheduled returns information about scheduled flights (technically, filed IFR flights) for a specified airport
+        and a maximum number of flights to be returned. Scheduled flights are returned from soonest to furthest in the
+        future to depart. Only flights that have not actually departed, and have a scheduled departure time between 2
+        hours in the past and 24 hours in the future, are considered.
 
-    def search(self):
-        raise NotImplementedError
+        Times returned are seconds since 1970 (UNIX epoch seconds).
 
-    def search_birdseye_in_flight(self):
-        raise NotImplementedError
+        See also Arrived, Departed, and Enroute for other airport tracking functionality.
 
-    def search_birdseye_positions(self):
-        raise NotImplementedError
+        airport	string	the ICAO airport ID (e.g., KLAX, KSFO, KIAH, KHOU, KJFK, KEWR, KORD, KATL, etc.)
+        howMany	int	determines the number of results. Must be a positive integer value less than or equal to 15, unless SetMaximumResultSize has been called.
+        filter	string	can be "ga" to show only general aviation traffic, "airline" to only show airline traffic, or null/empty to show all traffic.
+        offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
+        """
+        data = {
+            "airport": airport,
+            "howMany": how_many,
+            "filter": filter,
+            "offset": offset,
+        }
+        return self._request("Scheduled", data)
+
+    def iter_scheduled(self, airport, filter=TrafficFilter.ALL, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every Scheduled record for airport, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.scheduled(airport, how_many=how_many, filter=filter, offset=page_offset)
+        return self._paginate(call, page_size, key="scheduled", offset=offset, prefetch=prefetch)
+
+    def search(self, query, how_many=MAX_RECORD_LENGTH, offset=0):
+        """
+        Search performs a query for data on all airborne aircraft to find ones matching the search query. Query parameters
+        include a latitude/longitude box, aircraft ident with wildcards, type with wildcards, prefix, suffix, origin
+        airport, destination airport, origin or destination airport, groundspeed, and altitude. It takes search terms in a
+        single string comprising "-key value" pairs and returns an array of flight structures. Codeshares and alternate
+        idents are NOT searched when matching against the -idents key.
+
+        query	string	search expression, for example "-destination KLAX -prefix H"
+        howMany	int	maximum number of flights to return. Must be a positive integer value less than or equal to 15, unless SetMaximumResultSize has been called.
+        offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
+        """
+        data = {
+            "query": query,
+            "howMany": how_many,
+            "offset": offset,
+        }
+        return self._request("Search", data)
+
+    def iter_search(self, query, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every aircraft matching query, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.search(query, how_many=how_many, offset=page_offset)
+        return self._paginate(call, page_size, key="aircraft", offset=offset, prefetch=prefetch)
+
+    def search_birdseye_in_flight(self, query, how_many=MAX_RECORD_LENGTH, offset=0):
+        """
+        SearchBirdseyeInFlight performs a query for data on all airborne aircraft to find ones matching the search query,
+        using the Birdseye search syntax. Build queries with flightaware.birdseye.Query, sweep large regions with
+        flightaware.birdseye.TiledSearch.
+
+        query	string	search expression, for example "{< alt 8000} {> gs 200} {match ident SWA*}"
+        howMany	int	maximum number of flights to return. Must be a positive integer value less than or equal to 15, unless SetMaximumResultSize has been called.
+        offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
+        """
+        data = {
+            "query": str(query),
+            "howMany": how_many,
+            "offset": offset,
+        }
+        return self._request("SearchBirdseyeInFlight", data)
+
+    def iter_search_birdseye_in_flight(self, query, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every aircraft matching query, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.search_birdseye_in_flight(query, how_many=how_many, offset=page_offset)
+        return self._paginate(call, page_size, key="aircraft", offset=offset, prefetch=prefetch)
+
+    def stream_search_birdseye_in_flight(self, query, how_many=MAX_RECORD_LENGTH, offset=0):
+        """
+        Yield the aircraft of one SearchBirdseyeInFlight page as the response arrives, see stream_all_airlines.
+        """
+        return self._stream("SearchBirdseyeInFlight", {"query": str(query), "howMany": how_many, "offset": offset},
+                            key="aircraft")
+
+    def search_birdseye_positions(self, query, unique_flights=False, how_many=MAX_RECORD_LENGTH, offset=0):
+        """
+        SearchBirdseyePositions performs a query for aircraft flight position reports matching the search query, using
+        the Birdseye search syntax. Position records are returned for up to the last 24 hours.
+
+        query	string	search expression, for example "{range lat 36.0 37.0} {range lon -87.0 -86.0} {< alt 100}"
+        uniqueFlights	boolean	if true, only the first matching position of each flight is returned
+        howMany	int	maximum number of positions to return. Must be a positive integer value less than or equal to 15, unless SetMaximumResultSize has been called.
+        offset	int	must be an integer value of the offset row count you want the search to start at. Most requests should be 0.
+        """
+        data = {
+            "query": str(query),
+            "uniqueFlights": "true" if unique_flights else "false",
+            "howMany": how_many,
+            "offset": offset,
+        }
+        return self._request("SearchBirdseyePositions", data)
+
+    def iter_search_birdseye_positions(self, query, unique_flights=False, page_size=None, offset=0, prefetch=True):
+        """
+        Lazily yield every position matching query, see iter_airline_flight_schedules.
+        """
+        def call(how_many, page_offset):
+            return self.search_birdseye_positions(query, unique_flights=unique_flights, how_many=how_many, offset=page_offset)
+        return self._paginate(call, page_size, offset=offset, prefetch=prefetch)
+
+    def stream_search_birdseye_positions(self, query, unique_flights=False, how_many=MAX_RECORD_LENGTH, offset=0):
+        """
+        Yield the positions of one SearchBirdseyePositions page as the response arrives, see stream_all_airlines.
+        """
+        data = {
+            "query": str(query),
+            "uniqueFlights": "true" if unique_flights else "false",
+            "howMany": how_many,
+            "offset": offset,
+        }
+        return self._stream("SearchBirdseyePositions", data)
 
     def search_count(self):
         raise NotImplementedError
 
-    def set_maximum_result_sizes(self):
-        raise NotImplementedError
+    def set_maximum_result_sizes(self, max_size):
+        """
+        SetMaximumResultSize is used to change the maximum number of records that can be returned by functions that
+        accept a howMany argument. It is an account-wide setting that stays in effect until it is changed again.
+        Queries returning more than 15 records are billed as multiple queries.
+
+        max_size	int	maximum number of records returned by functions with a howMany argument
+        """
+        data = {"max_size": max_size}
+
+        def remember(result):
+            if not (isinstance(result, dict) and "error" in result):
+                self.max_result_size = max_size
+            return result
+        return self._request("SetMaximumResultSize", data, remember)
 
     def tail_owner(self, ident):
         """
@@ -430,15 +1030,65 @@ class Client(object):
         return self._request("ZipcodeInfo", data)
 
     def get_alerts(self):
-        raise NotImplementedError
+        """
+        GetAlerts retrieves all of the FlightXML flight alerts that are currently scheduled for the user.
 
-    def delete_alert(self):
-        raise NotImplementedError
+        Returns a FlightAlertListing: {"num_alerts": ..., "alerts": [FlightAlertEntry, ...]}
+        """
+        return self._request("GetAlerts")
 
-    def set_alert(self):
-        raise NotImplementedError
+    def delete_alert(self, alert_id):
+        """
+        DeleteAlert deletes a FlightXML flight alert. Returns 1 on success.
 
-    def register_alert_endpoint(self):
-        raise NotImplementedError
+        alert_id	int	the alert_id of the alert to delete, as returned by SetAlert or GetAlerts
+        """
+        data = {"alert_id": alert_id}
+        return self._request("DeleteAlert", data)
+
+    def set_alert(self, alert_id=0, ident=None, origin=None, destination=None, aircraft_type=None, date_start=None,
+                  date_end=None, channels=DEFAULT_ALERT_CHANNELS, enabled=True, max_weekly=1000):
+        """
+        SetAlert creates or updates a FlightXML flight alert. Alerts are delivered to the endpoint registered with
+        RegisterAlertEndpoint, see flightaware.alerts for a receiver. Returns the alert_id.
+
+        alert_id	int	alert_id of an existing alert to update, or 0 to create a new alert
+        ident	string	flight ident or tail number to alert on
+        origin	string	optional ICAO airport ID of the origin
+        destination	string	optional ICAO airport ID of the destination
+        aircrafttype	string	optional aircraft type ID
+        date_start	datetime	first day the alert is active (or int UNIX epoch seconds), 0 or None for today
+        date_end	datetime	last day the alert is active (or int UNIX epoch seconds), 0 or None for a recurring alert
+        channels	string	channel id and events to deliver, see alert_channels()
+        enabled	boolean	whether the alert is active
+        max_weekly	int	maximum number of alerts delivered per week
+        """
+        data = {
+            "alert_id": alert_id,
+            "ident": ident,
+            "origin": origin,
+            "destination": destination,
+            "aircrafttype": aircraft_type,
+            "date_start": _epoch_seconds(date_start),
+            "date_end": _epoch_seconds(date_end),
+            "channels": channels,
+            "enabled": "true" if enabled else "false",
+            "max_weekly": max_weekly,
+        }
+        return self._request("SetAlert", data)
+
+    def register_alert_endpoint(self, address, format_type="json/post"):
+        """
+        RegisterAlertEndpoint sets the URL FlightAware POSTs triggered alerts to. There is one endpoint per account,
+        registering another one replaces it. Returns 1 on success.
+
+        address	string	URL of the endpoint, for example the address of a flightaware.alerts.AlertReceiver
+        format_type	string	must be "json/post"
+        """
+        data = {
+            "address": address,
+            "format_type": format_type,
+        }
+        return self._request("RegisterAlertEndpoint", data)
 
 
@@ -0,0 +1,87 @@
+"""
+Request coalescing: concurrent callers asking for the same key share one call and its result.
+"""
+import asyncio
+import threading
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Thread-safe coalescing. The first caller for a key runs the function, callers arriving while it runs wait for it and
+    get the same result (or exception).
+
+    calls   number of do() calls
+    shared  number of calls answered by another caller's call, i.e. calls saved
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def do(self, key, function):
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = function()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
+
+
+class AsyncSingleFlight(object):
+    """
+    asyncio coalescing, see SingleFlight. do() takes a function returning an awaitable.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}
+
+    async def do(self, key, function):
+        self.calls += 1
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.shared += 1
+            # shield: a waiter being cancelled must not cancel the call the others are waiting on
+            return await asyncio.shield(future)
+
+        future = self._in_flight[key] = asyncio.ensure_future(function())
+
+        def forget(_):
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
@@ -0,0 +1,108 @@
+"""
+Column-oriented decoding of list responses, used by Client(result_mode=ResultMode.COLUMNS).
+
+A list of records becomes a Columns dict mapping every field to one array. With NumPy installed, timestamps become UTC
+datetime64[s] arrays and numeric fields int64/float64 arrays. Without NumPy, timestamps stay epoch seconds and numeric
+fields use array.array typed arrays. Missing or 0 timestamps are NaT (NumPy) or 0, missing numbers are 0.
+"""
+import array
+
+try:
+    import numpy
+except ImportError:     # optional dependency, pure-python typed arrays are used instead
+    numpy = None
+
+
+class Columns(dict):
+    """
+    Mapping of field name to column, num_rows is the number of records.
+    """
+    def __init__(self, columns, num_rows):
+        super(Columns, self).__init__(columns)
+        self.num_rows = num_rows
+
+
+class ColumnSpec(object):
+    """
+    Typed fields of a record structure, everything else is kept as a list of python values.
+    """
+    def __init__(self, time_fields=(), int_fields=(), float_fields=()):
+        self.time_fields = frozenset(time_fields)
+        self.int_fields = frozenset(int_fields)
+        self.float_fields = frozenset(float_fields)
+
+    def column(self, name, values):
+        if name in self.time_fields:
+            return time_column(values)
+        if name in self.int_fields:
+            return number_column(values, "q", "int64")
+        if name in self.float_fields:
+            return number_column(values, "d", "float64")
+        return values
+
+
+def time_column(values):
+    if numpy is not None:
+        # FlightXML sends 0 for unknown times, e.g. actualarrivaltime of a flight still enroute
+        seconds = numpy.array([0 if value is None else value for value in values], dtype="int64")
+        output = seconds.astype("datetime64[s]")
+        output[seconds <= 0] = numpy.datetime64("NaT")
+        return output
+    return array.array("q", [value or 0 for value in values])
+
+
+def number_column(values, typecode, dtype):
+    values = [value or 0 for value in values]
+    if numpy is not None:
+        return numpy.array(values, dtype=dtype)
+    return array.array(typecode, values)
+
+
+def to_columns(records, spec):
+    """
+    Transpose a list of record dicts into Columns. Fields missing from a record get None before typing.
+    """
+    names = list(dict.fromkeys(name for record in records for name in record))
+    columns = dict((name, spec.column(name, [record.get(name) for record in records])) for name in names)
+    return Columns(columns, len(records))
+
+
+def column_decoder(spec, key=None):
+    """
+    Build a result decoder for a method returning a list of records, or a dict holding that list under key.
+    """
+    def decode(result):
+        if key is None:
+            return to_columns(result, spec) if isinstance(result, list) else result
+        if not isinstance(result, dict) or "error" in result:
+            return result
+        output = dict(result)
+        output[key] = to_columns(result.get(key) or [], spec)
+        return output
+    return decode
+
+
+BOARD_TIMES = ("actualdeparturetime", "actualarrivaltime", "estimatedarrivaltime", "filed_departuretime")
+
+SCHEDULE_SPEC = ColumnSpec(time_fields=("departuretime", "arrivaltime"),
+                           int_fields=("seats_cabin_first", "seats_cabin_business", "seats_cabin_coach"))
+BOARD_SPEC = ColumnSpec(time_fields=BOARD_TIMES)
+SEARCH_SPEC = ColumnSpec(time_fields=("timestamp", "departureTime", "firstPositionTime", "arrivalTime"),
+                         int_fields=("heading", "altitude", "groundspeed"),
+                         float_fields=("latitude", "longitude", "lowLatitude", "lowLongitude", "highLatitude", "highLongitude"))
+ROUTE_SPEC = ColumnSpec(float_fields=("latitude", "longitude"))
+POSITION_SPEC = ColumnSpec(time_fields=("timestamp", ), int_fields=("altitude", "groundspeed"),
+                           float_fields=("latitude", "longitude"))
+
+COLUMN_DECODERS = {
+    "AirlineFlightSchedules": column_decoder(SCHEDULE_SPEC),
+    "Arrived": column_decoder(BOARD_SPEC, "arrivals"),
+    "Departed": column_decoder(BOARD_SPEC, "departures"),
+    "DecodeFlightRoute": column_decoder(ROUTE_SPEC),
+    "DecodeRoute": column_decoder(ROUTE_SPEC),
+    "Enroute": column_decoder(BOARD_SPEC, "enroute"),
+    "Scheduled": column_decoder(BOARD_SPEC, "scheduled"),
+    "Search": column_decoder(SEARCH_SPEC, "aircraft"),
+    "SearchBirdseyeInFlight": column_decoder(SEARCH_SPEC, "aircraft"),
+    "SearchBirdseyePositions": column_decoder(POSITION_SPEC),
+}
@@ -0,0 +1,184 @@
+"""
+JSON decoding of FlightXML responses.
+
+loads() uses orjson when it is installed and the standard library otherwise.
+
+ArrayStreamParser decodes a response incrementally: fed the body chunk by chunk as it arrives, it returns the items of
+the array at a given key path ({"<Method>Result": {"data": [...]}} for FlightXML) one by one, so memory is bounded by
+a chunk and one item instead of the whole response. All other members met on the way are collected in meta.
+
+Streaming is much slower than loads() on the whole body and only pays off for large responses, array_items() gives the
+same items and meta for a document decoded in one go.
+"""
+import codecs
+import json
+import re
+
+try:
+    import orjson
+except ImportError:     # optional dependency, the standard library decoder is used instead
+    orjson = None
+
+loads = orjson.loads if orjson is not None else json.loads
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+_NUMBER_TAIL = frozenset("0123456789+-.eE")
+_MORE = object()
+
+
+def array_items(document, path):
+    """
+    The (items, meta) ArrayStreamParser(path) returns for document, once decoded as a whole.
+    """
+    if not isinstance(document, dict):
+        raise ValueError("expected a JSON object")
+    meta = {}
+    node = document
+    for depth, name in enumerate(path):
+        wanted = list if depth == len(path) - 1 else dict
+        meta.update((key, value) for key, value in node.items() if key != name or not isinstance(value, wanted))
+        node = node.get(name)
+        if not isinstance(node, wanted):
+            return [], meta
+    return node, meta
+
+
+class ArrayStreamParser(object):
+    """
+    path    keys leading from the top-level object to the array to stream
+
+        parser = ArrayStreamParser(["AllAirportsResult", "data"])
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                ...
+        parser.close()
+    """
+    def __init__(self, path):
+        self.path = list(path)
+        self.meta = {}
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._raw_decode = json.JSONDecoder().raw_decode
+        self._buffer = ""
+        self._position = 0
+        self._closed = False
+        self._done = False
+        self._parser = self._object(0)
+
+    def feed(self, data):
+        """
+        Add the next chunk of the body, return the items it completed.
+        """
+        self._buffer = self._buffer[self._position:] + self._decoder.decode(data)
+        self._position = 0
+        return self._drain()
+
+    def close(self):
+        """
+        Mark the end of the body, return the last items. Raises ValueError when the body was cut short.
+        """
+        self._buffer = self._buffer[self._position:] + self._decoder.decode(b"", final=True)
+        self._position = 0
+        self._closed = True
+        items = self._drain()
+        if not self._done:
+            raise ValueError("unexpected end of JSON")
+        return items
+
+    def _drain(self):
+        items = []
+        while not self._done:
+            try:
+                item = next(self._parser)
+            except StopIteration:
+                self._done = True
+                break
+            if item is _MORE:
+                break
+            items.append(item)
+        return items
+
+    # the parsing generators below yield _MORE when they need the next chunk and an item for every array item
+
+    def _skip_whitespace(self):
+        while True:
+            self._position = _WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return
+            if self._closed:
+                raise ValueError("unexpected end of JSON")
+            yield _MORE
+
+    def _peek(self):
+        yield from self._skip_whitespace()
+        return self._buffer[self._position]
+
+    def _expect(self, characters):
+        character = yield from self._peek()
+        if character not in characters:
+            raise ValueError("expected {!r} at {!r}".format(characters, self._buffer[self._position:self._position + 20]))
+        self._position += 1
+        return character
+
+    def _value(self):
+        while True:
+            yield from self._skip_whitespace()
+            try:
+                value, end = self._raw_decode(self._buffer, self._position)
+            except ValueError:
+                if self._closed:
+                    raise
+            else:
+                # a number cut by the end of the buffer ("-4." or "12") may continue in the next chunk
+                if self._closed or (end < len(self._buffer) and self._buffer[end] not in _NUMBER_TAIL):
+                    self._position = end
+                    return value
+            yield _MORE
+
+    def _object(self, depth):
+        yield from self._expect("{")
+        if (yield from self._peek()) == "}":
+            self._position += 1
+            return
+        while True:
+            key = yield from self._value()
+            yield from self._expect(":")
+            on_path = depth < len(self.path) and key == self.path[depth]
+            following = yield from self._peek()
+            if on_path and depth == len(self.path) - 1 and following == "[":
+                yield from self._array()
+            elif on_path and depth < len(self.path) - 1 and following == "{":
+                yield from self._object(depth + 1)
+            else:
+                self.meta[key] = yield from self._value()
+            if (yield from self._expect(",}")) == "}":
+                return
+
+    def _array(self):
+        yield from self._expect("[")
+        if (yield from self._peek()) == "]":
+            self._position += 1
+            return
+        while True:
+            # fast path over the items that are complete in the buffer, an item is complete once its separator is
+            buffer = self._buffer
+            position = _WHITESPACE.match(buffer, self._position).end()
+            while True:
+                try:
+                    value, end = self._raw_decode(buffer, position)
+                except ValueError:
+                    break
+                separator = _SEPARATOR.match(buffer, end)
+                if separator is None:
+                    break
+                yield value
+                position = separator.end()
+                if separator.group(1) == "]":
+                    self._position = position
+                    return
+            self._position = position
+            # an item cut by the end of the buffer
+            yield (yield from self._value())
+            if (yield from self._expect(",]")) == "]":
+                return
+
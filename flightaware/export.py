@@ -0,0 +1,178 @@
+"""
+Bulk export of AirlineFlightSchedules into columnar files.
+
+A date range is split into shards that are fetched in parallel. Each shard is streamed page by page into its own
+Parquet (or Arrow IPC) part file, so memory stays bounded by one batch per worker. A part file only appears under its
+final name once the shard is complete, which makes it the checkpoint: running the same export again skips finished
+shards and resumes the rest.
+
+Requires the pyarrow package.
+"""
+import collections
+import datetime
+import logging
+import os
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:     # optional dependency, only needed by ScheduleExporter
+    pyarrow = None
+
+from flightaware.client import ResultMode, to_unix_timestamp
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+logger = logging.getLogger("flightaware.export")
+
+DEFAULT_SHARD = datetime.timedelta(days=1)
+DEFAULT_BATCH_SIZE = 10000
+
+STRING_FIELDS = ("ident", "actual_ident", "origin", "destination", "aircrafttype", "meal_service")
+TIME_FIELDS = ("departuretime", "arrivaltime")
+INT_FIELDS = ("seats_cabin_first", "seats_cabin_business", "seats_cabin_coach")
+
+
+class ExportFormat(object):
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+def shard_date_range(start_date, end_date, shard=DEFAULT_SHARD):
+    """
+    Split [start_date, end_date) into consecutive (start, end) windows of at most shard length.
+    """
+    shards = []
+    start = start_date
+    while start < end_date:
+        end = min(start + shard, end_date)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def operated_flight_key(record):
+    """
+    Key shared by an operated flight and all of its codeshares, which carry the operating flight in actual_ident.
+    """
+    return record.get("actual_ident") or record.get("ident"), record.get("departuretime"), record.get("origin"), record.get("destination")
+
+
+def dedupe_codeshares(records, seen=None):
+    """
+    Collapse codeshare duplicates of the same operated flight, keeping the operating carrier's own record in preference
+    to its codeshares. Keys in seen are dropped as already emitted, seen is updated with the returned records.
+    """
+    output = collections.OrderedDict()
+    for record in records:
+        key = operated_flight_key(record)
+        if seen is not None and key in seen:
+            continue
+        current = output.get(key)
+        if current is None or (current.get("actual_ident") and not record.get("actual_ident")):
+            output[key] = record
+    if seen is not None:
+        seen.update(output)
+    return list(output.values())
+
+
+def schedule_schema():
+    fields = [pyarrow.field(name, pyarrow.string()) for name in STRING_FIELDS]
+    fields += [pyarrow.field(name, pyarrow.timestamp("s", tz="UTC")) for name in TIME_FIELDS]
+    fields += [pyarrow.field(name, pyarrow.int32()) for name in INT_FIELDS]
+    return pyarrow.schema(fields)
+
+
+class ScheduleExporter(object):
+    """
+    Export AirlineFlightSchedules for a date range into one part file per shard under output_dir.
+
+        exporter = ScheduleExporter(client, "schedules/", shard=datetime.timedelta(hours=6), max_workers=16)
+        paths = exporter.export(start, end, origin="KBNA")
+
+    client          Client in ResultMode.DICT, schedules are read as dicts; every shard pages on its own connection, so
+                    give its pool max_workers connections
+    shard           length of one shard
+    max_workers     number of shards fetched in parallel
+    page_size       records per call, see Client.iter_airline_flight_schedules
+    batch_size      records buffered per shard before they are written out
+    dedupe          drop codeshare duplicates
+    """
+    def __init__(self, client, output_dir, shard=DEFAULT_SHARD, max_workers=8, page_size=None,
+                 batch_size=DEFAULT_BATCH_SIZE, dedupe=True, format=ExportFormat.PARQUET):
+        if pyarrow is None:
+            raise ImportError("ScheduleExporter requires the pyarrow package")
+        if getattr(client, "result_mode", ResultMode.DICT) != ResultMode.DICT:
+            raise ValueError("ScheduleExporter needs a client in ResultMode.DICT")
+        self.client = client
+        self.output_dir = output_dir
+        self.shard = shard
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.dedupe = dedupe
+        self.format = format
+        self.schema = schedule_schema()
+
+    def part_path(self, shard_start):
+        return os.path.join(self.output_dir, "{}.{}".format(shard_start.strftime("%Y%m%dT%H%M%S"), self.format))
+
+    def export(self, start_date, end_date, origin=None, destination=None, airline=None, flight_number=None):
+        """
+        Export every shard of [start_date, end_date) that has no part file yet and return the paths of all part files.
+        """
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        shards = shard_date_range(start_date, end_date, self.shard)
+        todo = [shard for shard in shards if not os.path.exists(self.part_path(shard[0]))]
+        logger.info("exporting %s of %s shards", len(todo), len(shards))
+
+        self.client.ensure_result_size(self.page_size)
+
+        def run(shard):
+            return self.export_shard(shard[0], shard[1], origin, destination, airline, flight_number)
+
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # list() re-raises the first failure, finished shards stay on disk for the next run
+            list(executor.map(run, todo))
+        return [self.part_path(shard[0]) for shard in shards]
+
+    def export_shard(self, shard_start, shard_end, origin=None, destination=None, airline=None, flight_number=None):
+        path = self.part_path(shard_start)
+        tmp_path = path + ".tmp"
+        # the API window is inclusive, keep flights on the boundary in the later shard only
+        lower, upper = to_unix_timestamp(shard_start), to_unix_timestamp(shard_end)
+        records = self.client.iter_airline_flight_schedules(shard_start, shard_end, origin=origin, destination=destination,
+                                                            airline=airline, flight_number=flight_number, page_size=self.page_size)
+        writer = self._open_writer(tmp_path)
+        # keys of the flights written so far, so codeshares split across batches are still dropped
+        seen = set() if self.dedupe else None
+        count = 0
+        try:
+            batch = []
+            for record in records:
+                if lower <= record["departuretime"] < upper:
+                    batch.append(record)
+                if len(batch) >= self.batch_size:
+                    count += self._write_batch(writer, batch, seen)
+                    batch = []
+            count += self._write_batch(writer, batch, seen)
+        finally:
+            writer.close()
+        os.rename(tmp_path, path)
+        logger.debug("wrote %s records to %s", count, path)
+        return count
+
+    def _open_writer(self, path):
+        if self.format == ExportFormat.ARROW:
+            return pyarrow.ipc.new_file(path, self.schema)
+        return pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def _write_batch(self, writer, batch, seen=None):
+        if self.dedupe:
+            batch = dedupe_codeshares(batch, seen)
+        if not batch:
+            return 0
+        columns = [pyarrow.array([record.get(field.name) for record in batch], type=field.type) for field in self.schema]
+        writer.write_table(pyarrow.Table.from_arrays(columns, schema=self.schema))
+        return len(batch)
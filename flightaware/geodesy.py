@@ -0,0 +1,77 @@
+"""
+Local great-circle math replacing the LatLongsToDistance and LatLongsToHeading FlightXML calls.
+
+Distances are statute miles on a spherical earth, headings are initial bearings in degrees clockwise from true north.
+The *_matrix functions compute every pair of two coordinate sets in one vectorized pass when NumPy is installed and
+fall back to nested lists otherwise.
+"""
+import math
+
+try:
+    import numpy
+except ImportError:     # optional dependency, pure-python loops are used instead
+    numpy = None
+
+EARTH_RADIUS_MILES = 3958.7613
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance in statute miles between two positions (haversine formula).
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def heading(lat1, lon1, lat2, lon2):
+    """
+    Initial bearing in degrees [0, 360) when flying the great circle from the first position to the second.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    y = math.sin(d_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def _grid(lats1, lons1, lats2, lons2):
+    # radians shaped (n, 1) for the first set and (1, m) for the second, so arithmetic broadcasts to (n, m)
+    if lats2 is None:
+        lats2, lons2 = lats1, lons1
+    phi1 = numpy.radians(numpy.asarray(lats1, dtype="float64"))[:, None]
+    lambda1 = numpy.radians(numpy.asarray(lons1, dtype="float64"))[:, None]
+    phi2 = numpy.radians(numpy.asarray(lats2, dtype="float64"))[None, :]
+    lambda2 = numpy.radians(numpy.asarray(lons2, dtype="float64"))[None, :]
+    return phi1, phi2, lambda2 - lambda1
+
+
+def distance_matrix(lats1, lons1, lats2=None, lons2=None):
+    """
+    Distances in statute miles from every position of the first set to every position of the second set (or of the
+    first set against itself). Returns an (n, m) array, or a list of lists without NumPy.
+    """
+    if numpy is None:
+        if lats2 is None:
+            lats2, lons2 = lats1, lons1
+        return [[distance(lat1, lon1, lat2, lon2) for lat2, lon2 in zip(lats2, lons2)] for lat1, lon1 in zip(lats1, lons1)]
+    phi1, phi2, d_lambda = _grid(lats1, lons1, lats2, lons2)
+    a = numpy.sin((phi2 - phi1) / 2) ** 2 + numpy.cos(phi1) * numpy.cos(phi2) * numpy.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+def heading_matrix(lats1, lons1, lats2=None, lons2=None):
+    """
+    Initial bearings in degrees from every position of the first set to every position of the second set (or of the
+    first set against itself). Returns an (n, m) array, or a list of lists without NumPy.
+    """
+    if numpy is None:
+        if lats2 is None:
+            lats2, lons2 = lats1, lons1
+        return [[heading(lat1, lon1, lat2, lon2) for lat2, lon2 in zip(lats2, lons2)] for lat1, lon1 in zip(lats1, lons1)]
+    phi1, phi2, d_lambda = _grid(lats1, lons1, lats2, lons2)
+    y = numpy.sin(d_lambda) * numpy.cos(phi2)
+    x = numpy.cos(phi1) * numpy.sin(phi2) - numpy.sin(phi1) * numpy.cos(phi2) * numpy.cos(d_lambda)
+    return numpy.degrees(numpy.arctan2(y, x)) % 360
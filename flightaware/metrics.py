@@ -0,0 +1,223 @@
+"""
+Per-method instrumentation of FlightXML requests.
+
+Pass an Instrumentation to a client to collect, for every FlightXML method:
+
+- latency histograms of the connect phase (opening a new connection, AsyncClient only), the server phase (request sent
+  until response headers, for Client including connection setup) the transfer phase (reading the body) and the JSON
+  decode phase
+- request and response body bytes
+- transport errors and FlightXML {"error": ...} responses
+- cache hits and misses, and calls answered by a coalesced request
+
+Every observation is also handed to the registered hooks as an Event, StatsdHook forwards them to StatsD.
+prometheus_text() renders the collected totals in the Prometheus text exposition format.
+"""
+import bisect
+import collections
+import socket
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("connect", "server", "transfer", "decode")
+
+
+class EventKind(object):
+    REQUEST = "request"
+    ERROR = "error"
+    CACHE_HIT = "cache_hit"
+    CACHE_MISS = "cache_miss"
+    COALESCED = "coalesced"
+
+
+class Event(object):
+    """
+    One observation. Timings are seconds, they and the byte counts are only set for REQUEST events.
+    """
+    __slots__ = ("kind", "method", "connect", "server", "transfer", "decode", "request_bytes", "response_bytes", "status", "api_error", "error")
+
+    def __init__(self, kind, method, connect=None, server=None, transfer=None, decode=None, request_bytes=0, response_bytes=0,
+                 status=None, api_error=False, error=None):
+        self.kind = kind
+        self.method = method
+        self.connect = connect
+        self.server = server
+        self.transfer = transfer
+        self.decode = decode
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.status = status
+        self.api_error = api_error
+        self.error = error
+
+
+class Histogram(object):
+    """
+    Cumulative-bucket histogram, not thread-safe on its own.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        Yield (upper bound, observations at or below it) pairs, the last bound is "+Inf".
+        """
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf", ), self.counts):
+            total += count
+            yield bound, total
+
+
+class MethodStats(object):
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.requests = 0
+        self.errors = 0
+        self.api_errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = dict((phase, Histogram(buckets)) for phase in PHASES)
+
+    def as_dict(self):
+        output = dict((name, value) for name, value in self.__dict__.items() if name != "latency")
+        output["latency"] = dict((phase, {"count": histogram.count, "sum": histogram.sum}) for phase, histogram in self.latency.items())
+        return output
+
+
+class Instrumentation(object):
+    """
+    Collects per-method statistics and dispatches every Event to the hooks, callables taking the event.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, hooks=None):
+        self.buckets = buckets
+        self.hooks = list(hooks or [])
+        self.methods = collections.defaultdict(lambda: MethodStats(self.buckets))
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def record(self, event):
+        with self._lock:
+            stats = self.methods[event.method]
+            if event.kind == EventKind.REQUEST:
+                stats.requests += 1
+                stats.request_bytes += event.request_bytes
+                stats.response_bytes += event.response_bytes
+                stats.api_errors += event.api_error
+                for phase in PHASES:
+                    value = getattr(event, phase)
+                    if value is not None:
+                        stats.latency[phase].observe(value)
+            elif event.kind == EventKind.ERROR:
+                stats.errors += 1
+            elif event.kind == EventKind.CACHE_HIT:
+                stats.cache_hits += 1
+            elif event.kind == EventKind.CACHE_MISS:
+                stats.cache_misses += 1
+            elif event.kind == EventKind.COALESCED:
+                stats.coalesced += 1
+        for hook in self.hooks:
+            hook(event)
+
+    def request(self, method, connect, server, transfer, decode, request_bytes, response_bytes, status, result):
+        api_error = isinstance(result, dict) and "error" in result
+        self.record(Event(EventKind.REQUEST, method, connect, server, transfer, decode, request_bytes, response_bytes,
+                          status, api_error))
+
+    def error(self, method, error):
+        self.record(Event(EventKind.ERROR, method, error=error))
+
+    def cache(self, method, hit):
+        self.record(Event(EventKind.CACHE_HIT if hit else EventKind.CACHE_MISS, method))
+
+    def coalesced(self, method):
+        self.record(Event(EventKind.COALESCED, method))
+
+    def snapshot(self):
+        with self._lock:
+            return dict((method, stats.as_dict()) for method, stats in self.methods.items())
+
+
+def _labels(**labels):
+    return "{" + ",".join('{}="{}"'.format(name, value) for name, value in sorted(labels.items())) + "}"
+
+
+def prometheus_text(instrumentation, prefix="flightaware"):
+    """
+    Render the statistics of an Instrumentation in the Prometheus text exposition format.
+    """
+    counters = (
+        ("requests_total", "requests sent", lambda stats: [({}, stats.requests)]),
+        ("errors_total", "failed requests", lambda stats: [({"kind": "transport"}, stats.errors), ({"kind": "api"}, stats.api_errors)]),
+        ("cache_total", "cache lookups", lambda stats: [({"result": "hit"}, stats.cache_hits), ({"result": "miss"}, stats.cache_misses)]),
+        ("coalesced_total", "calls answered by a coalesced request", lambda stats: [({}, stats.coalesced)]),
+        ("request_bytes_total", "request body bytes", lambda stats: [({}, stats.request_bytes)]),
+        ("response_bytes_total", "response body bytes as transferred, compressed if gzipped", lambda stats: [({}, stats.response_bytes)]),
+    )
+    lines = []
+    with instrumentation._lock:
+        methods = sorted(instrumentation.methods.items())
+        for name, help_text, values in counters:
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} counter".format(prefix, name))
+            for method, stats in methods:
+                for labels, value in values(stats):
+                    lines.append("{}_{}{} {}".format(prefix, name, _labels(method=method, **labels), value))
+
+        name = "{}_request_seconds".format(prefix)
+        lines.append("# HELP {} request latency by phase".format(name))
+        lines.append("# TYPE {} histogram".format(name))
+        for method, stats in methods:
+            for phase in PHASES:
+                histogram = stats.latency[phase]
+                for bound, count in histogram.cumulative():
+                    lines.append("{}_bucket{} {}".format(name, _labels(method=method, phase=phase, le=bound), count))
+                lines.append("{}_sum{} {}".format(name, _labels(method=method, phase=phase), histogram.sum))
+                lines.append("{}_count{} {}".format(name, _labels(method=method, phase=phase), histogram.count))
+    return "\n".join(lines) + "\n"
+
+
+class StatsdHook(object):
+    """
+    Instrumentation hook sending every event to a StatsD server over UDP.
+
+        instrumentation.add_hook(StatsdHook("localhost", 8125))
+    """
+    def __init__(self, host="127.0.0.1", port=8125, prefix="flightaware"):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        base = "{}.{}".format(self.prefix, event.method)
+        lines = ["{}.{}:1|c".format(base, event.kind)]
+        if event.kind == EventKind.REQUEST:
+            for phase in PHASES:
+                value = getattr(event, phase)
+                if value is not None:
+                    lines.append("{}.{}:{:.3f}|ms".format(base, phase, value * 1000))
+            lines.append("{}.request_bytes:{}|c".format(base, event.request_bytes))
+            lines.append("{}.response_bytes:{}|c".format(base, event.response_bytes))
+            if event.api_error:
+                lines.append("{}.api_error:1|c".format(base))
+        try:
+            self.socket.sendto("\n".join(lines).encode("utf-8"), self.address)
+        except socket.error:
+            pass
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,94 @@
+"""
+Lazy iteration over the FlightXML methods that page with howMany/offset.
+
+A page is fetched with call(how_many, offset). The result is either a list of records or, when key is given, a dict
+holding the records under key and the offset of the following page under "next_offset" (-1 on the last page).
+Iteration stops on the last page or on the first page shorter than page_size. Column batches are yielded whole, one
+per page.
+"""
+import asyncio
+
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+
+class FlightAwareError(Exception):
+    """
+    Raised when FlightXML answers with an {"error": ...} response where records were expected.
+    """
+
+
+def _split_page(result, key, offset):
+    """
+    Return (records to yield, number of rows on the page, next offset).
+    """
+    if isinstance(result, dict) and not hasattr(result, "num_rows"):
+        if "error" in result:
+            raise FlightAwareError(result["error"])
+        records = result.get(key) or []
+        next_offset = result.get("next_offset")
+    else:
+        records = result or []
+        next_offset = None
+    # column batches (see flightaware.columnar) know their row count and are yielded whole
+    rows = getattr(records, "num_rows", None)
+    if rows is None:
+        rows = len(records)
+    elif rows:
+        records = [records]
+    else:
+        records = []
+    if next_offset is None:
+        next_offset = offset + rows
+    return records, rows, next_offset
+
+
+def _is_last_page(rows, next_offset, page_size):
+    return rows < page_size or next_offset < 0
+
+
+def iter_pages(call, page_size, key=None, offset=0, prefetch=True):
+    """
+    Yield records page by page. With prefetch the next page is requested on a background thread while the records of
+    the current page are consumed.
+    """
+    executor = ContextThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    def fetch(page_offset):
+        if executor is None:
+            return _split_page(call(page_size, page_offset), key, page_offset)
+        return executor.submit(lambda: _split_page(call(page_size, page_offset), key, page_offset))
+
+    try:
+        pending = fetch(offset)
+        while pending is not None:
+            records, rows, next_offset = pending if executor is None else pending.result()
+            pending = None if _is_last_page(rows, next_offset, page_size) else fetch(next_offset)
+            for record in records:
+                yield record
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+async def aiter_pages(call, page_size, key=None, offset=0, prefetch=True):
+    """
+    asyncio version of iter_pages, call returns an awaitable. With prefetch the next page is requested as a task.
+    """
+    async def fetch(page_offset):
+        return _split_page(await call(page_size, page_offset), key, page_offset)
+
+    pending = asyncio.ensure_future(fetch(offset)) if prefetch else fetch(offset)
+    try:
+        while pending is not None:
+            records, rows, next_offset = await pending
+            pending = None
+            if not _is_last_page(rows, next_offset, page_size):
+                pending = asyncio.ensure_future(fetch(next_offset)) if prefetch else fetch(next_offset)
+            for record in records:
+                yield record
+    finally:
+        if pending is not None:
+            if asyncio.isfuture(pending):
+                pending.cancel()
+            else:
+                pending.close()
@@ -0,0 +1,109 @@
+"""
+Compact record types for the main FlightXML structures, used by Client(result_mode=ResultMode.RECORDS).
+
+Records are namedtuples with empty __slots__, so each one costs a tuple rather than a dict. Fields keep the FlightXML
+names and raw values (times stay epoch seconds), fields FlightXML adds later are dropped. Records are immutable, use
+to_dict() to get a plain dict back.
+
+The field values dominate the size, so the saving is moderate: a schedule record takes about 60% of the memory of its
+dict (554 vs 919 bytes in benchmarks.suite). Records are built from the decoded dicts, which makes decoding slower
+than dict mode (about 2.5x), use them for results that are kept around rather than for throughput.
+"""
+import collections
+import datetime
+
+
+def record_type(name, fields, doc=None):
+    """
+    Create a namedtuple based record class with a fast from_dict decoder.
+    """
+    base = collections.namedtuple(name, fields)
+
+    def from_dict(cls, data):
+        return cls._make(map(data.get, cls._fields))
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+    namespace = {
+        "__slots__": (),
+        "__doc__": doc or base.__doc__,
+        "from_dict": classmethod(from_dict),
+        "to_dict": to_dict,
+    }
+    return type(name, (base, ), namespace)
+
+
+_ScheduledFlight = record_type("ScheduledFlight", [
+    "ident", "actual_ident", "departuretime", "arrivaltime", "origin", "destination", "aircrafttype", "meal_service",
+    "seats_cabin_first", "seats_cabin_business", "seats_cabin_coach",
+])
+
+
+class ScheduledFlight(_ScheduledFlight):
+    """
+    One AirlineFlightSchedules entry.
+    """
+    __slots__ = ()
+
+    @property
+    def departure_time(self):
+        return datetime.datetime.fromtimestamp(self.departuretime)
+
+    @property
+    def arrival_time(self):
+        return datetime.datetime.fromtimestamp(self.arrivaltime)
+
+
+FlightEx = record_type("FlightEx", [
+    "faFlightID", "ident", "aircrafttype", "filed_ete", "filed_time", "filed_departuretime", "filed_airspeed_kts",
+    "filed_airspeed_mach", "filed_altitude", "route", "actualdeparturetime", "estimatedarrivaltime", "actualarrivaltime",
+    "diverted", "origin", "destination", "originName", "originCity", "destinationName", "destinationCity",
+], "One FlightInfoEx flight.")
+
+TrackPoint = record_type("TrackPoint", [
+    "timestamp", "latitude", "longitude", "groundspeed", "altitude", "altitudeStatus", "updateType", "altitudeChange",
+], "One GetHistoricalTrack/GetLastTrack position.")
+
+Airport = record_type("Airport", [
+    "name", "location", "longitude", "latitude", "timezone",
+], "AirportInfo result.")
+
+Metar = record_type("Metar", [
+    "airport", "time", "cloud_friendly", "cloud_altitude", "cloud_type", "conditions", "pressure", "temp_air",
+    "temp_dewpoint", "temp_relhum", "visibility", "wind_friendly", "wind_direction", "wind_speed", "wind_speed_gust",
+    "raw_data",
+], "One MetarEx report.")
+
+RoutePoint = record_type("RoutePoint", [
+    "name", "type", "latitude", "longitude",
+], "One DecodeRoute/DecodeFlightRoute point.")
+
+
+def record_decoder(record_class, key=None, many=True):
+    """
+    Build a result decoder for a method returning one record, a list of records, or a dict holding that list under key.
+    """
+    def decode(result):
+        if isinstance(result, dict) and "error" in result:
+            return result
+        if not many:
+            return record_class.from_dict(result)
+        if key is None:
+            return [record_class.from_dict(item) for item in result]
+        output = dict(result)
+        output[key] = [record_class.from_dict(item) for item in result.get(key) or []]
+        return output
+    return decode
+
+
+RECORD_DECODERS = {
+    "AirlineFlightSchedules": record_decoder(ScheduledFlight),
+    "AirportInfo": record_decoder(Airport, many=False),
+    "DecodeFlightRoute": record_decoder(RoutePoint),
+    "DecodeRoute": record_decoder(RoutePoint),
+    "FlightInfoEx": record_decoder(FlightEx, "flights"),
+    "GetHistoricalTrack": record_decoder(TrackPoint),
+    "GetLastTrack": record_decoder(TrackPoint),
+    "MetarEx": record_decoder(Metar, "metar"),
+}
@@ -0,0 +1,209 @@
+"""
+Record and replay FlightXML responses.
+
+A ReplayArchive is one append-only file of zlib compressed responses keyed by method and parameters (see
+flightaware.cache.cache_key). The index is rebuilt on open by reading the entry headers only, a block cut short by a
+crash is truncated away. Recording the same request again shadows the older entry.
+
+Pass a ReplayTransport to a client to put the archive under every request:
+
+    with ReplayArchive("2014-05-13.fxr") as archive:
+        client = Client(username, api_key, transport=ReplayTransport(archive, ReplayMode.RECORD))
+        ...                 # yesterday: pay for the queries once
+        client = Client(username, api_key, transport=ReplayTransport(archive, ReplayMode.REPLAY))
+        ...                 # today: the same calls answered from disk, ReplayMissError for anything not recorded
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from flightaware.cache import MISSING, cache_key
+from flightaware.pagination import FlightAwareError
+from flightaware.resilience import WRITE_METHODS
+from flightaware.scheduler import is_throttled
+
+logger = logging.getLogger("flightaware.replay")
+
+MAGIC = b"FXR1"
+ENTRY_HEADER = struct.Struct("<4sHIId")     # magic, key length, body length, crc32 of the body, recorded at
+
+
+class ReplayMissError(FlightAwareError):
+    """
+    Raised in ReplayMode.REPLAY for a request that is not in the archive.
+    """
+
+
+class ReplayWriteError(ReplayMissError):
+    """
+    Raised in ReplayMode.REPLAY for a write method, replaying must never create or delete real alerts.
+    """
+
+
+class ReplayMode(object):
+    RECORD = "record"               # always send, record every response
+    REPLAY = "replay"               # never send anything, fully offline
+    FALLTHROUGH = "fallthrough"     # replay what is recorded, send and record the rest
+
+
+class ReplayArchive(object):
+    """
+    Append-only archive of responses, safe to share between threads.
+    """
+    def __init__(self, path, compression_level=6):
+        self.path = path
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._index = {}            # key => (offset of the body, body length, crc32, recorded at)
+        self._map = None
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self._file = open(path, "a+b")
+        self._size = os.path.getsize(path)
+        self._scan()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def _remap(self):
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+
+    def _scan(self):
+        self._remap()
+        offset = 0
+        while offset + ENTRY_HEADER.size <= self._size:
+            magic, key_length, body_length, crc, recorded = ENTRY_HEADER.unpack_from(self._map, offset)
+            body_offset = offset + ENTRY_HEADER.size + key_length
+            if magic != MAGIC or body_offset + body_length > self._size:
+                break
+            key = self._map[offset + ENTRY_HEADER.size:body_offset].decode("utf-8")
+            self._index[key] = (body_offset, body_length, crc, recorded)
+            offset = body_offset + body_length
+        if offset < self._size:
+            # an entry cut short by a crash during append
+            logger.warning("%s: truncating %s trailing bytes", self.path, self._size - offset)
+            self._map = None
+            self._file.truncate(offset)
+            self._size = offset
+            self._remap()
+
+    def put(self, key, result):
+        """
+        Append the response for key.
+        """
+        name = key.encode("utf-8")
+        body = zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"), self.compression_level)
+        recorded = time.time()
+        crc = zlib.crc32(body)
+        header = ENTRY_HEADER.pack(MAGIC, len(name), len(body), crc, recorded)
+        with self._lock:
+            self._file.write(header + name + body)
+            self._file.flush()
+            self._index[key] = (self._size + len(header) + len(name), len(body), crc, recorded)
+            self._size += len(header) + len(name) + len(body)
+
+    def get(self, key, default=None):
+        """
+        The recorded response for key, or default.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return default
+            if self._map is None or len(self._map) < self._size:
+                self._remap()
+            offset, length, crc, _ = entry
+            body = self._map[offset:offset + length]
+        if zlib.crc32(body) != crc:
+            raise FlightAwareError("{}: corrupt entry for {}".format(self.path, key))
+        return json.loads(zlib.decompress(body).decode("utf-8"))
+
+    def recorded_at(self, key):
+        return self._index[key][3]
+
+    def keys(self):
+        return list(self._index)
+
+    def close(self):
+        self._file.close()
+        self._map = None
+
+
+class ReplayTransport(object):
+    """
+    Puts a ReplayArchive under the requests of a client, see ReplayMode. Only responses are recorded, requests that
+    fail with an exception are not, and neither are throttling errors. Other {"error": ...} responses such as an unknown
+    airport are, a strict replay must answer them too. Write methods (resilience.WRITE_METHODS) are never recorded,
+    they are sent in RECORD and FALLTHROUGH mode and raise ReplayWriteError in REPLAY mode.
+    """
+    def __init__(self, archive, mode=ReplayMode.FALLTHROUGH):
+        self.archive = archive
+        self.mode = mode
+        self.replayed = 0
+        self.recorded = 0
+        self.missed = 0
+
+    def _replay(self, method, key):
+        if self.mode != ReplayMode.RECORD:
+            result = self.archive.get(key, MISSING)
+            if result is not MISSING:
+                self.replayed += 1
+                return result
+            self.missed += 1
+            if self.mode == ReplayMode.REPLAY:
+                raise ReplayMissError("{} not recorded: {}".format(method, key))
+        return MISSING
+
+    def _check_write(self, method):
+        if self.mode == ReplayMode.REPLAY:
+            raise ReplayWriteError("{} not sent while replaying".format(method))
+
+    def _record(self, key, result):
+        # a replayed throttling error would never reach the server again
+        if not is_throttled(None, result):
+            self.archive.put(key, result)
+            self.recorded += 1
+        return result
+
+    def call(self, method, data, send):
+        """
+        Answer a request from the archive, or call send() and record its result.
+        """
+        if method in WRITE_METHODS:
+            self._check_write(method)
+            return send()
+        key = cache_key(method, data)
+        result = self._replay(method, key)
+        if result is not MISSING:
+            return result
+        return self._record(key, send())
+
+    async def call_async(self, method, data, send):
+        """
+        call() for asyncio, send returns an awaitable.
+        """
+        if method in WRITE_METHODS:
+            self._check_write(method)
+            return await send()
+        key = cache_key(method, data)
+        result = self._replay(method, key)
+        if result is not MISSING:
+            return result
+        return self._record(key, await send())
+
+    def stats(self):
+        return {"replayed": self.replayed, "recorded": self.recorded, "missed": self.missed, "entries": len(self.archive)}
@@ -0,0 +1,347 @@
+"""
+Tail latency and failure handling for FlightXML requests.
+
+RequestPolicy wraps every network request of a client:
+
+- hedging: when a cheap read (HEDGED_METHODS) has not been answered by the hedge_percentile latency of its method, a duplicate request is
+  sent and whichever answers first wins
+- retries: reads failing with a transport error are retried with exponential backoff
+- retry budget: hedges and retries spend tokens earned by first attempts, so they can never multiply the load while
+  FlightXML is struggling
+- circuit breaker: after consecutive outages (transport errors, server errors, bodies that are not JSON) requests fail
+  fast with CircuitOpenError until a trial request succeeds. Throttling is left to the RateScheduler backoff
+"""
+import asyncio
+import collections
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import requests
+
+from flightaware.pagination import FlightAwareError
+from flightaware.scheduler import ContextThreadPoolExecutor, is_throttled
+
+try:
+    import aiohttp
+    ASYNC_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+except ImportError:
+    ASYNC_ERRORS = (asyncio.TimeoutError, )
+
+# methods with side effects are never hedged, retried or coalesced: the server may have handled a request whose
+# response was lost
+WRITE_METHODS = frozenset(["DeleteAlert", "RegisterAlertEndpoint", "SetAlert", "SetMaximumResultSize"])
+
+# cheap idempotent reads, worth a duplicate request to cut their tail latency. Searches and schedules are billed by
+# the page and slow by nature, hedging them would double the cost of exactly the most expensive queries
+HEDGED_METHODS = frozenset(["AircraftType", "AirlineInfo", "AirportInfo", "FlightInfoEx", "GetFlightID", "Metar",
+                            "MetarEx", "NTaf", "Taf", "TailOwner", "ZipcodeInfo"])
+
+# transport failures only, an HTTP error status or an undecodable body (a 401 login page) will not go away on retry
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) + ASYNC_ERRORS
+
+
+def is_outage(error):
+    """
+    True if error means FlightXML is failing: a 5xx status or a body that is not JSON (a 502 page). Throttling and
+    client errors (a 401, a bad argument) say nothing about the health of the service.
+    """
+    if isinstance(error, ValueError):
+        return True
+    # requests.HTTPError carries the response, aiohttp.ClientResponseError the status
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status", None)
+    return isinstance(status, int) and status >= 500 and not is_throttled(status)
+
+
+class CircuitOpenError(FlightAwareError):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+class LatencyTracker(object):
+    """
+    Sliding window of recent latencies.
+    """
+    def __init__(self, window=200):
+        self.samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent):
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100.0))]
+
+
+class RetryBudget(object):
+    """
+    Every first attempt deposits ratio tokens, every hedge or retry withdraws one. At most max_tokens are banked, the
+    budget starts full so a fresh client can still retry.
+    """
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = float(max_tokens)
+        self.tokens = float(max_tokens)
+        self.spent = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+
+class CircuitBreaker(object):
+    """
+    Opens after failure_threshold consecutive failures. After reset_timeout seconds one trial request is let through,
+    its success closes the breaker, its failure opens it again. A trial ending any other way (a throttled or cancelled
+    request) puts the breaker back to open without counting a failure.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError("circuit open after {} consecutive failures".format(self.failures))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def release(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class RequestPolicy(object):
+    """
+    hedge               send a duplicate of slow reads
+    hedged_methods      the methods that may be hedged, HEDGED_METHODS by default; write methods never are
+    hedge_percentile    a read is slow once it takes longer than this percentile of its method's recent latencies
+    min_samples         latencies a method needs before it is hedged
+    min_hedge_delay     never hedge earlier than this many seconds
+    retries             maximum retries of a failed request
+    backoff             seconds before the first retry, doubled for every further retry
+    max_workers         threads used to run hedged requests of a blocking Client
+    """
+    def __init__(self, hedge=True, hedge_percentile=95, min_samples=20, min_hedge_delay=0.05, retries=2, backoff=0.1,
+                 retry_budget=None, breaker=None, max_workers=16, hedged_methods=HEDGED_METHODS):
+        self.hedge = hedge
+        self.hedged_methods = frozenset(hedged_methods) - WRITE_METHODS
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.max_workers = max_workers
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = collections.defaultdict(LatencyTracker)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, method):
+        """
+        Seconds to wait for method before hedging, None if it is not hedged.
+        """
+        if not self.hedge or method not in self.hedged_methods:
+            return None
+        tracker = self._latencies[method]
+        if len(tracker.samples) < self.min_samples:
+            return None
+        return max(self.min_hedge_delay, tracker.percentile(self.hedge_percentile))
+
+    def _timed(self, method, attempt):
+        start = time.monotonic()
+        result = attempt()
+        self._latencies[method].record(time.monotonic() - start)
+        return result
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ContextThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _hedged(self, method, attempt, delay):
+        executor = self._get_executor()
+        primary = executor.submit(self._timed, method, attempt)
+        done, pending = wait([primary], timeout=delay)
+        hedge = None
+        if not done and self.retry_budget.withdraw():
+            self.hedges += 1
+            hedge = executor.submit(self._timed, method, attempt)
+            pending.add(hedge)
+        # first success wins, an error only counts once every request has failed
+        error = None
+        pending |= done
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, method, attempt):
+        """
+        Run attempt(), a function sending one request of method, under this policy.
+        """
+        self.breaker.check()
+        tries = 0
+        while True:
+            try:
+                delay = self.hedge_delay(method)
+                if delay is None:
+                    result = self._timed(method, attempt)
+                else:
+                    result = self._hedged(method, attempt, delay)
+            except RETRYABLE_ERRORS:
+                self.breaker.record_failure()
+                if (method in WRITE_METHODS or tries >= self.retries or not self.breaker.allow()
+                        or not self.retry_budget.withdraw()):
+                    raise
+                time.sleep(self.backoff * 2 ** tries)
+                tries += 1
+                continue
+            except Exception as e:
+                # not worth a retry, but a 502 page is an outage all the same
+                if is_outage(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+                raise
+            except BaseException:
+                # a cancelled or interrupted half-open trial must not leave the breaker half-open for good
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            if not tries:
+                self.retry_budget.deposit()
+            return result
+
+    async def _timed_async(self, method, attempt):
+        start = time.monotonic()
+        result = await attempt()
+        self._latencies[method].record(time.monotonic() - start)
+        return result
+
+    async def _hedged_async(self, method, attempt, delay):
+        primary = asyncio.ensure_future(self._timed_async(method, attempt))
+        done, pending = await asyncio.wait([primary], timeout=delay)
+        hedge = None
+        if not done and self.retry_budget.withdraw():
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._timed_async(method, attempt))
+            pending.add(hedge)
+        error = None
+        pending |= done
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            self.hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # unlike threads, the losing request can be cancelled
+            for future in pending:
+                future.cancel()
+
+    async def call_async(self, method, attempt):
+        """
+        call() for asyncio, attempt returns an awaitable.
+        """
+        self.breaker.check()
+        tries = 0
+        while True:
+            try:
+                delay = self.hedge_delay(method)
+                if delay is None:
+                    result = await self._timed_async(method, attempt)
+                else:
+                    result = await self._hedged_async(method, attempt, delay)
+            except RETRYABLE_ERRORS:
+                self.breaker.record_failure()
+                if (method in WRITE_METHODS or tries >= self.retries or not self.breaker.allow()
+                        or not self.retry_budget.withdraw()):
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** tries)
+                tries += 1
+                continue
+            except Exception as e:
+                # not worth a retry, but a 502 page is an outage all the same
+                if is_outage(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+                raise
+            except BaseException:
+                # a cancelled or interrupted half-open trial must not leave the breaker half-open for good
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            if not tries:
+                self.retry_budget.deposit()
+            return result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries_spent": self.retry_budget.spent,
+            "retries_denied": self.retry_budget.denied,
+            "breaker": self.breaker.state,
+        }
@@ -0,0 +1,312 @@
+"""
+Decoded flight routes in compact typed arrays.
+
+DecodeRoute and DecodeFlightRoute return every fix, navaid and airway point of a route, often hundreds of points per
+flight. RouteCache keeps decoded routes as arrays of indices into one WaypointTable shared by all routes: a fix used
+by a thousand routes is stored once, a route costs 4 bytes per point. Routes can be thinned with the Douglas-Peucker
+algorithm (simplify) before they are stored, a tolerance of a mile or two keeps the drawn shape and drops most of the
+points of straight airway segments.
+
+    routes = RouteCache(client, tolerance=1.0)
+    route = routes.flight_route("SWA2558-1400000000-airline-0123")
+    route.latitudes(), route.longitudes()
+"""
+import array
+import collections
+import logging
+import math
+import threading
+
+try:
+    import numpy
+except ImportError:     # optional dependency, pure-python loops are used instead
+    numpy = None
+
+from flightaware.client import ResultMode
+from flightaware.coalesce import SingleFlight
+from flightaware.geodesy import EARTH_RADIUS_MILES
+from flightaware.pagination import FlightAwareError
+from flightaware.records import RoutePoint
+from flightaware.scheduler import ContextThreadPoolExecutor
+from flightaware.tracks import COORDINATE_SCALE
+
+logger = logging.getLogger("flightaware.routes")
+
+MILES_PER_DEGREE = math.pi * EARTH_RADIUS_MILES / 180
+
+
+def _field(point, name):
+    # RoutePointStruct as a dict or as a flightaware.records.RoutePoint
+    if isinstance(point, dict):
+        return point.get(name)
+    return getattr(point, name)
+
+
+def _project(latitudes, longitudes):
+    """
+    Equirectangular projection to miles around the mean latitude, longitudes unwrapped across the antimeridian.
+    """
+    scale = MILES_PER_DEGREE * math.cos(math.radians(sum(latitudes) / len(latitudes)))
+    xs, ys = [], []
+    previous = offset = 0.0
+    for position, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+        if position and abs(lon + offset - previous) > 180:
+            offset += 360 if lon + offset < previous else -360
+        previous = lon + offset
+        xs.append(previous * scale)
+        ys.append(lat * MILES_PER_DEGREE)
+    return xs, ys
+
+
+def _farthest(xs, ys, first, last):
+    # index and distance of the point between first and last farthest from the segment joining them
+    x1, y1, x2, y2 = xs[first], ys[first], xs[last], ys[last]
+    dx, dy = x2 - x1, y2 - y1
+    length = dx * dx + dy * dy
+    if numpy is not None:
+        px, py = xs[first + 1:last], ys[first + 1:last]
+        if length:
+            t = numpy.clip(((px - x1) * dx + (py - y1) * dy) / length, 0.0, 1.0)
+            distances = numpy.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+        else:
+            distances = numpy.hypot(px - x1, py - y1)
+        index = int(numpy.argmax(distances))
+        return first + 1 + index, float(distances[index])
+    best, best_distance = first, -1.0
+    for index in range(first + 1, last):
+        px, py = xs[index], ys[index]
+        t = min(1.0, max(0.0, ((px - x1) * dx + (py - y1) * dy) / length)) if length else 0.0
+        distance = math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+        if distance > best_distance:
+            best, best_distance = index, distance
+    return best, best_distance
+
+
+def simplify(latitudes, longitudes, tolerance):
+    """
+    Douglas-Peucker simplification of a polyline, return the indices of the points kept. tolerance is the largest
+    distance in statute miles a dropped point may lie from the simplified line. The end points are always kept.
+    """
+    count = len(latitudes)
+    if count < 3 or not tolerance:
+        return list(range(count))
+    xs, ys = _project(latitudes, longitudes)
+    if numpy is not None:
+        xs, ys = numpy.asarray(xs), numpy.asarray(ys)
+    keep = bytearray(count)
+    keep[0] = keep[-1] = 1
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        index, distance = _farthest(xs, ys, first, last)
+        if distance > tolerance:
+            keep[index] = 1
+            stack.append((first, index))
+            stack.append((index, last))
+    return [index for index in range(count) if keep[index]]
+
+
+class WaypointTable(object):
+    """
+    Route points interned by name, type and position, shared by all routes. Coordinates are int32 in 1e-5 degrees,
+    see flightaware.tracks.COORDINATE_SCALE. Safe to intern into from several threads.
+    """
+    def __init__(self):
+        self.names = []
+        self.types = []
+        self.latitudes = array.array("i")
+        self.longitudes = array.array("i")
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, points):
+        """
+        Add the points not in the table yet, return an array of the table index of every point.
+        """
+        indices = array.array("I")
+        with self._lock:
+            for point in points:
+                lat = int(round(float(_field(point, "latitude")) * COORDINATE_SCALE))
+                lon = int(round(float(_field(point, "longitude")) * COORDINATE_SCALE))
+                key = (_field(point, "name"), _field(point, "type"), lat, lon)
+                index = self._index.get(key)
+                if index is None:
+                    index = self._index[key] = len(self.names)
+                    self.names.append(key[0])
+                    self.types.append(key[1])
+                    self.latitudes.append(lat)
+                    self.longitudes.append(lon)
+                indices.append(index)
+        return indices
+
+    def point(self, index):
+        return RoutePoint(self.names[index], self.types[index], float(self.latitudes[index]) / COORDINATE_SCALE,
+                          float(self.longitudes[index]) / COORDINATE_SCALE)
+
+
+class Route(object):
+    """
+    One decoded route: indices into a WaypointTable. decoded is the number of points DecodeRoute returned, len() the
+    number kept after simplification.
+    """
+    __slots__ = ("key", "table", "indices", "decoded")
+
+    def __init__(self, key, table, indices, decoded=None):
+        self.key = key
+        self.table = table
+        self.indices = indices
+        self.decoded = len(indices) if decoded is None else decoded
+
+    def __len__(self):
+        return len(self.indices)
+
+    def _column(self, values):
+        # under the table lock: an array exporting its buffer to NumPy cannot grow
+        with self.table._lock:
+            if numpy is not None:
+                selected = numpy.frombuffer(values, dtype="int32")[numpy.frombuffer(self.indices, dtype="uint32")]
+                return selected / float(COORDINATE_SCALE)
+            return array.array("d", [values[index] / float(COORDINATE_SCALE) for index in self.indices])
+
+    def latitudes(self):
+        """
+        Latitudes in degrees, a float64 NumPy array when NumPy is installed, an array.array otherwise.
+        """
+        return self._column(self.table.latitudes)
+
+    def longitudes(self):
+        return self._column(self.table.longitudes)
+
+    def points(self):
+        """
+        Yield the points as flightaware.records.RoutePoint records.
+        """
+        for index in self.indices:
+            yield self.table.point(index)
+
+    def simplified(self, tolerance):
+        """
+        A new Route keeping the points simplify() keeps at tolerance miles, for drawing at a coarser zoom level.
+        """
+        kept = simplify(list(self.latitudes()), list(self.longitudes()), tolerance)
+        return Route(self.key, self.table, array.array("I", [self.indices[index] for index in kept]), self.decoded)
+
+
+class RouteCache(object):
+    """
+    Decoded routes keyed by faFlightID or by (origin, route, destination), sharing one WaypointTable.
+
+    client          Client in ResultMode.DICT or ResultMode.RECORDS used for the DecodeFlightRoute and DecodeRoute calls
+    tolerance       simplify routes to this many statute miles before storing them, None keeps every point
+    maxsize         routes kept, the least recently used route is dropped first; the waypoint table only grows
+    max_workers     routes fetched in parallel by flight_routes()
+
+    Concurrent requests for a route that is not cached yet share one fetch.
+    """
+    def __init__(self, client, tolerance=None, maxsize=100000, max_workers=8, table=None):
+        if getattr(client, "result_mode", None) == ResultMode.COLUMNS:
+            raise ValueError("RouteCache needs a client in ResultMode.DICT or ResultMode.RECORDS, not COLUMNS")
+        self.client = client
+        self.tolerance = tolerance
+        self.maxsize = maxsize
+        self.max_workers = max_workers
+        self.table = table if table is not None else WaypointTable()
+        self.fetches = 0
+        self.hits = 0
+        self._routes = collections.OrderedDict()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._routes)
+
+    def _get(self, key):
+        with self._lock:
+            route = self._routes.get(key)
+            if route is not None:
+                self._routes.move_to_end(key)
+                self.hits += 1
+            return route
+
+    def add(self, key, points):
+        """
+        Intern and store decoded route points (RoutePointStruct dicts or RoutePoint records), return the Route.
+        """
+        points = list(points)
+        if self.tolerance and len(points) > 2:
+            latitudes = [float(_field(point, "latitude")) for point in points]
+            longitudes = [float(_field(point, "longitude")) for point in points]
+            decoded = len(points)
+            points = [points[index] for index in simplify(latitudes, longitudes, self.tolerance)]
+        else:
+            decoded = len(points)
+        route = Route(key, self.table, self.table.intern(points), decoded)
+        with self._lock:
+            self._routes[key] = route
+            self._routes.move_to_end(key)
+            while len(self._routes) > self.maxsize:
+                self._routes.popitem(last=False)
+        return route
+
+    def _decode(self, key, call, *args):
+        route = self._get(key)
+        if route is not None:
+            return route
+        return self._flights.do(key, lambda: self._fetch(key, call, *args))
+
+    def _fetch(self, key, call, *args):
+        # the fetch of an earlier caller may have stored the route since the lookup in _decode
+        route = self._get(key)
+        if route is not None:
+            return route
+        with self._lock:
+            self.fetches += 1
+        points = call(*args)
+        if isinstance(points, dict) and "error" in points:
+            raise FlightAwareError(points["error"] or "no route for {}".format(key))
+        return self.add(key, points)
+
+    def flight_route(self, fa_flight_id):
+        """
+        The Route of a flight. Raises FlightAwareError when FlightXML has no route for it.
+        """
+        return self._decode(fa_flight_id, self.client.decode_flight_route, fa_flight_id)
+
+    def route(self, origin, route, destination):
+        """
+        The Route of a route string between two airports. Raises FlightAwareError when FlightXML cannot decode it.
+        """
+        return self._decode((origin, route, destination), self.client.decode_route, origin, route, destination)
+
+    def flight_routes(self, fa_flight_ids):
+        """
+        Routes of many flights fetched in parallel, a dict of faFlightID => Route. Flights answered with an error are
+        logged and left out.
+        """
+        def fetch(fa_flight_id):
+            try:
+                return fa_flight_id, self.flight_route(fa_flight_id)
+            except FlightAwareError as e:
+                logger.warning("no route for %s: %s", fa_flight_id, e)
+                return fa_flight_id, None
+
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict((key, route) for key, route in executor.map(fetch, fa_flight_ids) if route is not None)
+
+    def stats(self):
+        with self._lock:
+            routes = list(self._routes.values())
+        return {
+            "routes": len(routes),
+            "waypoints": len(self.table),
+            "decoded_points": sum(route.decoded for route in routes),
+            "stored_points": sum(len(route) for route in routes),
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "coalesced": self._flights.shared,
+        }
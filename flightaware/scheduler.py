@@ -0,0 +1,244 @@
+"""
+Client-side rate scheduling for FlightXML queries.
+
+Every request takes a token from the account bucket and from the bucket of its method class, so expensive searches can
+be budgeted separately from cheap lookups. Waiting requests are served by priority lane first and arrival order second,
+so interactive lookups overtake queued background exports. When FlightXML signals throttling the account rate is
+halved and all requests pause for a cooldown; each later success wins a little of the rate back.
+
+The priority of a request is taken from the current context, set it with scheduler.priority(...):
+
+    with scheduler.priority(Priority.BACKGROUND):
+        exporter.export(start, end)
+
+Worker pools of this package are ContextThreadPoolExecutors, which run every task in a copy of the submitting context,
+so the calls they make on behalf of the block keep its priority.
+"""
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Priority(object):
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class MethodClass(object):
+    CHEAP = "cheap"
+    STANDARD = "standard"
+    EXPENSIVE = "expensive"
+
+
+# FlightXML method name => MethodClass, methods not listed are STANDARD. Adjust to the classes of your account's contract.
+DEFAULT_METHOD_CLASSES = {
+    "AircraftType": MethodClass.CHEAP,
+    "AirlineInfo": MethodClass.CHEAP,
+    "AirportInfo": MethodClass.CHEAP,
+    "CountAirportOperations": MethodClass.CHEAP,
+    "Metar": MethodClass.CHEAP,
+    "NTaf": MethodClass.CHEAP,
+    "Taf": MethodClass.CHEAP,
+    "TailOwner": MethodClass.CHEAP,
+    "ZipcodeInfo": MethodClass.CHEAP,
+    "AirlineFlightSchedules": MethodClass.EXPENSIVE,
+    "GetHistoricalTrack": MethodClass.EXPENSIVE,
+    "MapFlight": MethodClass.EXPENSIVE,
+    "MapFlightEx": MethodClass.EXPENSIVE,
+    "Search": MethodClass.EXPENSIVE,
+    "SearchBirdseyeInFlight": MethodClass.EXPENSIVE,
+    "SearchBirdseyePositions": MethodClass.EXPENSIVE,
+    "SearchCount": MethodClass.EXPENSIVE,
+}
+
+THROTTLE_STATUS_CODES = (429, 503)
+# phrases of throttling errors only, "Result size exceeded" or "Query limit exceeded" are about one request and must
+# not slow down every other one
+THROTTLE_MESSAGES = ("too many requests", "rate limit", "throttled")
+
+_current_priority = contextvars.ContextVar("flightaware_priority", default=Priority.NORMAL)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor running every task in a copy of the context it was submitted from, so context variables such as
+    the scheduler priority carry over into the worker threads.
+    """
+    def submit(self, fn, *args, **kwargs):
+        # one copy per task, a context cannot be entered by two threads at once
+        return super(ContextThreadPoolExecutor, self).submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def is_throttled(status_code, result=None):
+    """
+    True if a response means the account is being throttled.
+    """
+    if status_code in THROTTLE_STATUS_CODES:
+        return True
+    if isinstance(result, dict) and isinstance(result.get("error"), str):
+        message = result["error"].lower()
+        return any(text in message for text in THROTTLE_MESSAGES)
+    return False
+
+
+class TokenBucket(object):
+    """
+    rate tokens per second, holding at most capacity tokens. Not thread-safe on its own, RateScheduler locks it.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """
+        Seconds until a token is available, 0 if one is available now.
+        """
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateScheduler(object):
+    """
+    rate            account-wide requests per second
+    burst           account bucket capacity
+    class_limits    MethodClass => (rate, burst) for classes with their own budget
+    method_classes  FlightXML method name => MethodClass, defaults to DEFAULT_METHOD_CLASSES
+    min_rate        the adaptive rate never drops below this
+    cooldown        seconds all requests pause after a throttling response
+    """
+    def __init__(self, rate, burst=None, class_limits=None, method_classes=None, min_rate=0.1, cooldown=1.0):
+        self.max_rate = float(rate)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.cooldown = cooldown
+        self.account = TokenBucket(rate, burst)
+        self.classes = dict((name, TokenBucket(*limit)) for name, limit in (class_limits or {}).items())
+        self.method_classes = DEFAULT_METHOD_CLASSES if method_classes is None else method_classes
+        self.paused_until = 0.0
+        self.throttled_count = 0
+        self.waited = 0.0
+        self._condition = threading.Condition()
+        self._waiting = {}          # ticket => method class, ticket is (priority, sequence)
+        self._sequence = itertools.count()
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """
+        Run the requests made inside the block (in this thread or asyncio task) in the given Priority lane.
+        """
+        token = _current_priority.set(priority)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+    def _class_of(self, method):
+        return self.method_classes.get(method, MethodClass.STANDARD)
+
+    def _enqueue(self, method):
+        ticket = (_current_priority.get(), next(self._sequence))
+        self._waiting[ticket] = self._class_of(method)
+        return ticket
+
+    def _try_take(self, ticket, now):
+        """
+        Take the tokens for ticket and return 0, or return how long to wait before trying again.
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        method_class = self._waiting[ticket]
+        wait = self.account.wait_time(now)
+        bucket = self.classes.get(method_class)
+        if bucket is not None:
+            wait = max(wait, bucket.wait_time(now))
+        if wait:
+            return wait
+        # the best ticket whose class has a token goes first, a starved expensive class does not block cheap calls
+        for other, other_class in self._waiting.items():
+            if other < ticket:
+                other_bucket = self.classes.get(other_class)
+                if other_bucket is None or other_bucket.wait_time(now) == 0:
+                    return 0.01
+        self.account.take()
+        if bucket is not None:
+            bucket.take()
+        del self._waiting[ticket]
+        return 0.0
+
+    def acquire(self, method):
+        """
+        Block until method may be sent.
+        """
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(method)
+            try:
+                while True:
+                    wait = self._try_take(ticket, time.monotonic())
+                    if not wait:
+                        break
+                    self._condition.wait(wait)
+            finally:
+                self._leave(ticket, start)
+
+    async def acquire_async(self, method):
+        """
+        acquire() for asyncio, waits without blocking the event loop. A cancelled wait gives up its place in the queue.
+        """
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(method)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_take(ticket, time.monotonic())
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            with self._condition:
+                self._leave(ticket, start)
+
+    def _leave(self, ticket, start):
+        # called with the condition held, also when the wait was interrupted: a ticket left behind would block every
+        # later ticket of its priority lane for good
+        self._waiting.pop(ticket, None)
+        self.waited += time.monotonic() - start
+        self._condition.notify_all()
+
+    def report(self, method, throttled):
+        """
+        Feed back the outcome of a request: halve the rate and pause on throttling, recover slowly on success.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self.account.refill(now)
+            if throttled:
+                self.throttled_count += 1
+                self.account.rate = max(self.min_rate, self.account.rate / 2)
+                self.paused_until = max(self.paused_until, now + self.cooldown)
+            elif self.account.rate < self.max_rate:
+                self.account.rate = min(self.max_rate, self.account.rate + self.max_rate / 100)
+
+    def stats(self):
+        return {
+            "rate": self.account.rate,
+            "throttled": self.throttled_count,
+            "waiting": len(self._waiting),
+            "waited_seconds": self.waited,
+        }
@@ -0,0 +1,320 @@
+"""
+Spatial index over airport positions for nearest-airport and radius queries.
+
+Airports are stored as unit vectors in an implicit k-d tree: the arrays are ordered so that the median of every index
+range is the splitting node of that range. Chord length between unit vectors is monotonic in great-circle distance,
+so there is no special casing around the poles or the antimeridian.
+
+An index can be saved to a flat file and loaded back with mmap, in which case queries read the coordinate arrays
+straight from the mapping without copying them.
+"""
+import array
+import heapq
+import math
+import mmap
+import os
+import struct
+
+from flightaware.geodesy import EARTH_RADIUS_MILES, distance
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+MAGIC = b"FAIX"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")    # magic, version, number of airports, bytes per airport code
+
+# airports added after the tree was built are scanned linearly until there are this many of them
+DEFAULT_REBUILD_THRESHOLD = 256
+
+
+def to_unit_vector(lat, lon):
+    phi, lam = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+def chord_to_miles(chord):
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, chord / 2))
+
+
+def miles_to_chord(miles):
+    return 2 * math.sin(min(math.pi / 2, miles / (2 * EARTH_RADIUS_MILES)))
+
+
+def _position(info):
+    # AirportInfo result as a dict or as a flightaware.records.Airport
+    if isinstance(info, dict):
+        return info.get("latitude"), info.get("longitude")
+    return info.latitude, info.longitude
+
+
+def airport_points(infos):
+    """
+    Turn a mapping of airport code to AirportInfo result into (code, latitude, longitude) tuples, skipping airports
+    without a position or with an error response.
+    """
+    for code, info in infos.items():
+        if isinstance(info, dict) and "error" in info:
+            continue
+        lat, lon = _position(info)
+        if lat is not None and lon is not None:
+            yield code, float(lat), float(lon)
+
+
+def fetch_airport_infos(client, codes, max_workers=8):
+    """
+    Call AirportInfo for every code in parallel. Use a client with a cache to make repeated builds free.
+    """
+    codes = list(codes)
+    with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(codes, executor.map(client.airport_info, codes)))
+
+
+class AirportIndex(object):
+    """
+    k-nearest and within-radius queries over airport positions. Distances are statute miles.
+
+        index = AirportIndex.from_client(client)
+        index.save("airports.idx")
+        index = AirportIndex.load("airports.idx")
+        index.nearest(36.12, -86.68, k=3)       # [("KBNA", 0.2), ...]
+    """
+    def __init__(self, codes, xs, ys, zs, lats, lons, axes, mapped=None):
+        self.codes = codes
+        self.xs, self.ys, self.zs = xs, ys, zs
+        self.lats, self.lons = lats, lons
+        self.axes = axes
+        self.rebuild_threshold = DEFAULT_REBUILD_THRESHOLD
+        self._mapped = mapped
+        self._extra = []            # (code, lat, lon, x, y, z) added since the tree was built
+        self._known = None
+
+    @classmethod
+    def build(cls, points):
+        """
+        Build an index from (code, latitude, longitude) tuples.
+        """
+        points = list(points)
+        vectors = [to_unit_vector(lat, lon) for _, lat, lon in points]
+        order = list(range(len(points)))
+        axes = bytearray(len(points))
+
+        def split(lo, hi):
+            if hi - lo < 1:
+                return
+            span = [max(vectors[i][axis] for i in order[lo:hi]) - min(vectors[i][axis] for i in order[lo:hi]) for axis in range(3)]
+            axis = span.index(max(span))
+            order[lo:hi] = sorted(order[lo:hi], key=lambda i: vectors[i][axis])
+            mid = (lo + hi) // 2
+            axes[mid] = axis
+            split(lo, mid)
+            split(mid + 1, hi)
+
+        split(0, len(points))
+        return cls(
+            [points[i][0] for i in order],
+            array.array("d", [vectors[i][0] for i in order]),
+            array.array("d", [vectors[i][1] for i in order]),
+            array.array("d", [vectors[i][2] for i in order]),
+            array.array("d", [points[i][1] for i in order]),
+            array.array("d", [points[i][2] for i in order]),
+            axes,
+        )
+
+    @classmethod
+    def from_client(cls, client, codes=None, max_workers=8):
+        """
+        Build an index from AllAirports and AirportInfo, or from AirportInfo of the given codes only.
+        """
+        if codes is None:
+            codes = client.all_airports()
+        return cls.build(airport_points(fetch_airport_infos(client, codes, max_workers)))
+
+    def __len__(self):
+        return len(self.xs) + len(self._extra)
+
+    def __contains__(self, code):
+        if self._known is None:
+            self._known = set(self.codes)
+        return code in self._known
+
+    def add(self, code, lat, lon):
+        """
+        Add an airport. New airports are scanned linearly and merged into the tree once there are enough of them.
+        """
+        if code in self:
+            return
+        self._known.add(code)
+        self._extra.append((code, lat, lon) + to_unit_vector(lat, lon))
+        if len(self._extra) >= self.rebuild_threshold:
+            self._rebuild()
+
+    def refresh(self, client, max_workers=8):
+        """
+        Add airports returned by AllAirports that are not indexed yet, returns the codes added. Airports whose
+        AirportInfo failed or has no position are left out.
+        """
+        missing = [code for code in client.all_airports() if code not in self]
+        added = []
+        for code, lat, lon in airport_points(fetch_airport_infos(client, missing, max_workers)):
+            self.add(code, lat, lon)
+            added.append(code)
+        return added
+
+    def _rebuild(self):
+        points = [(self.codes[i], self.lats[i], self.lons[i]) for i in range(len(self.xs))]
+        points.extend(extra[:3] for extra in self._extra)
+        rebuilt = self.build(points)
+        self.close()
+        self.__dict__.update(rebuilt.__dict__, rebuild_threshold=self.rebuild_threshold)
+
+    def _search(self, x, y, z, visit):
+        """
+        Walk the tree nearest branch first. visit(index, squared chord) returns the current pruning bound.
+        """
+        xs, ys, zs, axes = self.xs, self.ys, self.zs, self.axes
+        query = (x, y, z)
+        coordinates = (xs, ys, zs)
+        stack = [(0, len(xs))]
+        while stack:
+            lo, hi = stack.pop()
+            if hi <= lo:
+                continue
+            mid = (lo + hi) // 2
+            dx, dy, dz = xs[mid] - x, ys[mid] - y, zs[mid] - z
+            bound = visit(mid, dx * dx + dy * dy + dz * dz)
+            axis = axes[mid]
+            diff = query[axis] - coordinates[axis][mid]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            if diff * diff <= bound:
+                stack.append(far)
+            stack.append(near)
+
+    def nearest(self, lat, lon, k=1):
+        """
+        Return the k airports closest to the position as (code, miles) tuples, closest first.
+        """
+        if k <= 0:
+            return []
+        x, y, z = to_unit_vector(lat, lon)
+        heap = []       # max-heap of (-squared chord, code)
+
+        def consider(code, d2):
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, code))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, code))
+
+        def visit(index, d2):
+            consider(self.codes[index], d2)
+            return -heap[0][0] if len(heap) == k else float("inf")
+
+        self._search(x, y, z, visit)
+        for code, _, _, ex, ey, ez in self._extra:
+            consider(code, (ex - x) ** 2 + (ey - y) ** 2 + (ez - z) ** 2)
+        return [(code, chord_to_miles(math.sqrt(-d2))) for d2, code in sorted(heap, reverse=True)]
+
+    def within(self, lat, lon, radius):
+        """
+        Return every airport within radius miles of the position as (code, miles) tuples, closest first.
+        """
+        x, y, z = to_unit_vector(lat, lon)
+        limit = miles_to_chord(radius) ** 2
+        found = []
+
+        def visit(index, d2):
+            if d2 <= limit:
+                found.append((d2, self.codes[index]))
+            return limit
+
+        self._search(x, y, z, visit)
+        for code, _, _, ex, ey, ez in self._extra:
+            d2 = (ex - x) ** 2 + (ey - y) ** 2 + (ez - z) ** 2
+            if d2 <= limit:
+                found.append((d2, code))
+        return [(code, chord_to_miles(math.sqrt(d2))) for d2, code in sorted(found)]
+
+    def distance(self, code, lat, lon):
+        """
+        Great circle miles from an indexed airport to a position.
+        """
+        for i, candidate in enumerate(self.codes):
+            if candidate == code:
+                return distance(self.lats[i], self.lons[i], lat, lon)
+        for candidate, clat, clon, _, _, _ in self._extra:
+            if candidate == code:
+                return distance(clat, clon, lat, lon)
+        raise KeyError(code)
+
+    def save(self, path):
+        """
+        Write the index, including airports added since it was built, to a file that load() can map. The file is
+        replaced atomically, an index loaded from path keeps reading its old mapping.
+        """
+        if self._extra:
+            self._rebuild()
+        encoded = [code.encode("utf-8") for code in self.codes]
+        width = max([len(code) for code in encoded] or [0])
+        # truncating path in place would pull the pages from under a mapping of it (SIGBUS), possibly our own
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as output:
+            output.write(HEADER.pack(MAGIC, VERSION, len(encoded), width))
+            for values in (self.xs, self.ys, self.zs, self.lats, self.lons):
+                output.write(array.array("d", values).tobytes())
+            output.write(bytes(self.axes))
+            output.write(b"".join(code.ljust(width, b"\0") for code in encoded))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map an index written by save(). The coordinate arrays are read from the mapping without copying.
+        """
+        with open(path, "rb") as source:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        magic, version, count, width = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an airport index file".format(path))
+        offset = HEADER.size
+        columns = []
+        for _ in range(5):
+            columns.append(view[offset:offset + 8 * count].cast("d"))
+            offset += 8 * count
+        axes = view[offset:offset + count]
+        offset += count
+        codes = MappedCodes(view[offset:offset + width * count], width)
+        return cls(codes, *(columns + [axes]), mapped=(mapped, view, columns, axes, codes))
+
+    def close(self):
+        """
+        Release the file mapping of a loaded index.
+        """
+        if self._mapped is not None:
+            mapped, view, columns, axes, codes = self._mapped
+            self._mapped = None
+            for item in columns + [axes, codes.view, view]:
+                item.release()
+            mapped.close()
+
+
+class MappedCodes(object):
+    """
+    Read-only sequence of fixed width airport codes backed by a memoryview.
+    """
+    def __init__(self, view, width):
+        self.view = view
+        self.width = width
+
+    def __len__(self):
+        return len(self.view) // self.width if self.width else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index * self.width
+        return bytes(self.view[start:start + self.width]).rstrip(b"\0").decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
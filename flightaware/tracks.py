@@ -0,0 +1,215 @@
+"""
+Append-only, memory-mapped store of flight tracks keyed by faFlightID.
+
+Each track is one block: a header holding the faFlightID, the number of positions and the first value of every column,
+followed by the int32 deltas of the timestamp, latitude, longitude, altitude and groundspeed columns. Latitude and
+longitude are kept in 1e-5 degree units, altitude in hundreds of feet and groundspeed in knots as FlightXML reports
+them. A track costs 20 bytes per position instead of a dict per position.
+
+Reads hand out memoryview slices of the mapping, deltas are only summed up when a column is asked for.
+"""
+import array
+import itertools
+import logging
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import numpy
+except ImportError:     # optional dependency, itertools.accumulate is used instead
+    numpy = None
+
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+logger = logging.getLogger("flightaware.tracks")
+
+MAGIC = b"TRK1"
+BLOCK_HEADER = struct.Struct("<4sHHI5q")   # magic, id length, padding, number of positions, first value per column
+COLUMNS = ("timestamp", "latitude", "longitude", "altitude", "groundspeed")
+COORDINATE_SCALE = 100000
+
+
+def _field(point, name):
+    # TrackStruct as a dict or as a flightaware.records.TrackPoint
+    if isinstance(point, dict):
+        return point.get(name)
+    return getattr(point, name)
+
+
+def encode_track(fa_flight_id, points):
+    """
+    Encode track positions into one store block.
+    """
+    rows = [(
+        int(_field(point, "timestamp")),
+        int(round(float(_field(point, "latitude")) * COORDINATE_SCALE)),
+        int(round(float(_field(point, "longitude")) * COORDINATE_SCALE)),
+        int(_field(point, "altitude") or 0),
+        int(_field(point, "groundspeed") or 0),
+    ) for point in points]
+    first = rows[0] if rows else (0, ) * len(COLUMNS)
+    name = fa_flight_id.encode("utf-8")
+    chunks = [BLOCK_HEADER.pack(MAGIC, len(name), 0, len(rows), *first), name, b"\0" * (-len(name) % 4)]
+    for column in range(len(COLUMNS)):
+        values = [row[column] for row in rows]
+        chunks.append(array.array("i", [0] + [b - a for a, b in zip(values, values[1:])] if values else []).tobytes())
+    return b"".join(chunks)
+
+
+class Track(object):
+    """
+    One stored track. deltas(name) is a zero-copy int32 view into the store, column(name) the decoded values.
+    """
+    def __init__(self, fa_flight_id, first, deltas):
+        self.fa_flight_id = fa_flight_id
+        self.first = dict(zip(COLUMNS, first))
+        self._deltas = dict(zip(COLUMNS, deltas))
+
+    def __len__(self):
+        return len(self._deltas["timestamp"])
+
+    def deltas(self, name):
+        return self._deltas[name]
+
+    def column(self, name):
+        """
+        Decoded column, an int64 NumPy array when NumPy is installed, an array.array otherwise. Latitude and longitude
+        are in 1e-5 degrees, see COORDINATE_SCALE.
+        """
+        deltas = self._deltas[name]
+        if numpy is not None:
+            return numpy.cumsum(numpy.frombuffer(deltas, dtype="int32"), dtype="int64") + self.first[name]
+        return array.array("q", itertools.accumulate(deltas, initial=self.first[name]))[1:]
+
+    def points(self):
+        """
+        Yield the positions as dicts shaped like FlightXML TrackStruct.
+        """
+        columns = [self.column(name) for name in COLUMNS]
+        for timestamp, lat, lon, altitude, groundspeed in zip(*columns):
+            yield {
+                "timestamp": int(timestamp),
+                "latitude": float(lat) / COORDINATE_SCALE,
+                "longitude": float(lon) / COORDINATE_SCALE,
+                "altitude": int(altitude),
+                "groundspeed": int(groundspeed),
+            }
+
+
+class TrackStore(object):
+    """
+    Tracks appended to one file, indexed by faFlightID in memory. Appending a track that is already stored shadows the
+    older block. Safe to append to from several threads.
+
+        with TrackStore("tracks.bin") as store:
+            fetch_tracks(client, fa_flight_ids, store)
+            store["SWA2558-1400000000-airline-0123"].column("altitude")
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = {}
+        self._map = None
+        self._view = None
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self._file = open(path, "a+b")
+        self._size = os.path.getsize(path)
+        self._scan()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, fa_flight_id):
+        return fa_flight_id in self._index
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __getitem__(self, fa_flight_id):
+        return self.get(fa_flight_id)
+
+    def _remap(self):
+        # views handed out keep the old mapping alive, it is left to the garbage collector
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+        self._view = memoryview(self._map) if self._map is not None else None
+
+    def _scan(self):
+        self._remap()
+        offset = 0
+        while offset + BLOCK_HEADER.size <= self._size:
+            magic, name_length, _, count = BLOCK_HEADER.unpack_from(self._view, offset)[:4]
+            block_end = offset + self._block_size(name_length, count)
+            if magic != MAGIC or block_end > self._size:
+                break
+            name = bytes(self._view[offset + BLOCK_HEADER.size:offset + BLOCK_HEADER.size + name_length]).decode("utf-8")
+            self._index[name] = offset
+            offset = block_end
+        if offset < self._size:
+            # a block cut short by a crash during append
+            logger.warning("%s: truncating %s trailing bytes", self.path, self._size - offset)
+            self._view = self._map = None
+            self._file.truncate(offset)
+            self._size = offset
+            self._remap()
+
+    @staticmethod
+    def _block_size(name_length, count):
+        return BLOCK_HEADER.size + name_length + (-name_length % 4) + 4 * count * len(COLUMNS)
+
+    def append(self, fa_flight_id, points):
+        """
+        Store the positions of a track, a list of TrackStruct dicts or flightaware.records.TrackPoint records.
+        """
+        block = encode_track(fa_flight_id, points)
+        with self._lock:
+            self._file.write(block)
+            self._file.flush()
+            self._index[fa_flight_id] = self._size
+            self._size += len(block)
+
+    def get(self, fa_flight_id):
+        with self._lock:
+            offset = self._index[fa_flight_id]
+            if self._view is None or len(self._view) < self._size:
+                self._remap()
+            view = self._view
+        header = BLOCK_HEADER.unpack_from(view, offset)
+        name_length, count, first = header[1], header[3], header[4:]
+        start = offset + BLOCK_HEADER.size + name_length + (-name_length % 4)
+        deltas = []
+        for column in range(len(COLUMNS)):
+            deltas.append(view[start:start + 4 * count].cast("i"))
+            start += 4 * count
+        return Track(fa_flight_id, first, deltas)
+
+    def close(self):
+        self._file.close()
+        self._view = self._map = None
+
+
+def fetch_tracks(client, fa_flight_ids, store, max_workers=8, skip_stored=True):
+    """
+    Fetch GetHistoricalTrack for many flights in parallel and append each track to store as it arrives. Returns the
+    faFlightIDs stored, flights answered with an error are logged and skipped.
+    """
+    fa_flight_ids = [fa_flight_id for fa_flight_id in fa_flight_ids if not (skip_stored and fa_flight_id in store)]
+
+    def fetch(fa_flight_id):
+        points = client.get_historical_track(fa_flight_id)
+        if isinstance(points, dict):
+            logger.warning("no track for %s: %s", fa_flight_id, points.get("error"))
+            return None
+        store.append(fa_flight_id, points)
+        return fa_flight_id
+
+    with ContextThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [fa_flight_id for fa_flight_id in executor.map(fetch, fa_flight_ids) if fa_flight_id is not None]
@@ -0,0 +1,239 @@
+"""
+Incremental airport board watching.
+
+BoardWatcher polls the Arrived, Departed, Enroute and Scheduled boards of a set of airports concurrently, keeps the
+last snapshot of every board and emits only the flights that were added, changed or removed since the previous poll.
+
+Each airport has its own poll interval, adapted to its traffic: the interval is chosen so that a poll finds about
+target_changes changes, within [min_interval, max_interval]. A busy hub is polled every min_interval, a quiet field
+drifts out towards max_interval, which saves most of the queries spent on airports where nothing happens.
+
+FlightXML2 board records carry no faFlightID, a flight is identified by its ident and departure time instead (see
+flight_key). Should a record carry a faFlightID, that is used.
+
+    watcher = BoardWatcher(client, airports, boards=(Board.ARRIVED, Board.DEPARTED))
+    for change in watcher.watch():
+        print(change.kind, change.airport, change.board, change.key)
+"""
+import collections
+import logging
+import threading
+import time
+
+from flightaware.client import ResultMode
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+logger = logging.getLogger("flightaware.watcher")
+
+
+class Board(object):
+    ARRIVED = "arrived"
+    DEPARTED = "departed"
+    ENROUTE = "enroute"
+    SCHEDULED = "scheduled"
+
+
+class ChangeKind(object):
+    ADDED = "added"
+    CHANGED = "changed"
+    REMOVED = "removed"
+
+
+Change = collections.namedtuple("Change", ["kind", "airport", "board", "key", "flight", "previous"])
+Change.__doc__ = "One board change, flight is None for removed flights and previous is None for added flights."
+
+# the filed time first: actualdeparturetime is 0 on enroute and scheduled boards until the flight departs, keying on it
+# would turn the departure into a removal and an addition. Arrived and departed records only carry the actual time.
+DEPARTURE_FIELDS = ("filed_departuretime", "actualdeparturetime")
+
+
+def flight_key(flight):
+    """
+    faFlightID when the record has one, otherwise "<ident>@<departure time>".
+    """
+    fa_flight_id = flight.get("faFlightID")
+    if fa_flight_id:
+        return fa_flight_id
+    for name in DEPARTURE_FIELDS:
+        if flight.get(name):
+            return "{}@{}".format(flight.get("ident"), flight[name])
+    return "{}@{}".format(flight.get("ident"), flight.get("origin"))
+
+
+def diff_board(airport, board, previous, current):
+    """
+    Changes turning the previous snapshot into the current one, both dicts of flight_key => flight.
+    """
+    changes = []
+    for key, flight in current.items():
+        old = previous.get(key)
+        if old is None:
+            changes.append(Change(ChangeKind.ADDED, airport, board, key, flight, None))
+        elif old != flight:
+            changes.append(Change(ChangeKind.CHANGED, airport, board, key, flight, old))
+    for key, old in previous.items():
+        if key not in current:
+            changes.append(Change(ChangeKind.REMOVED, airport, board, key, None, old))
+    return changes
+
+
+class AirportState(object):
+    __slots__ = ("airport", "snapshots", "interval", "next_poll", "last_poll", "polls", "errors")
+
+    def __init__(self, airport, interval):
+        self.airport = airport
+        self.snapshots = {}         # board => {flight_key: flight}, missing until the first poll
+        self.interval = interval
+        self.next_poll = 0.0
+        self.last_poll = None
+        self.polls = 0
+        self.errors = 0
+
+
+class BoardWatcher(object):
+    """
+    client          Client in ResultMode.DICT, flights are diffed as dicts; size its pool for max_workers airports read
+                    at once
+    airports        ICAO airport codes to watch, see add() and remove()
+    boards          Board values polled for every airport
+    min_interval    shortest poll interval in seconds
+    max_interval    longest poll interval in seconds
+    target_changes  changes a poll should find, the interval adapts towards it
+    max_workers     airports polled in parallel
+    page_size       records per call, a board is read whole, see Client.iter_arrived
+    emit_initial    if True the flights of the first snapshot of a board are emitted as added
+    """
+    def __init__(self, client, airports=(), boards=(Board.ARRIVED, Board.DEPARTED), min_interval=60.0,
+                 max_interval=900.0, target_changes=5, max_workers=16, page_size=None, emit_initial=False):
+        if client.result_mode != ResultMode.DICT:
+            raise ValueError("BoardWatcher needs a client in ResultMode.DICT")
+        self.client = client
+        self.boards = tuple(boards)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.target_changes = target_changes
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.emit_initial = emit_initial
+        self.board_reads = 0
+        self._states = collections.OrderedDict()
+        self._lock = threading.Lock()
+        for airport in airports:
+            self.add(airport)
+
+    def add(self, airport):
+        with self._lock:
+            if airport not in self._states:
+                self._states[airport] = AirportState(airport, self.min_interval)
+
+    def remove(self, airport):
+        with self._lock:
+            self._states.pop(airport, None)
+
+    def snapshot(self, airport, board):
+        """
+        The flights of the last poll of a board, a dict of flight_key => flight.
+        """
+        return dict(self._states[airport].snapshots.get(board, {}))
+
+    def interval(self, airport):
+        return self._states[airport].interval
+
+    def fetch_board(self, airport, board):
+        """
+        Read one whole board, return a dict of flight_key => flight.
+        """
+        flights = getattr(self.client, "iter_" + board)(airport, page_size=self.page_size, prefetch=False)
+        return dict((flight_key(flight), flight) for flight in flights)
+
+    def _adapt(self, state, changes, now):
+        # changes per second since the last poll decide how long to wait for the next target_changes
+        if state.last_poll is None:
+            return
+        elapsed = max(now - state.last_poll, 1e-3)
+        if changes:
+            wanted = self.target_changes * elapsed / changes
+            # move halfway so one burst or one lull does not swing the interval across the whole range
+            interval = (state.interval + wanted) / 2
+        else:
+            interval = state.interval * 1.5
+        state.interval = min(self.max_interval, max(self.min_interval, interval))
+
+    def poll_airport(self, airport, now=None):
+        """
+        Poll every board of airport once, return its changes. An airport removed meanwhile has none.
+        """
+        with self._lock:
+            state = self._states.get(airport)
+        if state is None:
+            return []
+        now = time.monotonic() if now is None else now
+        boards = {}
+        try:
+            for board in self.boards:
+                boards[board] = self.fetch_board(airport, board)
+                with self._lock:
+                    self.board_reads += 1
+        except Exception:
+            # FlightAwareError from an {"error": ...} page as well as network errors: keep the old snapshot, retry later
+            logger.warning("polling %s failed", airport, exc_info=True)
+            state.errors += 1
+            state.next_poll = now + state.interval
+            return []
+
+        changes = []
+        for board, current in boards.items():
+            previous = state.snapshots.get(board)
+            if previous is not None or self.emit_initial:
+                changes.extend(diff_board(airport, board, previous or {}, current))
+            state.snapshots[board] = current
+        self._adapt(state, len(changes), now)
+        state.last_poll = now
+        state.next_poll = now + state.interval
+        state.polls += 1
+        return changes
+
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [airport for airport, state in self._states.items() if state.next_poll <= now]
+
+    def poll(self, now=None):
+        """
+        Poll every airport that is due, concurrently, and return all changes.
+        """
+        now = time.monotonic() if now is None else now
+        airports = self.due(now)
+        if not airports:
+            return []
+        self.client.ensure_result_size(self.page_size)
+        with ContextThreadPoolExecutor(max_workers=min(self.max_workers, len(airports))) as executor:
+            results = executor.map(lambda airport: self.poll_airport(airport, now), airports)
+            return [change for changes in results for change in changes]
+
+    def seconds_until_due(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self._states:
+                return self.min_interval
+            return max(0.0, min(state.next_poll for state in self._states.values()) - now)
+
+    def watch(self, stop=None):
+        """
+        Poll forever (or until the threading.Event stop is set) and yield the changes as they are found.
+        """
+        stop = stop if stop is not None else threading.Event()
+        while not stop.is_set():
+            for change in self.poll():
+                yield change
+            stop.wait(self.seconds_until_due())
+
+    def stats(self):
+        with self._lock:
+            states = list(self._states.values())
+        return {
+            "airports": len(states),
+            "board_reads": self.board_reads,
+            "errors": sum(state.errors for state in states),
+            "intervals": dict((state.airport, state.interval) for state in states),
+        }
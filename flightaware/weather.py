@@ -0,0 +1,539 @@
+"""
+Local parsing of raw METAR and TAF reports.
+
+Client.metar and Client.taf return the raw report string and are cheap calls; MetarEx and NTaf return the same
+information already parsed, at a higher price and with much larger responses. parse_metar decodes the raw report into
+a record with the MetarEx fields plus the ceiling, the cloud layers and the flight category, parse_taf decodes a raw
+forecast into its change periods. parse_metars decodes a batch of reports.
+
+WeatherCache keeps the parsed reports per airport until the next report is due: routine METARs are issued every hour,
+TAFs every six hours, so a dashboard over thousands of airports makes about one cheap call per airport per hour.
+
+    weather = WeatherCache(client)
+    observations = weather.metars(["KBNA", "KATL", "KORD"])
+    observations["KBNA"].flight_category        # "VFR"
+"""
+import calendar
+import datetime
+import logging
+import math
+import re
+import threading
+import time
+
+from flightaware.cache import MISSING, MemoryCache
+from flightaware.pagination import FlightAwareError
+from flightaware.records import Metar, record_type
+from flightaware.scheduler import ContextThreadPoolExecutor
+
+logger = logging.getLogger("flightaware.weather")
+
+METERS_PER_MILE = 1609.344
+KNOTS_PER_MPS = 1.943844
+KNOTS_PER_KMH = 0.539957
+INHG_PER_HPA = 0.0295300
+
+# visibility reported as "9999" or CAVOK, 10 km and more
+UNLIMITED_METRIC_VISIBILITY = round(10000 / METERS_PER_MILE, 2)
+
+METAR_INTERVAL = 3600
+TAF_INTERVAL = 6 * 3600
+
+
+class FlightCategory(object):
+    VFR = "VFR"
+    MVFR = "MVFR"
+    IFR = "IFR"
+    LIFR = "LIFR"
+
+
+Observation = record_type("Observation", Metar._fields + (
+    "ceiling", "clouds", "flight_category",
+), "One parsed METAR: the MetarEx fields, the ceiling in feet (None when unlimited), the cloud layers as (cover, feet, "
+   "type) tuples and the FlightCategory.")
+
+TafPeriod = record_type("TafPeriod", [
+    "change", "start", "end", "probability", "wind_direction", "wind_speed", "wind_speed_gust", "visibility",
+    "conditions", "clouds", "ceiling", "flight_category",
+], "One TAF period, change is None for the base forecast, else FM, BECMG, TEMPO or PROB; start and end are epoch "
+   "seconds. Fields a BECMG, TEMPO or PROB group does not change are None.")
+
+Taf = record_type("Taf", [
+    "airport", "issued", "valid_from", "valid_to", "periods", "raw_data",
+], "One parsed TAF, times are epoch seconds.")
+
+CLOUD_FRIENDLY = {
+    "SKC": "Clear skies", "CLR": "Clear skies", "NSC": "Clear skies", "NCD": "Clear skies", "CAVOK": "Clear skies",
+    "FEW": "Few clouds", "SCT": "Scattered clouds", "BKN": "Broken clouds", "OVC": "Overcast", "VV": "Sky obscured",
+}
+CEILING_COVERS = frozenset(("BKN", "OVC", "VV"))
+
+_STATION = re.compile(r"^[A-Z][A-Z0-9]{3}$")
+_DAY_TIME = re.compile(r"^(\d{2})(\d{2})(\d{2})Z$")
+_WIND = re.compile(r"^(\d{3}|VRB)(\d{2,3})(?:G(\d{2,3}))?(KT|MPS|KMH)$")
+_WIND_VARIATION = re.compile(r"^\d{3}V\d{3}$")
+_VISIBILITY_MILES = re.compile(r"^([PM])?(?:(\d+)|(\d+)/(\d+))SM$")
+_VISIBILITY_WHOLE = re.compile(r"^\d$")
+_VISIBILITY_METERS = re.compile(r"^(\d{4})(?:NDV|[NSEW]{1,2})?$")
+_RUNWAY_RANGE = re.compile(r"^R\d{2}[LCR]?/")
+_WEATHER = re.compile(r"^(?:[-+]|VC)?(?:MI|PR|BC|DR|BL|SH|TS|FZ)?(?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|"
+                      r"PO|SQ|FC|SS|DS|TS|SH)+$")
+_CLOUD = re.compile(r"^(FEW|SCT|BKN|OVC|VV)(\d{3}|///)(CB|TCU|///)?$")
+_CLEAR = frozenset(("SKC", "CLR", "NSC", "NCD"))
+_TEMPERATURE = re.compile(r"^(M?\d{2})/(M?\d{2})?$")
+_ALTIMETER = re.compile(r"^([AQ])(\d{4})$")
+_END_OF_BODY = frozenset(("RMK", "TEMPO", "BECMG", "NOSIG", "TREND"))
+
+_TAF_VALIDITY = re.compile(r"^(\d{2})(\d{2})/(\d{2})(\d{2})$")
+_TAF_FROM = re.compile(r"^FM(\d{2})(\d{2})(\d{2})$")
+_TAF_PROBABILITY = re.compile(r"^PROB(\d{2})$")
+
+
+def flight_category(ceiling, visibility):
+    """
+    FAA flight category for a ceiling in feet and a visibility in statute miles, None meaning unlimited.
+    """
+    ceiling = float("inf") if ceiling is None else ceiling
+    visibility = float("inf") if visibility is None else visibility
+    if ceiling < 500 or visibility < 1:
+        return FlightCategory.LIFR
+    if ceiling < 1000 or visibility < 3:
+        return FlightCategory.IFR
+    if ceiling <= 3000 or visibility <= 5:
+        return FlightCategory.MVFR
+    return FlightCategory.VFR
+
+
+def relative_humidity(temperature, dewpoint):
+    """
+    Percent relative humidity from Celsius temperature and dewpoint (Magnus formula).
+    """
+    def vapor_pressure(celsius):
+        return math.exp(17.625 * celsius / (243.04 + celsius))
+    return int(100 * vapor_pressure(dewpoint) / vapor_pressure(temperature))
+
+
+def wind_friendly(speed):
+    if not speed:
+        return "Calm winds"
+    if speed < 10:
+        return "Light winds"
+    if speed < 20:
+        return "Moderate winds"
+    if speed < 30:
+        return "Strong winds"
+    return "Very strong winds"
+
+
+def resolve_day_time(day, hour, minute, now):
+    """
+    Epoch seconds of the latest day of month/hour/minute not later than a day after now, reports only carry the day.
+    """
+    latest = datetime.datetime.fromtimestamp(now, datetime.timezone.utc) + datetime.timedelta(days=1)
+    year, month = latest.year, latest.month
+    for _ in range(3):
+        days_in_month = calendar.monthrange(year, month)[1]
+        if day <= days_in_month:
+            moment = datetime.datetime(year, month, day, tzinfo=datetime.timezone.utc)
+            moment += datetime.timedelta(hours=hour, minutes=minute)
+            if moment <= latest:
+                return calendar.timegm(moment.timetuple())
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    raise ValueError("no recent day {}".format(day))
+
+
+def next_day_time(day, hour, minute, start):
+    """
+    Epoch seconds of the first day of month/hour/minute at or after start, for times inside a forecast validity.
+    """
+    moment = datetime.datetime.fromtimestamp(start, datetime.timezone.utc)
+    year, month = moment.year, moment.month
+    for _ in range(3):
+        if day <= calendar.monthrange(year, month)[1]:
+            resolved = calendar.timegm((year, month, day, 0, 0, 0)) + hour * 3600 + minute * 60
+            if resolved >= start:
+                return resolved
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+    raise ValueError("no day {} after {}".format(day, start))
+
+
+def _utc_now():
+    return int(time.time())
+
+
+def _knots(speed, unit):
+    speed = int(speed)
+    if unit == "MPS":
+        return int(round(speed * KNOTS_PER_MPS))
+    if unit == "KMH":
+        return int(round(speed * KNOTS_PER_KMH))
+    return speed
+
+
+def _celsius(value):
+    return -int(value[1:]) if value.startswith("M") else int(value)
+
+
+class _Conditions(object):
+    """
+    Wind, visibility, weather and cloud groups shared by METAR bodies and TAF periods.
+    """
+    __slots__ = ("wind_direction", "wind_speed", "wind_speed_gust", "visibility", "conditions", "clouds")
+
+    def __init__(self):
+        self.wind_direction = None
+        self.wind_speed = None
+        self.wind_speed_gust = None
+        self.visibility = None
+        self.conditions = []
+        self.clouds = None
+
+    def parse(self, tokens, index):
+        """
+        Consume the group at tokens[index] if it is one of ours, return the index of the next token or None.
+        """
+        token = tokens[index]
+        match = _WIND.match(token)
+        if match:
+            direction, speed, gust, unit = match.groups()
+            self.wind_direction = None if direction == "VRB" else int(direction)
+            self.wind_speed = _knots(speed, unit)
+            self.wind_speed_gust = _knots(gust, unit) if gust else 0
+            return index + 1
+        if _WIND_VARIATION.match(token) or _RUNWAY_RANGE.match(token):
+            return index + 1
+        if token == "CAVOK":
+            self.visibility = UNLIMITED_METRIC_VISIBILITY
+            self.clouds = []
+            return index + 1
+        if _VISIBILITY_WHOLE.match(token) and index + 1 < len(tokens):
+            # "1 1/2SM"
+            match = _VISIBILITY_MILES.match(tokens[index + 1])
+            if match and match.group(3):
+                self.visibility = int(token) + float(match.group(3)) / float(match.group(4))
+                return index + 2
+        match = _VISIBILITY_MILES.match(token)
+        if match:
+            modifier, whole, numerator, denominator = match.groups()
+            # P6SM (more than 6 miles) and M1/4SM (less than a quarter mile) keep the bound
+            self.visibility = float(whole) if whole else float(numerator) / float(denominator)
+            return index + 1
+        match = _VISIBILITY_METERS.match(token)
+        if match and self.visibility is None:
+            meters = int(match.group(1))
+            self.visibility = UNLIMITED_METRIC_VISIBILITY if meters == 9999 else round(meters / METERS_PER_MILE, 2)
+            return index + 1
+        match = _CLOUD.match(token)
+        if match:
+            cover, height, kind = match.groups()
+            layer = (cover, None if height == "///" else int(height) * 100, kind if kind != "///" else None)
+            self.clouds = (self.clouds or []) + [layer]
+            return index + 1
+        if token in _CLEAR:
+            self.clouds = []
+            return index + 1
+        if _WEATHER.match(token) or token == "NSW":
+            self.conditions.append(token)
+            return index + 1
+        return None
+
+    @property
+    def ceiling(self):
+        for cover, height, _ in self.clouds or ():
+            if cover in CEILING_COVERS and height is not None:
+                return height
+        return None
+
+
+def parse_metar(raw, now=None):
+    """
+    Parse one raw METAR or SPECI report into an Observation. now (epoch seconds, default the current time) resolves the
+    day of month of the report. Raises ValueError for a report without station, time or wind.
+    """
+    tokens = raw.split()
+    index = 0
+    if tokens and tokens[0] in ("METAR", "SPECI"):
+        index += 1
+    if index >= len(tokens) or not _STATION.match(tokens[index]):
+        raise ValueError("no station in METAR {!r}".format(raw))
+    airport = tokens[index]
+    match = _DAY_TIME.match(tokens[index + 1]) if index + 1 < len(tokens) else None
+    if match is None:
+        raise ValueError("no time in METAR {!r}".format(raw))
+    day, hour, minute = map(int, match.groups())
+    observed = resolve_day_time(day, hour, minute, _utc_now() if now is None else now)
+    index += 2
+
+    conditions = _Conditions()
+    temperature = dewpoint = pressure = None
+    while index < len(tokens):
+        token = tokens[index]
+        if token in _END_OF_BODY:
+            break
+        following = conditions.parse(tokens, index)
+        if following is not None:
+            index = following
+            continue
+        match = _TEMPERATURE.match(token)
+        if match:
+            temperature = _celsius(match.group(1))
+            dewpoint = _celsius(match.group(2)) if match.group(2) else None
+        else:
+            match = _ALTIMETER.match(token)
+            if match:
+                value = int(match.group(2))
+                pressure = value / 100.0 if match.group(1) == "A" else round(value * INHG_PER_HPA, 2)
+        # AUTO, COR and groups not decoded here are skipped
+        index += 1
+    if conditions.wind_speed is None:
+        raise ValueError("no wind in METAR {!r}".format(raw))
+
+    clouds = conditions.clouds or []
+    lowest = clouds[0] if clouds else ("CLR", 0, None)
+    ceiling = conditions.ceiling
+    return Observation(
+        airport=airport,
+        time=observed,
+        cloud_friendly=CLOUD_FRIENDLY.get(lowest[0], ""),
+        cloud_altitude=lowest[1] or 0,
+        cloud_type=lowest[0],
+        conditions=" ".join(conditions.conditions),
+        pressure=pressure,
+        temp_air=temperature,
+        temp_dewpoint=dewpoint,
+        temp_relhum=relative_humidity(temperature, dewpoint) if temperature is not None and dewpoint is not None else None,
+        visibility=conditions.visibility,
+        wind_friendly=wind_friendly(conditions.wind_speed),
+        wind_direction=conditions.wind_direction,
+        wind_speed=conditions.wind_speed,
+        wind_speed_gust=conditions.wind_speed_gust,
+        raw_data=raw,
+        ceiling=ceiling,
+        clouds=clouds,
+        flight_category=flight_category(ceiling, conditions.visibility),
+    )
+
+
+def parse_metars(reports, now=None):
+    """
+    Parse a batch of raw METARs, return a list of Observations in the same order with None for unparseable reports.
+    """
+    now = _utc_now() if now is None else now
+    observations = []
+    for raw in reports:
+        try:
+            observations.append(parse_metar(raw, now))
+        except (ValueError, IndexError) as e:
+            logger.debug("skipping METAR: %s", e)
+            observations.append(None)
+    return observations
+
+
+def _period(change, start, end, probability, conditions):
+    ceiling = conditions.ceiling
+    partial = change in ("BECMG", "TEMPO", "PROB")
+    category = None
+    if not partial or conditions.clouds is not None or conditions.visibility is not None:
+        category = flight_category(ceiling, conditions.visibility)
+    return TafPeriod(change, start, end, probability, conditions.wind_direction, conditions.wind_speed,
+                     conditions.wind_speed_gust, conditions.visibility, " ".join(conditions.conditions),
+                     conditions.clouds, ceiling, category)
+
+
+def parse_taf(raw, now=None):
+    """
+    Parse one raw TAF into a Taf whose periods are the base forecast followed by its FM, BECMG, TEMPO and PROB groups.
+    FM periods end where the next FM period starts. Raises ValueError for a forecast without station or validity.
+    """
+    now = _utc_now() if now is None else now
+    tokens = raw.split()
+    index = 0
+    while index < len(tokens) and tokens[index] in ("TAF", "AMD", "COR"):
+        index += 1
+    if index >= len(tokens) or not _STATION.match(tokens[index]):
+        raise ValueError("no station in TAF {!r}".format(raw))
+    airport = tokens[index]
+    index += 1
+    issued = None
+    match = _DAY_TIME.match(tokens[index]) if index < len(tokens) else None
+    if match:
+        issued = resolve_day_time(*map(int, match.groups()), now=now)
+        index += 1
+    match = _TAF_VALIDITY.match(tokens[index]) if index < len(tokens) else None
+    if match is None:
+        raise ValueError("no validity in TAF {!r}".format(raw))
+    start_day, start_hour, end_day, end_hour = map(int, match.groups())
+    valid_from = resolve_day_time(start_day, start_hour, 0, issued if issued is not None else now)
+    valid_to = next_day_time(end_day, end_hour, 0, valid_from)
+    index += 1
+
+    periods = []
+    change, start, end, probability = None, valid_from, valid_to, None
+    conditions = _Conditions()
+    while index < len(tokens):
+        token = tokens[index]
+        match = _TAF_FROM.match(token)
+        probability_match = _TAF_PROBABILITY.match(token)
+        if match or probability_match or token in ("BECMG", "TEMPO"):
+            periods.append(_period(change, start, end, probability, conditions))
+            conditions = _Conditions()
+            probability = None
+            if match:
+                change, start, end = "FM", next_day_time(*map(int, match.groups()), start=valid_from), valid_to
+                index += 1
+                continue
+            if probability_match:
+                change, probability = "PROB", int(probability_match.group(1))
+                index += 1
+                if index < len(tokens) and tokens[index] == "TEMPO":
+                    index += 1
+            else:
+                change = token
+                index += 1
+            match = _TAF_VALIDITY.match(tokens[index]) if index < len(tokens) else None
+            if match is None:
+                raise ValueError("no period after {} in TAF {!r}".format(change, raw))
+            start, end = _validity(match, valid_from)
+            index += 1
+            continue
+        if token == "RMK":
+            break
+        following = conditions.parse(tokens, index)
+        index = following if following is not None else index + 1
+    periods.append(_period(change, start, end, probability, conditions))
+
+    # an FM period lasts until the next one starts
+    starts = [period.start for period in periods if period.change == "FM"]
+    for position, period in enumerate(periods):
+        if period.change in (None, "FM"):
+            following = [moment for moment in starts if moment > period.start]
+            if following:
+                periods[position] = period._replace(end=min(following))
+    return Taf(airport, issued, valid_from, valid_to, periods, raw)
+
+
+def _validity(match, valid_from):
+    # a change group period, inside the validity of the forecast
+    start_day, start_hour, end_day, end_hour = map(int, match.groups())
+    start = next_day_time(start_day, start_hour, 0, valid_from)
+    return start, next_day_time(end_day, end_hour, 0, start)
+
+
+def prevailing(taf, when):
+    """
+    The base or FM period of taf in force at epoch seconds when, or None outside the validity of the forecast.
+    """
+    current = None
+    for period in taf.periods:
+        if period.change in (None, "FM") and period.start <= when < period.end:
+            current = period
+    return current
+
+
+class WeatherCache(object):
+    """
+    Parsed METARs and TAFs per airport, each kept until its next routine issue.
+
+    client          Client used for the Metar and Taf calls
+    cache           any flightaware.cache cache, a MemoryCache by default; parsed reports are stored as dicts
+    grace           seconds after the expected issue time a report is still kept, the time a new report takes to be
+                    disseminated
+    min_ttl         shortest time a report is kept, for stations whose last report is overdue
+    max_workers     airports fetched in parallel by metars() and tafs()
+
+    Special reports (SPECI) and amended forecasts issued before the routine time are picked up at the next expiry.
+    """
+    def __init__(self, client, cache=None, grace=300, min_ttl=60, max_workers=16):
+        self.client = client
+        self.cache = cache if cache is not None else MemoryCache(maxsize=50000)
+        self.grace = grace
+        self.min_ttl = min_ttl
+        self.max_workers = max_workers
+        self.fetches = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _fetch(self, method, airport):
+        with self._lock:
+            self.fetches += 1
+        raw = getattr(self.client, method)(airport)
+        if isinstance(raw, dict) and "error" in raw:
+            raise FlightAwareError(raw["error"])
+        if not isinstance(raw, str) or not raw.strip():
+            raise FlightAwareError("no {} for {}".format(method.upper(), airport))
+        return raw
+
+    def _ttl(self, issued, interval, now):
+        # the next routine report is due one interval after this one
+        return max(self.min_ttl, issued + interval + self.grace - now)
+
+    def metar(self, airport, now=None):
+        """
+        Parsed current METAR of airport as an Observation. Raises FlightAwareError when no report is available.
+        """
+        now = _utc_now() if now is None else now
+        key = "metar:" + airport
+        value = self.cache.get(key)
+        if value is not MISSING:
+            return Observation.from_dict(value)
+        try:
+            observation = parse_metar(self._fetch("metar", airport), now)
+        except ValueError as e:
+            raise FlightAwareError("unparseable METAR for {}: {}".format(airport, e))
+        self.cache.set(key, observation.to_dict(), self._ttl(observation.time, METAR_INTERVAL, now))
+        return observation
+
+    def taf(self, airport, now=None):
+        """
+        Parsed current TAF of airport. Raises FlightAwareError when no forecast is available.
+        """
+        now = _utc_now() if now is None else now
+        key = "taf:" + airport
+        value = self.cache.get(key)
+        if value is not MISSING:
+            value = dict(value)
+            value["periods"] = [TafPeriod.from_dict(period) for period in value["periods"]]
+            return Taf.from_dict(value)
+        try:
+            taf = parse_taf(self._fetch("taf", airport), now)
+        except ValueError as e:
+            raise FlightAwareError("unparseable TAF for {}: {}".format(airport, e))
+        value = taf.to_dict()
+        value["periods"] = [period.to_dict() for period in taf.periods]
+        # routine TAFs are valid from 00, 06, 12 and 18Z and issued shortly before, the validity start (not the issue
+        # time) gives the cycle of the forecast, amendments included
+        self.cache.set(key, value, self._ttl(taf.valid_from - taf.valid_from % TAF_INTERVAL, TAF_INTERVAL, now))
+        return taf
+
+    def _many(self, fetch, airports, now):
+        def one(airport):
+            try:
+                return airport, fetch(airport, now)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                logger.warning("no weather for %s", airport, exc_info=True)
+                return airport, None
+        airports = list(airports)
+        if not airports:
+            return {}
+        with ContextThreadPoolExecutor(max_workers=min(self.max_workers, len(airports))) as executor:
+            return dict((airport, result) for airport, result in executor.map(one, airports) if result is not None)
+
+    def metars(self, airports, now=None):
+        """
+        Parsed METARs of many airports as a dict of airport => Observation, airports without a report are left out.
+        """
+        return self._many(self.metar, airports, now)
+
+    def tafs(self, airports, now=None):
+        """
+        Parsed TAFs of many airports as a dict of airport => Taf, airports without a forecast are left out.
+        """
+        return self._many(self.taf, airports, now)
+
+    def stats(self):
+        stats = {"fetches": self.fetches, "errors": self.errors}
+        if hasattr(self.cache, "stats"):
+            stats["cache"] = self.cache.stats()
+        return stats
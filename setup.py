@@ -19,6 +19,12 @@ config = {
     "install_requires": [
         "requests>=2.0.0",
     ],
+    "extras_require": {
+        "async": ["aiohttp>=3.0"],
+        "export": ["pyarrow"],
+        "fast": ["orjson"],
+        "numpy": ["numpy"],
+    },
     "keywords": "travel flightaware airline flight flight-tracking flight-data",
     "classifiers": [
         "Development Status :: 3 - Alpha",
@@ -0,0 +1,152 @@
+import asyncio
+import datetime
+import json
+import unittest
+from unittest import mock
+
+try:
+    from aiohttp.test_utils import TestClient, TestServer
+except ImportError:     # optional dependency, the receiver tests are skipped
+    TestClient = TestServer = None
+
+from benchmarks.stub_server import StubServer
+from flightaware import alerts
+from flightaware.alerts import Alert, AlertReceiver, InvalidAlert, decode_alert
+from flightaware.client import AlertEvent, Client, alert_channels
+
+ALERT = {
+    "alert_id": "42",
+    "eventcode": "arrival",
+    "summary": "SWA2558 arrived at KATL",
+    "flight": {"ident": "SWA2558", "origin": "KBNA", "destination": "KATL"},
+    "added_later": True,
+}
+
+
+class DecodeAlertTests(unittest.TestCase):
+    def test_decode(self):
+        alert = decode_alert(json.dumps(ALERT).encode("utf-8"))
+        self.assertIsInstance(alert, Alert)
+        self.assertEqual((alert.alert_id, alert.eventcode, alert.flight["ident"]), (42, "arrival", "SWA2558"))
+        self.assertIsNone(alert.long_desc)
+
+    def test_invalid(self):
+        for body in (b"not json", b"[1]", json.dumps(dict(ALERT, eventcode=None)), json.dumps(dict(ALERT, flight="x")),
+                     json.dumps(dict(ALERT, alert_id="abc"))):
+            with self.assertRaises(InvalidAlert):
+                decode_alert(body)
+
+
+class WithoutAiohttpTests(unittest.TestCase):
+    def test_receiver_requires_aiohttp(self):
+        with mock.patch.object(alerts, "web", None):
+            with self.assertRaises(ImportError):
+                AlertReceiver()
+
+
+@unittest.skipUnless(TestServer, "requires aiohttp")
+class AlertReceiverTests(unittest.TestCase):
+    def run_receiver(self, receiver, scenario):
+        async def run():
+            client = TestClient(TestServer(receiver.application()))
+            await client.start_server()
+            try:
+                return await scenario(client)
+            finally:
+                await client.close()
+        return asyncio.run(run())
+
+    def test_dispatch_by_eventcode(self):
+        receiver = AlertReceiver(token="s3cret")
+        seen = []
+
+        async def on_arrival(alert):
+            seen.append(("arrival", alert.alert_id))
+
+        def failing(alert):
+            raise RuntimeError("handler bug")
+
+        receiver.add_handler(on_arrival, eventcode="arrival")
+        receiver.add_handler(lambda alert: seen.append(("any", alert.alert_id)))
+        receiver.add_handler(failing, eventcode="departure")
+
+        async def scenario(client):
+            path = receiver.path + "?token=s3cret"
+            statuses = [
+                (await client.post(path, data=json.dumps(ALERT))).status,
+                (await client.post(path, data=json.dumps(dict(ALERT, alert_id=7, eventcode="departure")))).status,
+                (await client.post(receiver.path + "?token=wrong", data=json.dumps(ALERT))).status,
+                (await client.post(path, data=b"garbage")).status,
+            ]
+            await receiver._queue.join()
+            return statuses
+
+        with self.assertLogs("flightaware.alerts", "WARNING"):
+            statuses = self.run_receiver(receiver, scenario)
+        self.assertEqual(statuses, [200, 200, 403, 400])
+        self.assertEqual(sorted(seen), [("any", 7), ("any", 42), ("arrival", 42)])
+        stats = receiver.stats()
+        self.assertEqual((stats["received"], stats["rejected"], stats["dispatched"], stats["handler_errors"]), (2, 2, 2, 1))
+
+    def test_full_queue_is_answered_with_503(self):
+        receiver = AlertReceiver(queue_size=1, workers=1, put_timeout=0.05)
+
+        async def scenario(client):
+            gate = asyncio.Event()
+
+            async def slow(alert):
+                await gate.wait()
+
+            receiver.add_handler(slow)
+            statuses = []
+            for alert_id in range(3):
+                response = await client.post(receiver.path, data=json.dumps(dict(ALERT, alert_id=alert_id)))
+                statuses.append((response.status, response.headers.get("Retry-After")))
+            gate.set()
+            await receiver._queue.join()
+            return statuses
+
+        statuses = self.run_receiver(receiver, scenario)
+        # the worker holds the first alert, the queue the second
+        self.assertEqual(statuses, [(200, None), (200, None), (503, "30")])
+        self.assertEqual(receiver.stats()["deferred"], 1)
+        self.assertEqual(receiver.stats()["received"], 2)
+        self.assertEqual(receiver.stats()["dispatched"], 2)
+
+    def test_stuck_handler_does_not_block_stop(self):
+        receiver = AlertReceiver(workers=1, drain_timeout=0.1)
+
+        async def stuck(alert):
+            await asyncio.Event().wait()
+
+        receiver.add_handler(stuck)
+
+        async def scenario(client):
+            for alert_id in range(2):
+                response = await client.post(receiver.path, data=json.dumps(dict(ALERT, alert_id=alert_id)))
+                self.assertEqual(response.status, 200)
+
+        with self.assertLogs("flightaware.alerts", "WARNING"):
+            self.run_receiver(receiver, scenario)
+        self.assertEqual((receiver.stats()["received"], receiver.stats()["dispatched"]), (2, 0))
+
+
+class SetAlertTests(unittest.TestCase):
+    def test_dates_and_channels(self):
+        posted = []
+        with StubServer({"SetAlert": lambda params: posted.append(params) or 42}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            start = datetime.datetime(2014, 5, 13)
+            self.assertEqual(client.set_alert(ident="SWA2558", date_start=start, date_end=1400025600,
+                                              channels=alert_channels([AlertEvent.ARRIVAL])), 42)
+            client.set_alert(ident="SWA2558", date_start=0)
+            client.close()
+        self.assertEqual(posted[0]["date_start"], "1399939200")
+        self.assertEqual(posted[0]["date_end"], "1400025600")
+        self.assertEqual(posted[0]["channels"], "{16 e_arrival}")
+        self.assertNotIn("date_start", posted[1])
+        self.assertNotIn("date_end", posted[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
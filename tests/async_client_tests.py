@@ -0,0 +1,128 @@
+import asyncio
+import datetime
+import inspect
+import threading
+import time
+import unittest
+import warnings
+from unittest import mock
+
+try:
+    import aiohttp
+except ImportError:     # optional dependency, the AsyncClient tests are skipped
+    aiohttp = None
+
+from benchmarks.payloads import load_fixtures
+from benchmarks.stub_server import StubServer
+from flightaware import async_client
+from flightaware.async_client import AsyncClient
+from flightaware.client import Client
+
+ARGUMENTS = {
+    "start_date": datetime.datetime(2014, 5, 13),
+    "end_date": datetime.datetime(2014, 5, 14),
+    "departure_datetime": datetime.datetime(2014, 5, 13, 17),
+    "lat1": 36.1245,
+    "lon1": -86.6782,
+    "lat2": 33.6367,
+    "lon2": -84.4281,
+    "max_size": 15,
+    "alert_id": 42,
+}
+
+
+def arguments(function):
+    # every required parameter gets a plausible value, airport codes and idents will do for the rest
+    parameters = list(inspect.signature(function).parameters.values())[1:]
+    return [ARGUMENTS.get(parameter.name, "KBNA") for parameter in parameters if parameter.default is parameter.empty]
+
+
+def outcome(call):
+    try:
+        result = call()
+        if inspect.isgenerator(result):
+            return "ok", list(result)
+        return "ok", result
+    except Exception as e:
+        return "error", type(e)
+
+
+async def async_outcome(call):
+    try:
+        result = call()
+        if inspect.isasyncgen(result):
+            return "ok", [item async for item in result]
+        return "ok", await result
+    except Exception as e:
+        return "error", type(e)
+
+
+class WithoutAiohttpTests(unittest.TestCase):
+    def test_client_requires_aiohttp(self):
+        with mock.patch.object(async_client, "aiohttp", None):
+            with self.assertRaises(ImportError):
+                AsyncClient("user", "key")
+
+
+@unittest.skipUnless(aiohttp, "requires aiohttp")
+class AsyncClientTests(unittest.TestCase):
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        counts = {"current": 0, "peak": 0}
+
+        def latency(method, params):
+            with lock:
+                counts["current"] += 1
+                counts["peak"] = max(counts["peak"], counts["current"])
+            time.sleep(0.05)
+            with lock:
+                counts["current"] -= 1
+            return 0
+
+        async def run(base_url):
+            async with AsyncClient("user", "key", base_url=base_url, max_in_flight=5, coalesce=False) as client:
+                return await asyncio.gather(*[client.airport_info("K{:03d}".format(i)) for i in range(20)])
+
+        with StubServer(load_fixtures(), latency=latency) as server:
+            results = asyncio.run(run(server.base_url))
+        self.assertEqual(len(results), 20)
+        self.assertEqual(counts["peak"], 5)
+
+    def test_same_methods_as_client(self):
+        names = [name for name, _ in inspect.getmembers(Client, inspect.isfunction)
+                 if not name.startswith("_") and name != "close"]
+        self.assertTrue(all(hasattr(AsyncClient, name) for name in names))
+
+        def call(client, name):
+            return lambda: getattr(client, name)(*arguments(getattr(Client, name)))
+
+        async def run(base_url):
+            found = {}
+            async with AsyncClient("user", "key", base_url=base_url) as client:
+                for name in names:
+                    found[name] = await async_outcome(call(client, name))
+            return found
+
+        with StubServer(load_fixtures()) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            expected = dict((name, outcome(call(client, name))) for name in names)
+            client.close()
+            found = asyncio.run(run(server.base_url))
+        for name in names:
+            self.assertEqual(found[name], expected[name], name)
+
+    def test_no_deprecated_auth(self):
+        async def run(base_url):
+            async with AsyncClient("user", "key", base_url=base_url) as client:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error", DeprecationWarning)
+                    return await client.airport_info("KBNA"), client.session.headers["Authorization"]
+
+        with StubServer(load_fixtures()) as server:
+            info, authorization = asyncio.run(run(server.base_url))
+        self.assertEqual(info["name"], "Nashville Intl")
+        self.assertEqual(authorization, "Basic dXNlcjprZXk=")
+
+
+if __name__ == "__main__":
+    unittest.main()
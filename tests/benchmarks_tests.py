@@ -0,0 +1,72 @@
+import gzip
+import json
+import unittest
+
+import requests
+
+from benchmarks.payloads import load_fixtures, paged, records_of, scale_airports, scale_schedules
+from benchmarks.stub_server import DEFAULT_RESULT, StubServer
+from benchmarks.suite import compare, result
+from flightaware.client import Client
+
+
+class PayloadTests(unittest.TestCase):
+    def test_fixtures_are_named_after_methods(self):
+        fixtures = load_fixtures()
+        for method in ("AirlineFlightSchedules", "AirportInfo", "AllAirports", "MetarEx", "Taf"):
+            self.assertIn(method, fixtures)
+
+    def test_scaled_payloads(self):
+        flights = records_of(load_fixtures()["AirlineFlightSchedules"])
+        scaled = scale_schedules(flights, 100)
+        self.assertEqual(len(scaled), 100)
+        self.assertEqual(len(set((flight["ident"], flight["departuretime"]) for flight in scaled)), 100)
+        self.assertEqual(scaled[len(flights)]["departuretime"], flights[0]["departuretime"] + 86400)
+        airports = scale_airports(1000)
+        self.assertEqual(len(set(airports)), 1000)
+        self.assertTrue(all(len(code) == 4 for code in airports))
+
+    def test_paged(self):
+        page = paged(list(range(25)))
+        self.assertEqual(page({"howMany": "10", "offset": "10"}), {"data": list(range(10, 20)), "next_offset": 20})
+        self.assertEqual(page({"howMany": "10", "offset": "20"}), {"data": list(range(20, 25)), "next_offset": -1})
+
+
+class StubServerTests(unittest.TestCase):
+    def test_envelope_params_and_default(self):
+        seen = []
+        with StubServer({"AirportInfo": lambda params: seen.append(params) or {"name": "Nashville Intl"}}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            self.assertEqual(client.airport_info("KBNA"), {"name": "Nashville Intl"})
+            self.assertEqual(client.aircraft_type("GALX"), DEFAULT_RESULT["data"])
+            client.close()
+        self.assertEqual(seen, [{"airportCode": "KBNA"}])
+
+    def test_gzip_and_latency(self):
+        latencies = []
+
+        def latency(method, params):
+            latencies.append(method)
+            return 0
+
+        with StubServer({"AirportInfo": {"name": "Nashville Intl"}}, latency=latency, compress=True) as server:
+            r = requests.post(server.base_url + "AirportInfo", headers={"Accept-Encoding": "gzip"}, stream=True)
+            body = r.raw.read()
+        self.assertEqual(r.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body)), {"AirportInfoResult": {"name": "Nashville Intl"}})
+        self.assertEqual(latencies, ["AirportInfo"])
+
+
+class CompareTests(unittest.TestCase):
+    def test_regressions(self):
+        baseline = {"results": [result("throughput", {"c": 1}, 100, "calls/s"), result("decode", {}, 10, "ms", False)]}
+        current = {"results": [result("throughput", {"c": 1}, 85, "calls/s"), result("decode", {}, 10.5, "ms", False),
+                               result("new", {}, 1, "ms", False)]}
+        regressions = compare(baseline, current)
+        self.assertEqual([entry["benchmark"] for entry in regressions], ["throughput"])
+        self.assertAlmostEqual(regressions[0]["change"], -0.15)
+        self.assertEqual(compare(baseline, current, tolerance=0.2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import random
+import re
+import unittest
+
+from benchmarks.stub_server import StubServer
+from flightaware.birdseye import Query, Tile, TiledSearch, grid
+from flightaware.client import Client, ResultMode
+from flightaware.pagination import FlightAwareError
+
+RANGE = re.compile(r"\{range (lat|lon) (\S+) (\S+)\}")
+
+
+class QueryTests(unittest.TestCase):
+    def test_rendering(self):
+        query = Query().range("alt", 100, 450).match("ident", "SWA*").orig_or_dest("KBNA").airline()
+        self.assertEqual(str(query), "{range alt 100 450} {match ident SWA*} {orig_or_dest {KBNA}} {airline 1}")
+        self.assertEqual(str(Query().isin("type", ["B737", "B738"])), "{in type {B737 B738}}")
+        self.assertEqual(str(Query().box(36, -87.5, 36.123456789, -86)), "{range lat 36 36.123457} {range lon -87.5 -86}")
+
+    def test_quoting(self):
+        self.assertEqual(str(Query().eq("name", "New York")), "{= name {New York}}")
+        with self.assertRaises(ValueError):
+            Query().eq("name", "a}b")
+
+    def test_immutable_and_hashable(self):
+        base = Query().gt("alt", 100)
+        self.assertEqual(base.lt("gs", 300), base.lt("gs", 300))
+        self.assertEqual(len(base.terms), 1)
+        self.assertEqual(len({base, Query().gt("alt", 100)}), 1)
+        self.assertEqual(str(base + Query().null("dest")), "{> alt 100} {null dest}")
+
+
+class TileTests(unittest.TestCase):
+    def test_grid_and_split(self):
+        tiles = grid((24.0, -125.0, 50.0, -66.0), 10.0)
+        self.assertEqual(len(tiles), 3 * 6)
+        self.assertEqual(tiles[0], (24.0, -125.0, 24.0 + 26 / 3.0, -125.0 + 59 / 6.0))
+        self.assertEqual(tiles[-1][2:], (50.0, -66.0))
+        quarters = Tile(0.0, 0.0, 2.0, 4.0).split()
+        self.assertEqual(quarters[0], (0.0, 0.0, 1.0, 2.0))
+        self.assertEqual(quarters[3], (1.0, 2.0, 2.0, 4.0))
+        self.assertEqual(Tile(0.0, 0.0, 2.0, 4.0).size, 4.0)
+
+
+class TiledSearchTests(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        # a busy cluster around Atlanta and scattered traffic elsewhere
+        self.aircraft = [{"faFlightID": "F{}".format(i), "latitude": rng.gauss(33.6, 0.3), "longitude": rng.gauss(-84.4, 0.3)}
+                         for i in range(300)]
+        self.aircraft += [{"faFlightID": "G{}".format(i), "latitude": rng.uniform(25, 49), "longitude": rng.uniform(-124, -67)}
+                          for i in range(200)]
+        self.server = StubServer({"SearchBirdseyeInFlight": self.search, "SetMaximumResultSize": 1}).start()
+        self.client = Client("user", "key", base_url=self.server.base_url)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def search(self, params):
+        bounds = dict((key, (float(low), float(high))) for key, low, high in RANGE.findall(params["query"]))
+        found = [aircraft for aircraft in self.aircraft
+                 if bounds["lat"][0] <= aircraft["latitude"] <= bounds["lat"][1]
+                 and bounds["lon"][0] <= aircraft["longitude"] <= bounds["lon"][1]]
+        if not found:
+            return {"error": "NO_DATA no results"}
+        offset = int(params["offset"])
+        return {"aircraft": found[offset:offset + int(params["howMany"])]}
+
+    def test_sweep_is_complete_and_reuses_tiles(self):
+        box = (24.0, -125.0, 50.0, -66.0)
+        search = TiledSearch(self.client, Query().gt("alt", 0), page_size=40, min_tile=0.5)
+        found = search.sweep(box)
+        self.assertEqual(sorted(aircraft["faFlightID"] for aircraft in found),
+                         sorted(aircraft["faFlightID"] for aircraft in self.aircraft))
+        self.assertGreater(search.stats()["splits"], 0)
+        first = search.queries
+        self.assertEqual(len(search.sweep(box)), len(self.aircraft))
+        self.assertLess(search.queries - first, first)
+
+    def test_aircraft_without_flight_id_are_kept(self):
+        self.aircraft = [{"ident": "N123AB", "latitude": 36.1, "longitude": -86.7, "timestamp": 1400000000},
+                         {"ident": "N456CD", "latitude": 36.2, "longitude": -86.6, "timestamp": 1400000000},
+                         {"faFlightID": "F1", "ident": "SWA2558", "latitude": 36.3, "longitude": -86.5}]
+        found = TiledSearch(self.client, page_size=40).sweep((35.0, -87.0, 37.0, -86.0))
+        self.assertEqual(sorted(aircraft["ident"] for aircraft in found), ["N123AB", "N456CD", "SWA2558"])
+
+    def test_columns_client_is_rejected(self):
+        client = Client("user", "key", base_url=self.server.base_url, result_mode=ResultMode.COLUMNS)
+        with self.assertRaises(ValueError):
+            TiledSearch(client)
+        client.close()
+
+    def test_other_errors_raise(self):
+        with StubServer({"SearchBirdseyeInFlight": {"error": "INVALID_ARGUMENT query"}}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            with self.assertRaises(FlightAwareError):
+                TiledSearch(client).sweep((0.0, 0.0, 1.0, 1.0))
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from benchmarks.stub_server import StubServer
+from flightaware.cache import MISSING, MemoryCache, SqliteCache, TieredCache, cache_key
+from flightaware.client import Client
+
+
+class CacheKeyTests(unittest.TestCase):
+    def test_stable_and_ignores_none(self):
+        self.assertEqual(cache_key("AirportInfo", {"airportCode": "KBNA", "x": None}),
+                         cache_key("AirportInfo", {"airportCode": "KBNA"}))
+        self.assertNotEqual(cache_key("AirportInfo", {"airportCode": "KBNA"}),
+                            cache_key("AirportInfo", {"airportCode": "KATL"}))
+        self.assertEqual(cache_key("M", {"a": 1, "b": 2}), cache_key("M", {"b": 2, "a": 1}))
+
+
+class MemoryCacheTests(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set("a", 1, 60)
+        cache.set("b", 2, 60)
+        cache.get("a")
+        cache.set("c", 3, 60)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expiry(self):
+        cache = MemoryCache()
+        cache.set("a", 1, -1)
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(len(cache), 0)
+
+
+class PersistentCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sqlite_survives_reopen(self):
+        cache = SqliteCache(self.path)
+        cache.set("a", {"name": "Nashville"}, 60)
+        cache.set("old", 1, -1)
+        cache.close()
+        cache = SqliteCache(self.path)
+        self.assertEqual(cache.get("a"), {"name": "Nashville"})
+        self.assertIs(cache.get("old"), MISSING)
+        cache.purge()
+        self.assertEqual(cache.stats()["size"], 1)
+        cache.close()
+
+    def test_tiered_promotes_disk_hits(self):
+        disk = SqliteCache(self.path)
+        disk.set("a", 1, 60)
+        cache = TieredCache(MemoryCache(), disk)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.memory.get("a"), 1)
+        expires = cache.memory._data["a"][0]
+        self.assertAlmostEqual(expires, time.time() + 60, delta=5)
+        disk.close()
+
+
+class ClientCacheTests(unittest.TestCase):
+    def test_reference_calls_are_cached_errors_are_not(self):
+        calls = []
+
+        def airport_info(params):
+            calls.append(params["airportCode"])
+            if params["airportCode"] == "BAD":
+                return {"error": "unknown airport"}
+            return {"name": "Nashville Intl"}
+
+        with StubServer({"AirportInfo": airport_info}) as server:
+            client = Client("user", "key", base_url=server.base_url, cache=MemoryCache())
+            self.assertEqual(client.airport_info("KBNA"), client.airport_info("KBNA"))
+            client.airport_info("BAD")
+            client.airport_info("BAD")
+            client.close()
+        self.assertEqual(calls, ["KBNA", "BAD", "BAD"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+from benchmarks.payloads import load_fixtures
+from benchmarks.stub_server import StubHandler, StubServer
+from flightaware.client import DEFAULT_TIMEOUT, Client
+
+
+class CountingStubServer(StubServer):
+    """
+    StubServer counting the TCP connections it accepts.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CountingStubServer, self).__init__(*args, **kwargs)
+        self.connections = 0
+        process_request = self.httpd.process_request
+
+        def counting(request, client_address):
+            self.connections += 1
+            process_request(request, client_address)
+        self.httpd.process_request = counting
+
+
+class SessionTests(unittest.TestCase):
+    def setUp(self):
+        self.server = CountingStubServer(load_fixtures()).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def pools(self, client):
+        return client.session.get_adapter(self.server.base_url).poolmanager.pools
+
+    def test_connection_is_reused(self):
+        client = Client("user", "key", base_url=self.server.base_url)
+        for code in ("KBNA", "KATL", "KBOS", "KBNA", "KDCA"):
+            self.assertEqual(client.airport_info(code)["name"], "Nashville Intl")
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.pools(client)), 1)
+        client.close()
+        self.assertEqual(len(self.pools(client)), 0)
+
+    def test_context_manager_closes_the_pool(self):
+        with Client("user", "key", base_url=self.server.base_url) as client:
+            client.airport_info("KBNA")
+            client.metar("KBNA")
+            self.assertEqual(len(self.pools(client)), 1)
+        self.assertEqual(len(self.pools(client)), 0)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_pool_block_bounds_connections(self):
+        self.server.httpd.latency = 0.05
+        client = Client("user", "key", base_url=self.server.base_url, pool_maxsize=2, pool_block=True, coalesce=False)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(client.airport_info, ["K{:03d}".format(i) for i in range(16)]))
+        client.close()
+        self.assertEqual(len(results), 16)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_cookies_are_refused(self):
+        end_headers = StubHandler.end_headers
+
+        def with_cookie(handler):
+            handler.send_header("Set-Cookie", "session=1; Path=/")
+            end_headers(handler)
+
+        with mock.patch.object(StubHandler, "end_headers", with_cookie):
+            with Client("user", "key", base_url=self.server.base_url) as client:
+                client.airport_info("KBNA")
+                self.assertEqual(len(client.session.cookies), 0)
+
+    def test_timeout(self):
+        client = Client("user", "key", base_url=self.server.base_url)
+        self.assertEqual(client.timeout, DEFAULT_TIMEOUT)
+        with mock.patch.object(client.session, "post", wraps=client.session.post) as post:
+            client.airport_info("KBNA")
+        self.assertEqual(post.call_args[1]["timeout"], DEFAULT_TIMEOUT)
+        client.close()
+
+        self.server.httpd.latency = 0.5
+        client = Client("user", "key", base_url=self.server.base_url, timeout=0.1)
+        with self.assertRaises(requests.Timeout):
+            client.airport_info("KBNA")
+        client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
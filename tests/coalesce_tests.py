@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:     # optional dependency, the AsyncClient test is skipped
+    aiohttp = None
+
+from benchmarks.stub_server import StubServer
+from flightaware.async_client import AsyncClient
+from flightaware.client import Client
+from flightaware.coalesce import AsyncSingleFlight, SingleFlight
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_waiters_share_result_and_error(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        runs = []
+
+        def function():
+            runs.append(1)
+            started.set()
+            release.wait()
+            return {"name": "Nashville Intl"}
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(flight.do, "KBNA", function)
+            started.wait()
+            waiters = [executor.submit(flight.do, "KBNA", function) for _ in range(4)]
+            while flight.calls < 5:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result() for future in [leader] + waiters]
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats(), {"calls": 5, "shared": 4, "in_flight": 0})
+
+        def fail():
+            raise ValueError("boom")
+        with self.assertRaises(ValueError):
+            flight.do("KBNA", fail)
+        self.assertEqual(flight.do("KBNA", lambda: 1), 1)
+
+    def test_async_waiter_cancel_does_not_cancel_call(self):
+        flight = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return 42
+
+        async def run():
+            first = asyncio.ensure_future(flight.do("k", slow))
+            second = asyncio.ensure_future(flight.do("k", slow))
+            await asyncio.sleep(0)
+            second.cancel()
+            return await first, flight.stats()
+
+        self.assertEqual(asyncio.run(run()), (42, {"calls": 2, "shared": 1, "in_flight": 0}))
+
+
+class ClientCoalescingTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def record(method, result):
+            def answer(params):
+                self.calls.append(method)
+                return result
+            return answer
+
+        alert_ids = iter(range(1, 100))
+        self.server = StubServer({
+            "AirportInfo": record("AirportInfo", {"name": "Nashville Intl"}),
+            "SetAlert": lambda params: record("SetAlert", next(alert_ids))(params),
+        }, latency=0.2).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_reads_are_shared_writes_are_not(self):
+        client = Client("user", "key", base_url=self.server.base_url)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            airports = list(executor.map(lambda _: client.airport_info("KBNA"), range(8)))
+            alerts = list(executor.map(lambda _: client.set_alert(ident="SWA2558"), range(2)))
+        client.close()
+        self.assertEqual(airports, [{"name": "Nashville Intl"}] * 8)
+        self.assertEqual(self.calls.count("AirportInfo"), 1)
+        self.assertEqual(sorted(alerts), [1, 2])
+        self.assertEqual(client.coalescer.stats()["shared"], 7)
+
+    @unittest.skipUnless(aiohttp, "requires aiohttp")
+    def test_async_client(self):
+        async def run():
+            async with AsyncClient("user", "key", base_url=self.server.base_url) as client:
+                airports = await asyncio.gather(*[client.airport_info("KBNA") for _ in range(8)])
+                alerts = await asyncio.gather(*[client.set_alert(ident="SWA2558") for _ in range(2)])
+                return airports, alerts
+
+        airports, alerts = asyncio.run(run())
+        self.assertEqual(airports, [{"name": "Nashville Intl"}] * 8)
+        self.assertEqual(self.calls.count("AirportInfo"), 1)
+        self.assertEqual(sorted(alerts), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import array
+import datetime
+import unittest
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:     # optional dependency, columns fall back to lists and array.array
+    numpy = None
+
+from benchmarks.payloads import load_fixtures, paged, scale_schedules
+from benchmarks.stub_server import StubServer
+from flightaware import columnar
+from flightaware.client import Client, ResultMode
+from flightaware.columnar import BOARD_SPEC, SCHEDULE_SPEC, column_decoder, to_columns
+
+FLIGHTS = load_fixtures()["AirlineFlightSchedules"]["data"]
+
+
+class ToColumnsTests(unittest.TestCase):
+    @unittest.skipUnless(numpy, "requires numpy")
+    def test_numpy_columns(self):
+        columns = to_columns(FLIGHTS, SCHEDULE_SPEC)
+        self.assertEqual(columns.num_rows, len(FLIGHTS))
+        self.assertEqual(columns["departuretime"].dtype, numpy.dtype("datetime64[s]"))
+        self.assertEqual(columns["departuretime"][0], numpy.datetime64(FLIGHTS[0]["departuretime"], "s"))
+        self.assertEqual(columns["seats_cabin_coach"].dtype, numpy.dtype("int64"))
+        self.assertEqual(columns["ident"], [flight["ident"] for flight in FLIGHTS])
+
+    @unittest.skipUnless(numpy, "requires numpy")
+    def test_missing_time_is_nat(self):
+        columns = to_columns([{"actualarrivaltime": 1400000400}, {"actualarrivaltime": None},
+                              {"actualarrivaltime": 0}], BOARD_SPEC)
+        self.assertFalse(numpy.isnat(columns["actualarrivaltime"][0]))
+        self.assertTrue(numpy.isnat(columns["actualarrivaltime"][1]))
+        self.assertTrue(numpy.isnat(columns["actualarrivaltime"][2]))
+
+    def test_pure_python_columns(self):
+        with mock.patch.object(columnar, "numpy", None):
+            columns = to_columns(FLIGHTS + [dict(FLIGHTS[0], departuretime=None)], SCHEDULE_SPEC)
+        self.assertIsInstance(columns["departuretime"], array.array)
+        self.assertEqual(list(columns["departuretime"])[:-1], [flight["departuretime"] for flight in FLIGHTS])
+        self.assertEqual(columns["departuretime"][-1], 0)
+        self.assertEqual(columns["seats_cabin_coach"].typecode, "q")
+
+    def test_fields_missing_from_first_record(self):
+        with mock.patch.object(columnar, "numpy", None):
+            columns = to_columns([{"ident": "SWA2558"}, {"ident": "DAL1", "actualarrivaltime": 1400000400}], BOARD_SPEC)
+        self.assertEqual(columns["ident"], ["SWA2558", "DAL1"])
+        self.assertEqual(list(columns["actualarrivaltime"]), [0, 1400000400])
+
+    def test_empty(self):
+        self.assertEqual(to_columns([], SCHEDULE_SPEC).num_rows, 0)
+
+
+class ColumnDecoderTests(unittest.TestCase):
+    def test_keyed_result(self):
+        decode = column_decoder(BOARD_SPEC, "arrivals")
+        output = decode({"arrivals": [{"ident": "SWA2558"}], "next_offset": -1})
+        self.assertEqual(output["arrivals"]["ident"], ["SWA2558"])
+        self.assertEqual(output["next_offset"], -1)
+        self.assertEqual(decode({"error": "NO_DATA"}), {"error": "NO_DATA"})
+
+
+class ClientColumnsTests(unittest.TestCase):
+    def test_iter_yields_one_batch_per_page(self):
+        flights = scale_schedules(FLIGHTS, 25)
+        start = datetime.datetime(2014, 5, 13)
+        with StubServer({"AirlineFlightSchedules": paged(flights)}) as server:
+            client = Client("user", "key", base_url=server.base_url, result_mode=ResultMode.COLUMNS)
+            batches = list(client.iter_airline_flight_schedules(start, start + datetime.timedelta(days=5), page_size=10))
+            client.close()
+        self.assertEqual([batch.num_rows for batch in batches], [10, 10, 5])
+        self.assertEqual(sum((batch["ident"] for batch in batches), []), [flight["ident"] for flight in flights])
+
+    def test_without_numpy(self):
+        flights = scale_schedules(FLIGHTS, 5)
+        start = datetime.datetime(2014, 5, 13)
+        with StubServer({"AirlineFlightSchedules": paged(flights)}) as server:
+            client = Client("user", "key", base_url=server.base_url, result_mode=ResultMode.COLUMNS)
+            with mock.patch.object(columnar, "numpy", None):
+                batches = list(client.iter_airline_flight_schedules(start, start + datetime.timedelta(days=5), page_size=10))
+            client.close()
+        self.assertEqual([batch.num_rows for batch in batches], [5])
+        self.assertIsInstance(batches[0]["departuretime"], array.array)
+        self.assertEqual(list(batches[0]["departuretime"]), [flight["departuretime"] for flight in flights])
+
+
+if __name__ == "__main__":
+    unittest.main()
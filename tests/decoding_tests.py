@@ -0,0 +1,127 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+try:
+    import aiohttp
+except ImportError:     # optional dependency, the AsyncClient test is skipped
+    aiohttp = None
+
+from benchmarks.payloads import load_fixtures, scale_airports
+from benchmarks.stub_server import StubServer
+from flightaware import async_client, client as client_module
+from flightaware.async_client import AsyncClient
+from flightaware.client import Client
+from flightaware.decoding import ArrayStreamParser, array_items, loads
+from flightaware.pagination import FlightAwareError
+
+ITEMS = [
+    -4.25e-3, 12, 0, True, None, "Zürich ✈ \"quoted\" ] , {", [1, [2, []]],
+    {"name": "São Paulo", "nested": {"data": [1, 2]}, "empty": {}}, 1234567890123,
+]
+
+
+def parse(body, path, size):
+    parser = ArrayStreamParser(path)
+    items = []
+    for start in range(0, len(body), size):
+        items.extend(parser.feed(body[start:start + size]))
+    items.extend(parser.close())
+    return items, parser.meta
+
+
+class ArrayStreamParserTests(unittest.TestCase):
+    def test_any_chunking(self):
+        document = {"before": {"x": [1]}, "AllAirportsResult": {"next_offset": 5, "data": ITEMS, "after": "z"}}
+        for indent in (None, 2):
+            body = json.dumps(document, ensure_ascii=False, indent=indent).encode("utf-8")
+            for size in (1, 2, 3, 7, 64, len(body)):
+                items, meta = parse(body, ["AllAirportsResult", "data"], size)
+                self.assertEqual(items, ITEMS)
+                self.assertEqual(meta, {"before": {"x": [1]}, "next_offset": 5, "after": "z"})
+
+    def test_number_split_across_chunks(self):
+        parser = ArrayStreamParser(["data"])
+        self.assertEqual(parser.feed(b'{"data": [12'), [])
+        self.assertEqual(parser.feed(b'34, -1'), [1234])
+        self.assertEqual(parser.feed(b'.5e'), [])
+        self.assertEqual(parser.feed(b'2]}'), [-150.0])
+        self.assertEqual(parser.close(), [])
+
+    def test_empty_and_missing_array(self):
+        self.assertEqual(parse(b'{"data": []}', ["data"], 1), ([], {}))
+        self.assertEqual(parse(b'{"error": "NO_DATA"}', ["data"], 3), ([], {"error": "NO_DATA"}))
+
+    def test_truncated_body_raises(self):
+        for body in (b'{"data": [1, 2', b'{"data": [1, 2]', b'{"data": [{"a": '):
+            with self.assertRaises(ValueError):
+                parse(body, ["data"], 4)
+
+    def test_array_items_matches_parser(self):
+        documents = [
+            {"before": {"x": [1]}, "AllAirportsResult": {"next_offset": 5, "data": ITEMS, "after": "z"}},
+            {"error": "NO_DATA"},
+            {"AllAirportsResult": {"error": "NO_DATA"}},
+            {"AllAirportsResult": {"data": {"not": "an array"}}},
+            {"AllAirportsResult": [1, 2]},
+        ]
+        for document in documents:
+            self.assertEqual(array_items(document, ["AllAirportsResult", "data"]),
+                             parse(json.dumps(document).encode("utf-8"), ["AllAirportsResult", "data"], 5))
+
+    def test_loads(self):
+        self.assertEqual(loads(b'{"a": [1, 2.5, "x"]}'), {"a": [1, 2.5, "x"]})
+
+
+class ClientStreamTests(unittest.TestCase):
+    def test_stream_all_airports(self):
+        airports = scale_airports(20000)
+        for compress in (False, True):
+            with StubServer({"AllAirports": {"data": airports}}, compress=compress) as server:
+                client = Client("user", "key", base_url=server.base_url, stream_threshold=0)
+                with mock.patch.object(client_module, "ArrayStreamParser", wraps=ArrayStreamParser) as parser:
+                    self.assertEqual(list(client.stream_all_airports()), airports)
+                self.assertEqual(parser.call_count, 1)
+                client.close()
+
+    def test_small_responses_are_not_streamed(self):
+        airports = scale_airports(200)
+        with StubServer({"AllAirports": {"data": airports}}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            with mock.patch.object(client_module, "ArrayStreamParser") as parser:
+                self.assertEqual(list(client.stream_all_airports()), airports)
+            self.assertFalse(parser.called)
+            client.close()
+
+    @unittest.skipUnless(aiohttp, "requires aiohttp")
+    def test_async_threshold(self):
+        airports = scale_airports(200)
+
+        async def run(base_url, stream_threshold):
+            async with AsyncClient("user", "key", base_url=base_url, stream_threshold=stream_threshold) as client:
+                return [airport async for airport in client.stream_all_airports()]
+
+        with StubServer({"AllAirports": {"data": airports}}) as server:
+            for stream_threshold, calls in ((0, 1), (1024 * 1024, 0)):
+                with mock.patch.object(async_client, "ArrayStreamParser", wraps=ArrayStreamParser) as parser:
+                    self.assertEqual(asyncio.run(run(server.base_url, stream_threshold)), airports)
+                self.assertEqual(parser.call_count, calls)
+
+    def test_stream_matches_request(self):
+        with StubServer(load_fixtures()) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            self.assertEqual(list(client.stream_all_airports()), client.all_airports())
+            client.close()
+
+    def test_stream_error_raises(self):
+        with StubServer({"AllAirports": {"error": "NO_DATA"}}) as server:
+            for stream_threshold in (0, 1024):
+                client = Client("user", "key", base_url=server.base_url, stream_threshold=stream_threshold)
+                with self.assertRaises(FlightAwareError):
+                    list(client.stream_all_airports())
+                client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
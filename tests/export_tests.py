@@ -0,0 +1,106 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    import pyarrow.parquet
+except ImportError:     # optional dependency, the exporter tests are skipped
+    pyarrow = None
+
+from benchmarks.payloads import load_fixtures, scale_schedules
+from benchmarks.stub_server import StubServer
+from flightaware import export
+from flightaware.client import EPOCH, Client, ResultMode
+from flightaware.export import ScheduleExporter, dedupe_codeshares, shard_date_range
+
+DAY = datetime.timedelta(days=1)
+
+
+def schedules_between(flights, calls):
+    """
+    AirlineFlightSchedules over an inclusive startDate/endDate window, paged with howMany/offset.
+    """
+    def result(params):
+        calls.append(params["startDate"])
+        lower, upper = int(params["startDate"]), int(params["endDate"])
+        window = [flight for flight in flights if lower <= flight["departuretime"] <= upper]
+        offset = int(params.get("offset", 0))
+        end = offset + int(params.get("howMany", 15))
+        return {"data": window[offset:end], "next_offset": end if end < len(window) else -1}
+    return result
+
+
+class ShardTests(unittest.TestCase):
+    def test_shard_date_range(self):
+        start = datetime.datetime(2014, 5, 13)
+        self.assertEqual(shard_date_range(start, start + datetime.timedelta(hours=30)),
+                         [(start, start + DAY), (start + DAY, start + datetime.timedelta(hours=30))])
+        self.assertEqual(shard_date_range(start, start), [])
+
+    def test_dedupe_prefers_operating_carrier(self):
+        operated = {"ident": "DAL1440", "actual_ident": "", "departuretime": 1, "origin": "KBNA", "destination": "KATL"}
+        codeshare = dict(operated, ident="KLM6011", actual_ident="DAL1440")
+        self.assertEqual(dedupe_codeshares([codeshare, operated]), [operated])
+        seen = set()
+        self.assertEqual(dedupe_codeshares([operated], seen), [operated])
+        self.assertEqual(dedupe_codeshares([codeshare], seen), [])
+
+
+class WithoutPyarrowTests(unittest.TestCase):
+    def test_exporter_requires_pyarrow(self):
+        with mock.patch.object(export, "pyarrow", None):
+            with self.assertRaises(ImportError):
+                ScheduleExporter(None, tempfile.gettempdir())
+
+
+@unittest.skipUnless(pyarrow, "requires pyarrow")
+class ScheduleExporterTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        flights = scale_schedules(load_fixtures()["AirlineFlightSchedules"]["data"], 60)
+        codeshares = [dict(flight, ident="KLM" + flight["ident"][3:], actual_ident=flight["ident"]) for flight in flights[::3]]
+        self.flights = sorted(flights + codeshares, key=lambda flight: flight["departuretime"])
+        self.unique = len(flights)
+        first = min(flight["departuretime"] for flight in flights)
+        self.start = EPOCH + datetime.timedelta(seconds=first - first % 86400)
+        self.end = self.start + 11 * DAY
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_columns_client_is_rejected(self):
+        client = Client("user", "key", result_mode=ResultMode.COLUMNS)
+        with self.assertRaises(ValueError):
+            ScheduleExporter(client, self.directory)
+        client.close()
+
+    def export(self, calls):
+        with StubServer({"AirlineFlightSchedules": schedules_between(self.flights, calls)}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            try:
+                exporter = ScheduleExporter(client, self.directory, max_workers=4, page_size=10, batch_size=7)
+                return exporter.export(self.start, self.end)
+            finally:
+                client.close()
+
+    def test_export_and_resume(self):
+        calls = []
+        paths = self.export(calls)
+        self.assertEqual(len(paths), 11)
+        tables = [pyarrow.parquet.read_table(path) for path in paths]
+        self.assertEqual(sum(table.num_rows for table in tables), self.unique)
+        self.assertNotIn("KLM", "".join(ident[:3] for table in tables for ident in table.column("ident").to_pylist()))
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith(".tmp")])
+
+        os.remove(paths[3])
+        calls = []
+        self.assertEqual(self.export(calls), paths)
+        self.assertEqual(set(calls), {str(int((self.start + 3 * DAY - EPOCH).total_seconds()))})
+        self.assertEqual(sum(pyarrow.parquet.read_table(path).num_rows for path in paths), self.unique)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:     # optional dependency, the matrices fall back to lists of lists
+    numpy = None
+
+from flightaware import geodesy
+from flightaware.client import Client
+from flightaware.geodesy import distance, distance_matrix, heading, heading_matrix
+
+KBNA = (36.1245, -86.6782)
+KATL = (33.6367, -84.4281)
+LATS = [36.1245, 33.6367, 51.4700, -33.9461, 0.0]
+LONS = [-86.6782, -84.4281, -0.4543, 151.1772, 179.9]
+
+
+class PointTests(unittest.TestCase):
+    def test_distance(self):
+        self.assertAlmostEqual(distance(*(KBNA + KATL)), 214, delta=1)
+        self.assertEqual(distance(*(KBNA + KBNA)), 0)
+        # across the antimeridian
+        self.assertAlmostEqual(distance(0, 179.5, 0, -179.5), 69.1, delta=0.1)
+
+    def test_heading(self):
+        self.assertAlmostEqual(heading(0, 0, 1, 0), 0)
+        self.assertAlmostEqual(heading(0, 0, 0, 1), 90)
+        self.assertAlmostEqual(heading(0, 0, -1, 0), 180)
+        self.assertAlmostEqual(heading(0, 0, 0, -1), 270)
+
+    def test_client_rounds_like_flightxml(self):
+        client = Client("user", "key")
+        self.assertEqual(client.lat_lng_to_distance(*(KBNA + KATL)), 214)
+        self.assertEqual(client.lat_lng_to_heading(0, 0, 1, 0), 360)
+        client.close()
+
+
+class MatrixTests(unittest.TestCase):
+    def expected(self, function):
+        return [[function(lat1, lon1, lat2, lon2) for lat2, lon2 in zip(LATS, LONS)] for lat1, lon1 in zip(LATS, LONS)]
+
+    @unittest.skipUnless(numpy, "requires numpy")
+    def test_matches_point_functions(self):
+        for matrix, function in ((distance_matrix, distance), (heading_matrix, heading)):
+            output = matrix(LATS, LONS)
+            self.assertEqual(output.shape, (len(LATS), len(LATS)))
+            numpy.testing.assert_allclose(output, self.expected(function), atol=1e-6)
+
+    @unittest.skipUnless(numpy, "requires numpy")
+    def test_rectangular(self):
+        output = distance_matrix(LATS[:2], LONS[:2], LATS, LONS)
+        self.assertEqual(output.shape, (2, len(LATS)))
+        numpy.testing.assert_allclose(output, self.expected(distance)[:2], atol=1e-6)
+
+    def test_without_numpy(self):
+        with mock.patch.object(geodesy, "numpy", None):
+            self.assertEqual(distance_matrix(LATS, LONS), self.expected(distance))
+            self.assertEqual(heading_matrix(LATS, LONS), self.expected(heading))
+            self.assertEqual(distance_matrix(LATS[:2], LONS[:2], LATS, LONS), self.expected(distance)[:2])
+
+
+if __name__ == "__main__":
+    unittest.main()
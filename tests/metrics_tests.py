@@ -0,0 +1,85 @@
+import socket
+import unittest
+
+from benchmarks.stub_server import StubServer
+from flightaware.cache import MemoryCache
+from flightaware.client import Client
+from flightaware.metrics import EventKind, Histogram, Instrumentation, StatsdHook, prometheus_text
+
+
+class HistogramTests(unittest.TestCase):
+    def test_cumulative_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative()), [(0.1, 2), (1.0, 3), ("+Inf", 4)])
+        self.assertAlmostEqual(histogram.sum, 2.65)
+
+
+class InstrumentationTests(unittest.TestCase):
+    def test_client_events(self):
+        events = []
+        instrumentation = Instrumentation(hooks=[events.append])
+        results = {"AirportInfo": {"name": "Nashville Intl"}, "AirlineInfo": {"error": "unknown airline"}}
+        with StubServer(results) as server:
+            client = Client("user", "key", base_url=server.base_url, cache=MemoryCache(), instrumentation=instrumentation)
+            client.airport_info("KBNA")
+            client.airport_info("KBNA")
+            client.airline_info("XXX")
+            client.close()
+        snapshot = instrumentation.snapshot()
+        airport = snapshot["AirportInfo"]
+        self.assertEqual((airport["requests"], airport["cache_hits"], airport["cache_misses"]), (1, 1, 1))
+        self.assertGreater(airport["response_bytes"], 0)
+        self.assertEqual(airport["latency"]["server"]["count"], 1)
+        self.assertEqual(snapshot["AirlineInfo"]["api_errors"], 1)
+        self.assertIn(EventKind.REQUEST, [event.kind for event in events])
+
+    def test_response_bytes_are_wire_bytes(self):
+        sizes = {}
+        results = {"AllAirports": {"data": ["KBNA"] * 2000}}
+        for compress in (False, True):
+            instrumentation = Instrumentation()
+            with StubServer(results, compress=compress) as server:
+                client = Client("user", "key", base_url=server.base_url, instrumentation=instrumentation)
+                client.all_airports()
+                client.close()
+            sizes[compress] = instrumentation.snapshot()["AllAirports"]["response_bytes"]
+        self.assertGreater(sizes[False], 2000 * len('"KBNA", '))
+        self.assertLess(sizes[True], sizes[False] / 10)
+
+    def test_transport_errors(self):
+        instrumentation = Instrumentation()
+        instrumentation.error("AirportInfo", OSError())
+        self.assertEqual(instrumentation.snapshot()["AirportInfo"]["errors"], 1)
+
+    def test_prometheus_text(self):
+        instrumentation = Instrumentation(buckets=(0.1, ))
+        instrumentation.request("AirportInfo", None, 0.05, 0.01, 0.001, 10, 100, 200, {"name": "x"})
+        instrumentation.cache("AirportInfo", True)
+        text = prometheus_text(instrumentation)
+        self.assertIn('flightaware_requests_total{method="AirportInfo"} 1\n', text)
+        self.assertIn('flightaware_cache_total{method="AirportInfo",result="hit"} 1\n', text)
+        self.assertIn('flightaware_request_seconds_bucket{le="0.1",method="AirportInfo",phase="server"} 1\n', text)
+        self.assertIn('flightaware_request_seconds_count{method="AirportInfo",phase="connect"} 0\n', text)
+        self.assertIn("# TYPE flightaware_request_seconds histogram\n", text)
+
+
+class StatsdHookTests(unittest.TestCase):
+    def test_sends_datagram(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(2)
+        hook = StatsdHook(*receiver.getsockname())
+        instrumentation = Instrumentation(hooks=[hook])
+        instrumentation.request("AirportInfo", None, 0.05, 0.01, 0.001, 10, 100, 200, {"error": "x"})
+        lines = receiver.recv(4096).decode("utf-8").split("\n")
+        hook.close()
+        receiver.close()
+        self.assertIn("flightaware.AirportInfo.request:1|c", lines)
+        self.assertIn("flightaware.AirportInfo.server:50.000|ms", lines)
+        self.assertIn("flightaware.AirportInfo.api_error:1|c", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import datetime
+import unittest
+
+from benchmarks.payloads import load_fixtures, paged, scale_schedules
+from benchmarks.stub_server import StubServer
+from flightaware.client import Client
+from flightaware.pagination import FlightAwareError, aiter_pages, iter_pages
+
+
+def pages_of(records, key=None):
+    calls = []
+
+    def call(how_many, offset):
+        calls.append((how_many, offset))
+        page = records[offset:offset + how_many]
+        if key is None:
+            return page
+        end = offset + how_many
+        return {key: page, "next_offset": end if end < len(records) else -1}
+    return call, calls
+
+
+class IterPagesTests(unittest.TestCase):
+    def test_short_last_page_stops(self):
+        for prefetch in (True, False):
+            call, calls = pages_of(list(range(25)))
+            self.assertEqual(list(iter_pages(call, 10, prefetch=prefetch)), list(range(25)))
+            self.assertEqual(calls, [(10, 0), (10, 10), (10, 20)])
+
+    def test_next_offset_minus_one_stops(self):
+        call, calls = pages_of(list(range(20)), key="data")
+        self.assertEqual(list(iter_pages(call, 10, key="data")), list(range(20)))
+        self.assertEqual(calls, [(10, 0), (10, 10)])
+
+    def test_starts_at_offset(self):
+        call, calls = pages_of(list(range(25)))
+        self.assertEqual(list(iter_pages(call, 10, offset=5, prefetch=False)), list(range(5, 25)))
+
+    def test_error_page_raises(self):
+        def call(how_many, offset):
+            if offset:
+                return {"error": "NO_DATA unknown airport"}
+            return {"data": list(range(how_many)), "next_offset": how_many}
+        pages = iter_pages(call, 10, key="data")
+        self.assertEqual([next(pages) for _ in range(10)], list(range(10)))
+        with self.assertRaises(FlightAwareError):
+            next(pages)
+
+    def test_async(self):
+        records = list(range(25))
+
+        async def call(how_many, offset):
+            return records[offset:offset + how_many]
+
+        async def collect(prefetch):
+            return [record async for record in aiter_pages(call, 10, prefetch=prefetch)]
+
+        for prefetch in (True, False):
+            self.assertEqual(asyncio.run(collect(prefetch)), records)
+
+
+class ClientPaginationTests(unittest.TestCase):
+    def test_iter_airline_flight_schedules(self):
+        flights = scale_schedules(load_fixtures()["AirlineFlightSchedules"]["data"], 70)
+        sizes = []
+
+        def set_maximum(params):
+            sizes.append(int(params["max_size"]))
+            return 1
+
+        start = datetime.datetime(2014, 5, 13)
+        with StubServer({"AirlineFlightSchedules": paged(flights), "SetMaximumResultSize": set_maximum}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            result = list(client.iter_airline_flight_schedules(start, start + datetime.timedelta(days=1), page_size=30))
+            client.close()
+        self.assertEqual([flight["ident"] for flight in result], [flight["ident"] for flight in flights])
+        self.assertEqual(sizes, [30])
+
+    def test_ensure_result_size(self):
+        sizes = []
+        with StubServer({"SetMaximumResultSize": lambda params: sizes.append(int(params["max_size"])) or 1}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            self.assertEqual(client.ensure_result_size(), client.max_result_size)
+            self.assertEqual(client.ensure_result_size(50), 50)
+            self.assertEqual(client.ensure_result_size(20), 20)
+            client.close()
+        self.assertEqual((sizes, client.max_result_size), ([50], 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
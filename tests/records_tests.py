@@ -0,0 +1,50 @@
+import sys
+import unittest
+
+from benchmarks.payloads import load_fixtures
+from benchmarks.stub_server import StubServer
+from flightaware.client import Client, ResultMode
+from flightaware.records import Airport, Metar, ScheduledFlight, record_decoder
+
+FIXTURES = load_fixtures()
+
+
+class RecordTests(unittest.TestCase):
+    def test_round_trip(self):
+        flight = FIXTURES["AirlineFlightSchedules"]["data"][0]
+        record = ScheduledFlight.from_dict(dict(flight, added_later=1))
+        self.assertEqual(record.to_dict(), flight)
+        self.assertEqual(record.ident, flight["ident"])
+        self.assertEqual(record.departure_time.timestamp(), flight["departuretime"])
+
+    def test_missing_fields_are_none(self):
+        self.assertIsNone(Airport.from_dict({"name": "Nashville Intl"}).latitude)
+
+    def test_no_instance_dict(self):
+        record = Airport.from_dict(FIXTURES["AirportInfo"])
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertLess(sys.getsizeof(record), sys.getsizeof(record.to_dict()))
+        with self.assertRaises(AttributeError):
+            record.name = "other"
+
+
+class RecordDecoderTests(unittest.TestCase):
+    def test_keyed_and_errors(self):
+        decode = record_decoder(Metar, "metar")
+        output = decode(FIXTURES["MetarEx"])
+        self.assertTrue(all(isinstance(item, Metar) for item in output["metar"]))
+        self.assertEqual(decode({"error": "NO_DATA"}), {"error": "NO_DATA"})
+
+    def test_client_records_mode(self):
+        with StubServer(FIXTURES) as server:
+            client = Client("user", "key", base_url=server.base_url, result_mode=ResultMode.RECORDS)
+            airport = client.airport_info("KBNA")
+            aircraft = client.aircraft_type("B738")
+            client.close()
+        self.assertIsInstance(airport, Airport)
+        self.assertEqual(airport.name, FIXTURES["AirportInfo"]["name"])
+        self.assertIsInstance(aircraft, dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
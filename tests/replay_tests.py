@@ -0,0 +1,155 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import aiohttp
+except ImportError:     # optional dependency, the AsyncClient test is skipped
+    aiohttp = None
+
+from benchmarks.payloads import load_fixtures
+from benchmarks.stub_server import StubServer
+from flightaware.async_client import AsyncClient
+from flightaware.cache import cache_key
+from flightaware.client import Client, ResultMode
+from flightaware.pagination import FlightAwareError
+from flightaware.records import Airport
+from flightaware.replay import ReplayArchive, ReplayMissError, ReplayMode, ReplayTransport, ReplayWriteError
+
+FIXTURES = load_fixtures()
+
+
+class ReplayArchiveTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "archive.fxr")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reopen_and_shadowing(self):
+        with ReplayArchive(self.path) as archive:
+            archive.put("a", {"v": 1})
+            archive.put("b", [1, 2, 3])
+            archive.put("a", {"v": 2})
+            self.assertEqual(archive.get("a"), {"v": 2})
+        with ReplayArchive(self.path) as archive:
+            self.assertEqual(sorted(archive.keys()), ["a", "b"])
+            self.assertEqual(archive.get("a"), {"v": 2})
+            self.assertIsNone(archive.get("missing"))
+
+    def test_truncated_tail_is_dropped(self):
+        with ReplayArchive(self.path) as archive:
+            archive.put("a", {"v": 1})
+            archive.put("b", {"v": 2})
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        with self.assertLogs("flightaware.replay", "WARNING"):
+            archive = ReplayArchive(self.path)
+        self.assertEqual(archive.keys(), ["a"])
+        archive.put("b", {"v": 3})
+        self.assertEqual(archive.get("b"), {"v": 3})
+        archive.close()
+
+    def test_corrupt_entry_raises(self):
+        with ReplayArchive(self.path) as archive:
+            archive.put("a", {"v": 1})
+        with open(self.path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xff]))
+        with ReplayArchive(self.path) as archive:
+            with self.assertRaises(FlightAwareError):
+                archive.get("a")
+
+
+class ReplayTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = ReplayArchive(os.path.join(self.directory, "archive.fxr"))
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.directory)
+
+    def test_record_then_replay_offline(self):
+        with StubServer(FIXTURES) as server:
+            base_url = server.base_url
+            client = Client("user", "key", base_url=base_url, transport=ReplayTransport(self.archive, ReplayMode.RECORD))
+            recorded = client.airport_info("KBNA")
+            client.close()
+        self.assertIn(cache_key("AirportInfo", {"airportCode": "KBNA"}), self.archive)
+
+        transport = ReplayTransport(self.archive, ReplayMode.REPLAY)
+        client = Client("user", "key", base_url=base_url, transport=transport, result_mode=ResultMode.RECORDS)
+        replayed = client.airport_info("KBNA")
+        self.assertIsInstance(replayed, Airport)
+        self.assertEqual(replayed.to_dict(), recorded)
+        with self.assertRaises(ReplayMissError):
+            client.airport_info("KATL")
+        client.close()
+        self.assertEqual(transport.stats(), {"replayed": 1, "recorded": 0, "missed": 1, "entries": 1})
+
+    @unittest.skipUnless(aiohttp, "requires aiohttp")
+    def test_fallthrough_fills_gaps(self):
+        self.archive.put(cache_key("AirportInfo", {"airportCode": "KBNA"}), {"name": "recorded"})
+        transport = ReplayTransport(self.archive, ReplayMode.FALLTHROUGH)
+
+        async def run(base_url):
+            async with AsyncClient("user", "key", base_url=base_url, transport=transport) as client:
+                return await client.airport_info("KBNA"), await client.airport_info("KATL")
+
+        with StubServer({"AirportInfo": {"name": "live"}}) as server:
+            self.assertEqual(asyncio.run(run(server.base_url)), ({"name": "recorded"}, {"name": "live"}))
+        self.assertEqual((transport.replayed, transport.recorded, len(self.archive)), (1, 1, 2))
+
+    def test_write_methods_are_sent_unless_replaying(self):
+        posted = []
+        for mode in (ReplayMode.RECORD, ReplayMode.FALLTHROUGH):
+            with StubServer({"SetAlert": lambda params: posted.append(params) or 1001}) as server:
+                client = Client("user", "key", base_url=server.base_url, transport=ReplayTransport(self.archive, mode))
+                self.assertEqual(client.set_alert(ident="SWA1"), 1001)
+                self.assertEqual(client.set_alert(ident="SWA1"), 1001)
+                client.close()
+        self.assertEqual(len(posted), 4)
+        self.assertEqual(len(self.archive), 0)
+
+        with StubServer({"SetAlert": lambda params: posted.append(params) or 1001}) as server:
+            client = Client("user", "key", base_url=server.base_url,
+                            transport=ReplayTransport(self.archive, ReplayMode.REPLAY))
+            for call in (lambda: client.set_alert(ident="SWA1"), lambda: client.delete_alert(1001),
+                         lambda: client.set_maximum_result_sizes(100)):
+                with self.assertRaises(ReplayWriteError):
+                    call()
+            client.close()
+        self.assertEqual(len(posted), 4)
+
+    def test_error_responses_replay(self):
+        with StubServer({"AirportInfo": {"error": "unknown airport INVALID"}}) as server:
+            client = Client("user", "key", base_url=server.base_url, transport=ReplayTransport(self.archive, ReplayMode.RECORD))
+            self.assertEqual(client.airport_info("INVALID"), {"error": "unknown airport INVALID"})
+            client.close()
+
+        transport = ReplayTransport(self.archive, ReplayMode.REPLAY)
+        client = Client("user", "key", base_url=server.base_url, transport=transport)
+        self.assertEqual(client.airport_info("INVALID"), {"error": "unknown airport INVALID"})
+        client.close()
+        self.assertEqual(transport.stats(), {"replayed": 1, "recorded": 0, "missed": 0, "entries": 1})
+
+    def test_throttling_errors_are_not_recorded(self):
+        answers = [{"error": "Too many requests"}, "KBNA 131653Z 18006KT 10SM CLR 26/12 A3002"]
+        transport = ReplayTransport(self.archive, ReplayMode.FALLTHROUGH)
+        with StubServer({"Metar": lambda params: answers.pop(0)}) as server:
+            client = Client("user", "key", base_url=server.base_url, transport=transport)
+            self.assertEqual(client.metar("KBNA"), {"error": "Too many requests"})
+            self.assertEqual(len(self.archive), 0)
+            self.assertTrue(client.metar("KBNA").startswith("KBNA"))
+            client.close()
+        self.assertEqual((transport.recorded, transport.missed, len(self.archive)), (1, 2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import socket
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from flightaware.client import Client
+from flightaware.resilience import CircuitBreaker, CircuitOpenError, RequestPolicy, RetryBudget, is_outage
+from flightaware.scheduler import RateScheduler
+
+
+def failing(errors, result="ok"):
+    """
+    attempt function raising the given errors in turn, then returning result. calls counts the attempts.
+    """
+    errors = list(errors)
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    return attempt, calls
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError("{} error".format(status_code), response=response)
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class RetryTests(unittest.TestCase):
+    def policy(self, **kwargs):
+        return RequestPolicy(hedge=False, backoff=0, **kwargs)
+
+    def test_transport_errors_are_retried(self):
+        attempt, calls = failing([requests.ConnectionError(), requests.Timeout()])
+        policy = self.policy()
+        self.assertEqual(policy.call("AirportInfo", attempt), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(policy.stats()["retries_spent"], 2)
+
+    def test_gives_up_after_retries(self):
+        attempt, calls = failing([requests.ConnectionError()] * 5)
+        with self.assertRaises(requests.ConnectionError):
+            self.policy(retries=2).call("AirportInfo", attempt)
+        self.assertEqual(len(calls), 3)
+
+    def test_writes_and_other_errors_are_not_retried(self):
+        for method, error in (("SetAlert", requests.ConnectionError()), ("AirportInfo", ValueError("not JSON")),
+                              ("AirportInfo", requests.HTTPError("401"))):
+            attempt, calls = failing([error])
+            with self.assertRaises(type(error)):
+                self.policy().call(method, attempt)
+            self.assertEqual(len(calls), 1)
+
+    def test_empty_budget_denies_retries(self):
+        policy = self.policy(retry_budget=RetryBudget(max_tokens=0))
+        attempt, calls = failing([requests.ConnectionError()])
+        with self.assertRaises(requests.ConnectionError):
+            policy.call("AirportInfo", attempt)
+        self.assertEqual(policy.stats()["retries_denied"], 1)
+
+    def test_budget_refills_from_first_attempts(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        policy = RequestPolicy(hedge=False, retries=0, breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                policy.call("AirportInfo", failing([requests.ConnectionError()])[0])
+        attempt, calls = failing([])
+        with self.assertRaises(CircuitOpenError):
+            policy.call("AirportInfo", attempt)
+        self.assertEqual(calls, [])
+        time.sleep(0.06)
+        self.assertEqual(breaker.allow(), True)
+        self.assertEqual(breaker.allow(), False)
+        breaker.record_success()
+        self.assertEqual(policy.call("AirportInfo", attempt), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_any_error_fails_the_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        policy = RequestPolicy(hedge=False, retries=0, breaker=breaker)
+        for error in (requests.ConnectionError(), ValueError("<html>502 Bad Gateway</html>"), requests.HTTPError("503")):
+            with self.assertRaises(type(error)):
+                policy.call("AirportInfo", failing([error])[0])
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(policy.call("AirportInfo", failing([])[0]), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_only_outages_count(self):
+        self.assertTrue(is_outage(ValueError("<html>502 Bad Gateway</html>")))
+        self.assertTrue(is_outage(http_error(502)))
+        for error in (http_error(429), http_error(503), http_error(401), KeyError("x")):
+            self.assertFalse(is_outage(error))
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        policy = RequestPolicy(hedge=False, retries=0, breaker=breaker)
+        for error in (http_error(429), http_error(401), KeyboardInterrupt()):
+            with self.assertRaises(type(error)):
+                policy.call("AirportInfo", failing([error])[0])
+        self.assertEqual((breaker.state, breaker.failures), (CircuitBreaker.CLOSED, 0))
+
+    def test_throttled_trial_reopens_without_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        policy = RequestPolicy(hedge=False, retries=0, breaker=breaker)
+        breaker.record_failure()
+        with self.assertRaises(requests.HTTPError):
+            policy.call("AirportInfo", failing([http_error(429)])[0])
+        self.assertEqual((breaker.state, breaker.failures), (CircuitBreaker.OPEN, 1))
+
+    def test_cancelled_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        policy = RequestPolicy(hedge=False, retries=0, breaker=breaker)
+        breaker.record_failure()
+
+        async def run():
+            async def slow():
+                await asyncio.sleep(1)
+            task = asyncio.ensure_future(policy.call_async("AirportInfo", slow))
+            await asyncio.sleep(0.01)
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_undecodable_responses_open_the_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        policy = RequestPolicy(hedge=False, retries=0, breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                policy.call("AirportInfo", failing([ValueError("not JSON")])[0])
+        with self.assertRaises(CircuitOpenError):
+            policy.call("AirportInfo", failing([])[0])
+
+
+class HedgeTests(unittest.TestCase):
+    def warmed(self, method="AirportInfo", **kwargs):
+        policy = RequestPolicy(min_samples=5, min_hedge_delay=0.02, **kwargs)
+        for _ in range(5):
+            policy._latencies[method].record(0.01)
+        return policy
+
+    def test_slow_read_is_hedged(self):
+        policy = self.warmed()
+        counter = itertools.count()
+
+        def attempt():
+            if next(counter) == 0:
+                time.sleep(0.5)
+                return "slow"
+            return "fast"
+
+        start = time.monotonic()
+        self.assertEqual(policy.call("AirportInfo", attempt), "fast")
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual((policy.stats()["hedges"], policy.stats()["hedge_wins"]), (1, 1))
+        policy.close()
+
+    def test_writes_are_never_hedged(self):
+        policy = self.warmed("SetAlert")
+        self.assertIsNone(policy.hedge_delay("SetAlert"))
+        self.assertEqual(policy.hedge_delay("AirportInfo"), None)
+        self.assertEqual(self.warmed().hedge_delay("AirportInfo"), 0.02)
+        self.assertIsNone(self.warmed("SetAlert", hedged_methods=["SetAlert"]).hedge_delay("SetAlert"))
+
+    def test_expensive_searches_are_not_hedged(self):
+        for method in ("SearchBirdseyeInFlight", "AirlineFlightSchedules", "FleetScheduled"):
+            policy = self.warmed(method)
+            self.assertIsNone(policy.hedge_delay(method))
+            attempt, calls = failing([])
+            self.assertEqual(policy.call(method, attempt), "ok")
+            self.assertEqual((len(calls), policy.stats()["hedges"]), (1, 0))
+        self.assertEqual(self.warmed("Search", hedged_methods=["Search"]).hedge_delay("Search"), 0.02)
+
+    def test_async_hedge_cancels_loser(self):
+        policy = self.warmed()
+        counter = itertools.count()
+        cancelled = []
+
+        async def attempt():
+            if next(counter) == 0:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+                return "slow"
+            return "fast"
+
+        self.assertEqual(asyncio.run(policy.call_async("AirportInfo", attempt)), "fast")
+        self.assertEqual(cancelled, [True])
+
+
+class ClientPolicyTests(unittest.TestCase):
+    def test_unreachable_server_is_retried(self):
+        policy = RequestPolicy(hedge=False, backoff=0)
+        client = Client("user", "key", base_url="http://127.0.0.1:{}/json/FlightXML2/".format(unused_port()), policy=policy)
+        with self.assertRaises(requests.ConnectionError):
+            client.airport_info("KBNA")
+        with self.assertRaises(requests.ConnectionError):
+            client.set_alert(ident="SWA2558")
+        client.close()
+        self.assertEqual(policy.stats()["retries_spent"], 2)
+
+    def test_throttling_does_not_open_the_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=60)
+        scheduler = RateScheduler(rate=1000, cooldown=0)
+        client = Client("user", "key", policy=RequestPolicy(hedge=False, retries=0, breaker=breaker),
+                        scheduler=scheduler, coalesce=False)
+
+        def post(url, data=None, timeout=None):
+            response = requests.Response()
+            response.status_code = 429
+            response.url = url
+            return response
+
+        with mock.patch.object(client.session, "post", post):
+            for _ in range(10):
+                with self.assertRaises(requests.HTTPError):
+                    client.airport_info("KBNA")
+        client.close()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(scheduler.stats()["throttled"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import math
+import random
+import unittest
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:     # optional dependency, simplification and columns fall back to pure Python
+    numpy = None
+
+from benchmarks.stub_server import StubServer
+from flightaware import routes
+from flightaware.client import Client, ResultMode
+from flightaware.pagination import FlightAwareError
+from flightaware.routes import RouteCache, WaypointTable, _project, simplify
+
+
+def route_points(count, seed=5, start=(36.1245, -86.6782), end=(33.6367, -84.4281)):
+    rng = random.Random(seed)
+    points = []
+    for i in range(count):
+        f = i / float(count - 1)
+        points.append({
+            "name": "FIX{}".format(i),
+            "type": "Waypoint",
+            "latitude": start[0] + f * (end[0] - start[0]) + rng.uniform(-0.01, 0.01),
+            "longitude": start[1] + f * (end[1] - start[1]) + rng.uniform(-0.01, 0.01),
+        })
+    return points
+
+
+def segment_distance(xs, ys, first, last, index):
+    x1, y1, x2, y2 = xs[first], ys[first], xs[last], ys[last]
+    dx, dy = x2 - x1, y2 - y1
+    t = max(0.0, min(1.0, ((xs[index] - x1) * dx + (ys[index] - y1) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(xs[index] - (x1 + t * dx), ys[index] - (y1 + t * dy))
+
+
+class SimplifyTests(unittest.TestCase):
+    def setUp(self):
+        points = route_points(200)
+        # a dogleg the simplification must keep
+        points[100]["latitude"] += 1.0
+        self.latitudes = [point["latitude"] for point in points]
+        self.longitudes = [point["longitude"] for point in points]
+
+    def assert_within_tolerance(self):
+        kept = simplify(self.latitudes, self.longitudes, 1.0)
+        self.assertEqual((kept[0], kept[-1]), (0, 199))
+        self.assertIn(100, kept)
+        self.assertLess(len(kept), 50)
+        xs, ys = _project(self.latitudes, self.longitudes)
+        for first, last in zip(kept, kept[1:]):
+            for index in range(first + 1, last):
+                self.assertLessEqual(segment_distance(xs, ys, first, last, index), 1.0)
+
+    def test_tolerance_is_respected(self):
+        self.assert_within_tolerance()
+
+    def test_tolerance_is_respected_without_numpy(self):
+        with mock.patch.object(routes, "numpy", None):
+            self.assert_within_tolerance()
+
+    @unittest.skipUnless(numpy, "requires numpy")
+    def test_numpy_and_pure_python_agree(self):
+        with mock.patch.object(routes, "numpy", None):
+            expected = simplify(self.latitudes, self.longitudes, 1.0)
+        self.assertEqual(simplify(self.latitudes, self.longitudes, 1.0), expected)
+
+    def test_degenerate_input(self):
+        self.assertEqual(simplify([1.0, 2.0], [1.0, 2.0], 1.0), [0, 1])
+        self.assertEqual(simplify(self.latitudes, self.longitudes, None), list(range(200)))
+        self.assertEqual(simplify([1.0, 1.0, 1.0], [1.0, 1.0, 1.0], 1.0), [0, 2])
+
+    def test_antimeridian(self):
+        longitudes = [179.0, 179.5, -180.0, -179.5, -179.0]
+        self.assertEqual(simplify([0.0] * 5, longitudes, 1.0), [0, 4])
+
+
+class WaypointTableTests(unittest.TestCase):
+    def test_shared_points_are_stored_once(self):
+        table = WaypointTable()
+        points = route_points(10)
+        first = table.intern(points)
+        second = table.intern(points[5:] + route_points(3, seed=9))
+        self.assertEqual(len(table), 13)
+        self.assertEqual(list(second[:5]), list(first[5:]))
+        point = table.point(first[3])
+        self.assertEqual(point.name, "FIX3")
+        self.assertAlmostEqual(point.latitude, points[3]["latitude"], places=5)
+
+
+class RouteCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.points = route_points(200)
+
+        def decode_flight_route(params):
+            self.calls.append(params["faFlightID"])
+            if params["faFlightID"] == "BAD":
+                return {"error": "no route"}
+            return {"data": self.points}
+
+        self.server = StubServer({"DecodeFlightRoute": decode_flight_route, "DecodeRoute": {"data": self.points[:50]}}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_routes_are_cached_and_simplified(self):
+        for result_mode in (ResultMode.DICT, ResultMode.RECORDS):
+            client = Client("user", "key", base_url=self.server.base_url, result_mode=result_mode)
+            cache = RouteCache(client, tolerance=1.0)
+            route = cache.flight_route("SWA2558-1")
+            self.assertIs(cache.flight_route("SWA2558-1"), route)
+            self.assertEqual(route.decoded, 200)
+            self.assertLess(len(route), 50)
+            latitudes = route.latitudes()
+            self.assertAlmostEqual(latitudes[0], self.points[0]["latitude"], places=5)
+            self.assertAlmostEqual(latitudes[-1], self.points[-1]["latitude"], places=5)
+            self.assertLessEqual(len(route.simplified(20.0)), len(route))
+            self.assertEqual(len(cache.route("KBNA", "SWA2558", "KATL")), len(cache.route("KBNA", "SWA2558", "KATL")))
+            self.assertEqual(cache.stats()["fetches"], 2)
+            client.close()
+
+    def test_errors_and_lru(self):
+        client = Client("user", "key", base_url=self.server.base_url)
+        cache = RouteCache(client, maxsize=2)
+        with self.assertRaises(FlightAwareError):
+            cache.flight_route("BAD")
+        with self.assertLogs("flightaware.routes", "WARNING"):
+            found = cache.flight_routes(["A", "B", "BAD", "C"])
+        client.close()
+        self.assertEqual(sorted(found), ["A", "B", "C"])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(len(cache.table), 200)
+        self.assertEqual(self.calls.count("BAD"), 2)
+
+    def test_columns_client_is_rejected(self):
+        client = Client("user", "key", base_url=self.server.base_url, result_mode=ResultMode.COLUMNS)
+        with self.assertRaises(ValueError):
+            RouteCache(client)
+        client.close()
+
+    def test_concurrent_fetches_are_coalesced(self):
+        server = StubServer({"DecodeFlightRoute": {"data": self.points}}, latency=0.1).start()
+        client = Client("user", "key", base_url=server.base_url, coalesce=False)
+        cache = RouteCache(client)
+        found = cache.flight_routes(["SWA2558-1"] * 4 + ["DAL1440-1"] * 4)
+        client.close()
+        server.stop()
+        self.assertEqual(sorted(found), ["DAL1440-1", "SWA2558-1"])
+        self.assertEqual(cache.stats()["fetches"], 2)
+        self.assertEqual(cache.stats()["coalesced"] + cache.stats()["hits"], 6)
+
+    def test_columns_without_numpy(self):
+        cache = RouteCache(None)
+        route = cache.add("x", self.points[:5])
+        with mock.patch.object(routes, "numpy", None):
+            latitudes = route.latitudes()
+        self.assertEqual(latitudes.typecode, "d")
+        self.assertEqual([round(value, 5) for value in latitudes], [round(point["latitude"], 5) for point in self.points[:5]])
+
+
+if __name__ == "__main__":
+    unittest.main()
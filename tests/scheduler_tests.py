@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+import unittest
+
+try:
+    import aiohttp
+except ImportError:     # optional dependency, the AsyncClient test is skipped
+    aiohttp = None
+
+from benchmarks.stub_server import StubServer
+from flightaware.async_client import AsyncClient
+from flightaware.client import Client
+from flightaware.scheduler import ContextThreadPoolExecutor, MethodClass, Priority, RateScheduler, _current_priority, is_throttled
+
+
+class RateSchedulerTests(unittest.TestCase):
+    def test_priority_lanes_overtake(self):
+        scheduler = RateScheduler(rate=20, burst=1)
+        scheduler.acquire("AirportInfo")
+        order = []
+
+        def acquire(priority, name):
+            with scheduler.priority(priority):
+                scheduler.acquire("AirportInfo")
+            order.append(name)
+
+        threads = [threading.Thread(target=acquire, args=(Priority.BACKGROUND, "background"))]
+        threads.append(threading.Thread(target=acquire, args=(Priority.INTERACTIVE, "interactive")))
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["interactive", "background"])
+        self.assertEqual(scheduler.stats()["waiting"], 0)
+
+    def test_starved_class_does_not_block_others(self):
+        scheduler = RateScheduler(rate=1000, class_limits={MethodClass.EXPENSIVE: (0.5, 1)})
+        scheduler.acquire("Search")
+        done = []
+        with scheduler.priority(Priority.INTERACTIVE):
+            waiter = threading.Thread(target=lambda: scheduler.acquire("Search") or done.append("Search"))
+            waiter.start()
+            time.sleep(0.05)
+        start = time.monotonic()
+        scheduler.acquire("AirportInfo")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(done, [])
+        waiter.join()
+
+    def test_cancelled_async_wait_gives_up_its_ticket(self):
+        scheduler = RateScheduler(rate=1, burst=1)
+
+        async def run():
+            await scheduler.acquire_async("AirportInfo")
+            waiter = asyncio.ensure_future(scheduler.acquire_async("AirportInfo"))
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(scheduler.stats()["waiting"], 0)
+            await asyncio.wait_for(scheduler.acquire_async("AirportInfo"), 2)
+
+        asyncio.run(run())
+
+    def test_interrupted_acquire_gives_up_its_ticket(self):
+        scheduler = RateScheduler(rate=1, burst=1)
+        scheduler.acquire("AirportInfo")
+
+        def interrupt(timeout=None):
+            raise KeyboardInterrupt
+        scheduler._condition.wait = interrupt
+        with self.assertRaises(KeyboardInterrupt):
+            scheduler.acquire("AirportInfo")
+        self.assertEqual(scheduler.stats()["waiting"], 0)
+
+    def test_throttling_halves_rate_and_recovers(self):
+        scheduler = RateScheduler(rate=10, cooldown=0.2)
+        scheduler.report("AirportInfo", throttled=True)
+        self.assertEqual(scheduler.stats()["rate"], 5)
+        start = time.monotonic()
+        scheduler.acquire("AirportInfo")
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        for _ in range(10):
+            scheduler.report("AirportInfo", throttled=False)
+        self.assertAlmostEqual(scheduler.stats()["rate"], 6)
+        for _ in range(200):
+            scheduler.report("AirportInfo", throttled=False)
+        self.assertEqual(scheduler.stats()["rate"], 10)
+
+    def test_is_throttled(self):
+        self.assertTrue(is_throttled(429))
+        self.assertTrue(is_throttled(200, {"error": "Rate limit exceeded"}))
+        self.assertTrue(is_throttled(200, {"error": "Too many requests"}))
+        self.assertFalse(is_throttled(200, {"error": "unknown airport"}))
+        self.assertFalse(is_throttled(200, {"error": "Result size exceeded"}))
+        self.assertFalse(is_throttled(200, {"error": "Query limit exceeded for this search"}))
+        self.assertFalse(is_throttled(200, [1, 2]))
+
+
+class ContextPropagationTests(unittest.TestCase):
+    def test_worker_threads_keep_priority(self):
+        scheduler = RateScheduler(rate=100)
+        with scheduler.priority(Priority.BACKGROUND):
+            with ContextThreadPoolExecutor(max_workers=2) as executor:
+                seen = list(executor.map(lambda _: _current_priority.get(), range(4)))
+        self.assertEqual(seen, [Priority.BACKGROUND] * 4)
+        self.assertEqual(_current_priority.get(), Priority.NORMAL)
+
+
+class ClientSchedulerTests(unittest.TestCase):
+    def test_throttling_error_is_reported(self):
+        scheduler = RateScheduler(rate=100, cooldown=0)
+        with StubServer({"AirportInfo": {"error": "Too many requests"}}) as server:
+            client = Client("user", "key", base_url=server.base_url, scheduler=scheduler, coalesce=False)
+            client.airport_info("KBNA")
+            client.close()
+        self.assertEqual(scheduler.stats()["throttled"], 1)
+        self.assertEqual(scheduler.stats()["rate"], 50)
+
+    def test_other_errors_keep_the_rate(self):
+        scheduler = RateScheduler(rate=100, cooldown=0)
+        with StubServer({"Search": {"error": "Query limit exceeded for this search"}}) as server:
+            client = Client("user", "key", base_url=server.base_url, scheduler=scheduler, coalesce=False)
+            client.search(query="-destination KBNA")
+            client.close()
+        self.assertEqual(scheduler.stats()["throttled"], 0)
+        self.assertEqual(scheduler.stats()["rate"], 100)
+
+    @unittest.skipUnless(aiohttp, "requires aiohttp")
+    def test_async_throttling_error_is_reported(self):
+        scheduler = RateScheduler(rate=100, cooldown=0)
+
+        async def run(base_url):
+            async with AsyncClient("user", "key", base_url=base_url, scheduler=scheduler, coalesce=False) as client:
+                await client.airport_info("KBNA")
+
+        with StubServer({"AirportInfo": {"error": "Too many requests"}}) as server:
+            asyncio.run(run(server.base_url))
+        self.assertEqual(scheduler.stats()["throttled"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.stub_server import StubServer
+from flightaware.client import Client
+from flightaware.geodesy import distance
+from flightaware.spatial import AirportIndex, airport_points
+
+
+def random_points(count, seed=7):
+    rng = random.Random(seed)
+    return [("A{:04d}".format(i), rng.uniform(-89, 89), rng.uniform(-180, 180)) for i in range(count)]
+
+
+def brute_force(points, lat, lon):
+    return sorted((distance(lat, lon, plat, plon), code) for code, plat, plon in points)
+
+
+class AirportIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.points = random_points(500)
+        self.index = AirportIndex.build(self.points)
+        self.queries = [(36.12, -86.68), (0, 179.9), (0, -179.9), (89.5, 10), (-60, -30)]
+
+    def assert_matches(self, found, expected):
+        self.assertEqual([code for code, _ in found], [code for _, code in expected])
+        for (_, miles), (want, _) in zip(found, expected):
+            self.assertAlmostEqual(miles, want, delta=1e-6)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in self.queries:
+            self.assert_matches(self.index.nearest(lat, lon, k=5), brute_force(self.points, lat, lon)[:5])
+
+    def test_nearest_k_edge_cases(self):
+        self.assertEqual(self.index.nearest(0, 0, k=0), [])
+        self.assertEqual(len(self.index.nearest(0, 0, k=1000)), len(self.points))
+        self.assertEqual(AirportIndex.build([]).nearest(0, 0), [])
+
+    def test_within_matches_brute_force(self):
+        for lat, lon in self.queries:
+            expected = [entry for entry in brute_force(self.points, lat, lon) if entry[0] <= 1500]
+            self.assert_matches(self.index.within(lat, lon, 1500), expected)
+
+    def test_added_airports_are_found_and_merged(self):
+        self.index.rebuild_threshold = 3
+        self.index.add("KNEW", 36.0, -86.0)
+        self.assertEqual(self.index.nearest(36.0, -86.0)[0][0], "KNEW")
+        self.index.add("KNEW", 0.0, 0.0)
+        self.assertAlmostEqual(self.index.distance("KNEW", 36.0, -86.0), 0)
+        self.index.add("KTWO", 10.0, 10.0)
+        self.index.add("KTRE", 20.0, 20.0)
+        self.assertEqual(self.index._extra, [])
+        self.assertEqual(len(self.index), len(self.points) + 3)
+        self.assertEqual(self.index.nearest(20.0, 20.0)[0][0], "KTRE")
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "airports.idx")
+            self.index.add("KNEW", 36.0, -86.0)
+            self.index.save(path)
+            loaded = AirportIndex.load(path)
+            self.assertEqual(len(loaded), len(self.points) + 1)
+            self.assertIn("KNEW", loaded)
+            for lat, lon in self.queries:
+                self.assertEqual(loaded.nearest(lat, lon, k=5), self.index.nearest(lat, lon, k=5))
+            loaded.close()
+            with open(path, "wb") as output:
+                output.write(b"\0" * 64)
+            with self.assertRaises(ValueError):
+                AirportIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_save_over_the_loaded_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "airports.idx")
+            self.index.save(path)
+            loaded = AirportIndex.load(path)
+            loaded.add("KNEW", 36.0, -86.0)
+            loaded.save(path)
+            loaded.close()
+            loaded = AirportIndex.load(path)
+            # nothing new, the arrays saved are the ones mapped from path
+            loaded.save(path)
+            self.assertEqual(loaded.nearest(36.0, -86.0)[0][0], "KNEW")
+            loaded.close()
+            reloaded = AirportIndex.load(path)
+            self.assertEqual(len(reloaded), len(self.points) + 1)
+            self.assertEqual(sorted(os.listdir(directory)), ["airports.idx"])
+            reloaded.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+class FromClientTests(unittest.TestCase):
+    def test_skips_errors_and_missing_positions(self):
+        infos = {
+            "KBNA": {"latitude": 36.1245, "longitude": -86.6782},
+            "KATL": {"latitude": 33.6367, "longitude": -84.4281},
+            "XXXX": {"error": "unknown airport"},
+            "YYYY": {"name": "no position"},
+        }
+        self.assertEqual([code for code, _, _ in airport_points(infos)], ["KBNA", "KATL"])
+
+        with StubServer({"AllAirports": ["KBNA", "KATL", "XXXX"], "AirportInfo": lambda params: infos[params["airportCode"]]}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            index = AirportIndex.from_client(client)
+            client.close()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.nearest(36, -86.6)[0][0], "KBNA")
+
+    def test_refresh_returns_only_added_airports(self):
+        infos = {
+            "KBNA": {"latitude": 36.1245, "longitude": -86.6782},
+            "KATL": {"latitude": 33.6367, "longitude": -84.4281},
+            "XXXX": {"error": "unknown airport"},
+            "YYYY": {"name": "no position"},
+        }
+        index = AirportIndex.build([("KBNA", 36.1245, -86.6782)])
+        with StubServer({"AllAirports": list(infos), "AirportInfo": lambda params: infos[params["airportCode"]]}) as server:
+            client = Client("user", "key", base_url=server.base_url)
+            self.assertEqual(index.refresh(client), ["KATL"])
+            client.close()
+        self.assertEqual(len(index), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
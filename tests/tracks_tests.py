@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.stub_server import StubServer
+from flightaware import tracks
+from flightaware.client import Client
+from flightaware.tracks import TrackStore, fetch_tracks
+
+
+def track(start, count):
+    return [{
+        "timestamp": start + 60 * i,
+        "latitude": 36.12451 - 0.01 * i,
+        "longitude": -86.67821 + 0.02 * i,
+        "altitude": 10 * i,
+        "groundspeed": 250 + i,
+        "altitudeStatus": "",
+        "updateType": "TZ",
+    } for i in range(count)]
+
+
+class TrackStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tracks.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assert_points(self, stored, points):
+        stored = list(stored.points())
+        self.assertEqual(len(stored), len(points))
+        for got, want in zip(stored, points):
+            self.assertEqual(got["timestamp"], want["timestamp"])
+            self.assertAlmostEqual(got["latitude"], want["latitude"], places=5)
+            self.assertAlmostEqual(got["longitude"], want["longitude"], places=5)
+            self.assertEqual((got["altitude"], got["groundspeed"]), (want["altitude"], want["groundspeed"]))
+
+    def test_round_trip_and_reopen(self):
+        first, second = track(1400000000, 50), track(1400003600, 3)
+        with TrackStore(self.path) as store:
+            store.append("SWA2558-1", first)
+            store.append("DAL1440-1", second)
+            store.append("EMPTY-1", [])
+            self.assert_points(store["SWA2558-1"], first)
+            self.assertEqual(len(store["EMPTY-1"]), 0)
+        with TrackStore(self.path) as store:
+            self.assertEqual(sorted(store), ["DAL1440-1", "EMPTY-1", "SWA2558-1"])
+            self.assert_points(store["DAL1440-1"], second)
+            self.assertEqual(list(store["SWA2558-1"].column("altitude")), [10 * i for i in range(50)])
+
+    def test_append_shadows_older_block(self):
+        with TrackStore(self.path) as store:
+            store.append("SWA2558-1", track(1400000000, 5))
+            store.append("SWA2558-1", track(1400000000, 2))
+        with TrackStore(self.path) as store:
+            self.assertEqual(len(store), 1)
+            self.assertEqual(len(store["SWA2558-1"]), 2)
+
+    def test_truncated_tail_is_dropped(self):
+        with TrackStore(self.path) as store:
+            store.append("SWA2558-1", track(1400000000, 5))
+            store.append("DAL1440-1", track(1400000000, 5))
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 7)
+        with self.assertLogs("flightaware.tracks", "WARNING"):
+            store = TrackStore(self.path)
+        self.assertEqual(list(store), ["SWA2558-1"])
+        store.append("DAL1440-1", track(1400000000, 4))
+        self.assertEqual(len(store["DAL1440-1"]), 4)
+        store.close()
+
+    def test_columns_without_numpy(self):
+        points = track(1400000000, 10)
+        with TrackStore(self.path) as store:
+            store.append("SWA2558-1", points)
+            with mock.patch.object(tracks, "numpy", None):
+                self.assertEqual(list(store["SWA2558-1"].column("timestamp")), [point["timestamp"] for point in points])
+
+
+class FetchTracksTests(unittest.TestCase):
+    def test_errors_are_skipped_and_stored_tracks_not_refetched(self):
+        calls = []
+
+        def historical_track(params):
+            calls.append(params["faFlightID"])
+            if params["faFlightID"] == "BAD":
+                return {"error": "no track"}
+            return track(1400000000, 3)
+
+        directory = tempfile.mkdtemp()
+        try:
+            with StubServer({"GetHistoricalTrack": historical_track}) as server, \
+                    TrackStore(os.path.join(directory, "tracks.bin")) as store:
+                client = Client("user", "key", base_url=server.base_url)
+                with self.assertLogs("flightaware.tracks", "WARNING"):
+                    self.assertEqual(sorted(fetch_tracks(client, ["A", "B", "BAD"], store)), ["A", "B"])
+                self.assertEqual(fetch_tracks(client, ["A", "C"], store), ["C"])
+                client.close()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(sorted(calls), ["A", "B", "BAD", "C"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest import mock
+
+from benchmarks.stub_server import StubServer
+from flightaware.client import Client, ResultMode
+from flightaware.watcher import Board, BoardWatcher, ChangeKind, diff_board, flight_key
+
+BOARD_KEYS = {"Arrived": "arrivals", "Enroute": "enroute"}
+
+
+def enroute(ident, filed, actual=0):
+    return {"ident": ident, "filed_departuretime": filed, "actualdeparturetime": actual, "origin": "KBNA",
+            "destination": "KATL", "estimatedarrivaltime": filed + 3600}
+
+
+class FlightKeyTests(unittest.TestCase):
+    def test_key_survives_departure(self):
+        scheduled = enroute("SWA2558", 1400000400)
+        departed = enroute("SWA2558", 1400000400, actual=1400000700)
+        self.assertEqual(flight_key(scheduled), "SWA2558@1400000400")
+        self.assertEqual(flight_key(departed), flight_key(scheduled))
+
+    def test_fallbacks(self):
+        self.assertEqual(flight_key({"faFlightID": "SWA2558-1", "ident": "SWA2558"}), "SWA2558-1")
+        self.assertEqual(flight_key({"ident": "N123", "actualdeparturetime": 5}), "N123@5")
+        self.assertEqual(flight_key({"ident": "N123", "origin": "KBNA"}), "N123@KBNA")
+
+    def test_diff_board(self):
+        previous = {"a": {"v": 1}, "b": {"v": 1}}
+        current = {"b": {"v": 2}, "c": {"v": 1}}
+        changes = sorted(diff_board("KBNA", Board.ARRIVED, previous, current), key=lambda change: change.key)
+        self.assertEqual([(change.kind, change.key) for change in changes],
+                         [(ChangeKind.REMOVED, "a"), (ChangeKind.CHANGED, "b"), (ChangeKind.ADDED, "c")])
+        self.assertEqual((changes[1].previous, changes[1].flight), ({"v": 1}, {"v": 2}))
+        self.assertIsNone(changes[0].flight)
+
+
+class BoardWatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.boards = {"Arrived": {}, "Enroute": {}}
+        self.fail = set()
+
+        def board(method):
+            def result(params):
+                if params["airport"] in self.fail:
+                    return {"error": "NO_DATA unknown airport"}
+                flights = self.boards[method].get(params["airport"], [])
+                offset = int(params.get("offset", 0))
+                end = offset + int(params["howMany"])
+                return {BOARD_KEYS[method]: flights[offset:end], "next_offset": end if end < len(flights) else -1}
+            return result
+
+        self.server = StubServer(dict((method, board(method)) for method in self.boards)).start()
+        self.client = Client("user", "key", base_url=self.server.base_url)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_only_changes_are_emitted(self):
+        self.boards["Enroute"]["KATL"] = [enroute("SWA2558", 1400000400), enroute("DAL1440", 1400003100)]
+        watcher = BoardWatcher(self.client, ["KATL"], boards=(Board.ENROUTE, ), min_interval=10, max_interval=100)
+        self.assertEqual(watcher.poll(now=0), [])
+        self.assertEqual(len(watcher.snapshot("KATL", Board.ENROUTE)), 2)
+
+        self.boards["Enroute"]["KATL"] = [enroute("SWA2558", 1400000400, actual=1400000700), enroute("SWA1702", 1400011400)]
+        self.assertEqual(watcher.poll(now=5), [])
+        changes = watcher.poll(now=10)
+        self.assertEqual(sorted((change.kind, change.key) for change in changes), [
+            (ChangeKind.ADDED, "SWA1702@1400011400"),
+            (ChangeKind.CHANGED, "SWA2558@1400000400"),
+            (ChangeKind.REMOVED, "DAL1440@1400003100"),
+        ])
+        self.assertEqual(watcher.poll(now=20), [])
+
+    def test_emit_initial_and_paging(self):
+        self.boards["Arrived"]["KBNA"] = [enroute("N{}".format(i), 1400000000 + i) for i in range(40)]
+        watcher = BoardWatcher(self.client, ["KBNA"], boards=(Board.ARRIVED, ), page_size=15, emit_initial=True)
+        changes = watcher.poll(now=0)
+        self.assertEqual(len(changes), 40)
+        self.assertTrue(all(change.kind == ChangeKind.ADDED for change in changes))
+
+    def test_quiet_airports_back_off_busy_ones_do_not(self):
+        watcher = BoardWatcher(self.client, ["KBNA", "KATL"], boards=(Board.ARRIVED, ), min_interval=10,
+                               max_interval=100, target_changes=5)
+        now = 0
+        for step in range(12):
+            self.boards["Arrived"]["KATL"] = [enroute("N{}".format(i), step * 100 + i) for i in range(20)]
+            watcher.poll(now=now)
+            now += 10
+        self.assertEqual(watcher.interval("KATL"), 10)
+        self.assertGreater(watcher.interval("KBNA"), 40)
+        self.assertLess(watcher.stats()["board_reads"], 12 + 6)
+        self.assertEqual(watcher.due(now=now), ["KATL"])
+
+    def test_error_keeps_snapshot(self):
+        self.boards["Arrived"]["KBNA"] = [enroute("SWA2558", 1400000400)]
+        watcher = BoardWatcher(self.client, ["KBNA"], boards=(Board.ARRIVED, ), min_interval=10)
+        watcher.poll(now=0)
+        self.fail.add("KBNA")
+        with self.assertLogs("flightaware.watcher", "WARNING"):
+            self.assertEqual(watcher.poll(now=10), [])
+        self.fail.clear()
+        self.assertEqual(len(watcher.snapshot("KBNA", Board.ARRIVED)), 1)
+        self.assertEqual(watcher.stats()["errors"], 1)
+        self.assertEqual(watcher.poll(now=20), [])
+
+    def test_columns_client_is_rejected(self):
+        client = Client("user", "key", base_url=self.server.base_url, result_mode=ResultMode.COLUMNS)
+        with self.assertRaises(ValueError):
+            BoardWatcher(client, ["KBNA"])
+        client.close()
+
+    def test_remove_during_poll(self):
+        self.boards["Arrived"]["KATL"] = [enroute("SWA2558", 1400000400)]
+        watcher = BoardWatcher(self.client, ["KBNA", "KATL"], boards=(Board.ARRIVED, ), emit_initial=True)
+        due = watcher.due
+
+        def due_then_remove(now=None):
+            # another thread removes KBNA after the due airports were taken
+            airports = due(now)
+            watcher.remove("KBNA")
+            return airports
+
+        with mock.patch.object(watcher, "due", due_then_remove):
+            changes = watcher.poll(now=0)
+        self.assertEqual([change.key for change in changes], ["SWA2558@1400000400"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import calendar
+import datetime
+import unittest
+
+from benchmarks.payloads import load_fixtures
+from benchmarks.stub_server import StubServer
+from flightaware.cache import MemoryCache
+from flightaware.client import Client
+from flightaware.pagination import FlightAwareError
+from flightaware.weather import (FlightCategory, WeatherCache, parse_metar, parse_metars, parse_taf, prevailing,
+                                 resolve_day_time)
+
+FIXTURES = load_fixtures()
+
+
+def epoch(*args):
+    return calendar.timegm(datetime.datetime(*args).timetuple())
+
+
+NOW = epoch(2014, 5, 13, 17, 30)
+
+
+class RecordingCache(MemoryCache):
+    def __init__(self):
+        super(RecordingCache, self).__init__()
+        self.ttls = {}
+
+    def set(self, key, value, ttl):
+        self.ttls[key] = ttl
+        super(RecordingCache, self).set(key, value, ttl)
+
+
+class MetarTests(unittest.TestCase):
+    def test_matches_metarex(self):
+        expected = FIXTURES["MetarEx"]["metar"][0]
+        observation = parse_metar(FIXTURES["Metar"], now=NOW)
+        self.assertEqual(observation.time, epoch(2014, 5, 13, 16, 53))
+        for name, value in expected.items():
+            if name != "time":
+                self.assertEqual(getattr(observation, name), value, name)
+        self.assertEqual(observation.flight_category, FlightCategory.VFR)
+        self.assertIsNone(observation.ceiling)
+
+    def test_low_ceiling_and_fractional_visibility(self):
+        observation = parse_metar("METAR KBNA 131653Z AUTO VRB03KT 1 1/2SM R02/2000FT -RA BR BKN004 OVC010 M01/M02 A2992", now=NOW)
+        self.assertIsNone(observation.wind_direction)
+        self.assertEqual(observation.visibility, 1.5)
+        self.assertEqual(observation.ceiling, 400)
+        self.assertEqual(observation.clouds, [("BKN", 400, None), ("OVC", 1000, None)])
+        self.assertEqual(observation.conditions, "-RA BR")
+        self.assertEqual((observation.temp_air, observation.temp_dewpoint), (-1, -2))
+        self.assertEqual(observation.flight_category, FlightCategory.LIFR)
+
+    def test_metric_units(self):
+        observation = parse_metar("EGLL 131650Z 24005MPS 9999 SCT030CB 15/08 Q1013", now=NOW)
+        self.assertEqual(observation.wind_speed, 10)
+        self.assertEqual(observation.visibility, 6.21)
+        self.assertEqual(observation.pressure, 29.91)
+        self.assertEqual(observation.cloud_type, "SCT")
+        self.assertEqual(parse_metar("LFPG 131630Z 27010KT CAVOK 18/09 Q1015", now=NOW).flight_category, FlightCategory.VFR)
+
+    def test_invalid_reports(self):
+        for raw in ("", "12345 131653Z 18006KT", "KBNA 18006KT", "KBNA 131653Z 10SM CLR"):
+            with self.assertRaises(ValueError):
+                parse_metar(raw, now=NOW)
+        self.assertEqual(parse_metars(["garbage", FIXTURES["Metar"]], now=NOW)[0], None)
+
+    def test_day_of_previous_month(self):
+        self.assertEqual(resolve_day_time(31, 23, 50, epoch(2014, 6, 1, 0, 10)), epoch(2014, 5, 31, 23, 50))
+        self.assertEqual(resolve_day_time(1, 0, 0, epoch(2014, 5, 31, 23, 50)), epoch(2014, 6, 1))
+
+
+class TafTests(unittest.TestCase):
+    def test_fixture(self):
+        taf = parse_taf(FIXTURES["Taf"], now=NOW)
+        self.assertEqual((taf.airport, taf.issued), ("KBNA", epoch(2014, 5, 13, 17, 20)))
+        self.assertEqual((taf.valid_from, taf.valid_to), (epoch(2014, 5, 13, 18), epoch(2014, 5, 14, 18)))
+        self.assertEqual([period.change for period in taf.periods], [None, "FM", "TEMPO", "FM"])
+        base, first, tempo, second = taf.periods
+        self.assertEqual(base.end, epoch(2014, 5, 13, 22))
+        self.assertEqual((first.start, first.end), (epoch(2014, 5, 13, 22), epoch(2014, 5, 14, 8)))
+        self.assertEqual((first.wind_speed, first.wind_speed_gust, first.ceiling), (10, 18, 4000))
+        self.assertEqual((tempo.start, tempo.end, tempo.conditions), (epoch(2014, 5, 14, 2), epoch(2014, 5, 14, 6), "TSRA"))
+        self.assertEqual(tempo.flight_category, FlightCategory.MVFR)
+        self.assertEqual((second.end, second.flight_category), (taf.valid_to, FlightCategory.IFR))
+        self.assertIs(prevailing(taf, epoch(2014, 5, 14, 3)), first)
+        self.assertIsNone(prevailing(taf, taf.valid_to))
+
+    def test_validity_across_month_end(self):
+        raw = "TAF KBNA 301720Z 3018/0118 18008KT P6SM SCT050 FM010200 20010KT P6SM BKN040 BECMG 0106/0108 OVC020"
+        taf = parse_taf(raw, now=epoch(2014, 4, 30, 17, 30))
+        self.assertEqual((taf.valid_from, taf.valid_to), (epoch(2014, 4, 30, 18), epoch(2014, 5, 1, 18)))
+        self.assertEqual(taf.periods[1].start, epoch(2014, 5, 1, 2))
+        self.assertEqual((taf.periods[2].start, taf.periods[2].end), (epoch(2014, 5, 1, 6), epoch(2014, 5, 1, 8)))
+        self.assertIsNone(taf.periods[2].wind_speed)
+
+    def test_invalid(self):
+        for raw in ("TAF", "TAF KBNA 131720Z 18008KT", "KBNA 131720Z 1318/1418 TEMPO 4SM"):
+            with self.assertRaises(ValueError):
+                parse_taf(raw, now=NOW)
+
+
+class WeatherCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def answer(method, value):
+            def result(params):
+                self.calls.append((method, params["airport"]))
+                return value if params["airport"] == "KBNA" else {"error": "no report"}
+            return result
+
+        self.server = StubServer({"Metar": answer("Metar", FIXTURES["Metar"]), "Taf": answer("Taf", FIXTURES["Taf"])}).start()
+        self.client = Client("user", "key", base_url=self.server.base_url)
+        self.cache = RecordingCache()
+        self.weather = WeatherCache(self.client, cache=self.cache)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_reports_are_kept_until_the_next_issue(self):
+        self.assertEqual(self.weather.metar("KBNA", now=NOW).wind_speed, 6)
+        self.assertEqual(self.weather.metar("KBNA", now=NOW).flight_category, FlightCategory.VFR)
+        self.assertEqual(self.weather.taf("KBNA", now=NOW).periods[1].change, "FM")
+        self.assertEqual(self.weather.taf("KBNA", now=NOW).valid_to, epoch(2014, 5, 14, 18))
+        self.assertEqual(self.calls, [("Metar", "KBNA"), ("Taf", "KBNA")])
+        # the METAR observed at 16:53 is replaced at 17:53, the TAF valid from 18Z at 00Z, both plus the grace time
+        self.assertEqual(self.cache.ttls, {"metar:KBNA": epoch(2014, 5, 13, 17, 58) - NOW,
+                                           "taf:KBNA": epoch(2014, 5, 14, 0, 5) - NOW})
+
+    def test_ttls(self):
+        self.assertEqual(self.weather._ttl(epoch(2014, 5, 13, 16, 53), 3600, NOW), epoch(2014, 5, 13, 17, 58) - NOW)
+        self.assertEqual(self.weather._ttl(epoch(2014, 5, 13, 10), 3600, NOW), self.weather.min_ttl)
+
+    def test_many_skips_missing_airports(self):
+        with self.assertLogs("flightaware.weather", "WARNING"):
+            observations = self.weather.metars(["KBNA", "XXXX"], now=NOW)
+        self.assertEqual(list(observations), ["KBNA"])
+        self.assertEqual(self.weather.stats()["errors"], 1)
+        with self.assertRaises(FlightAwareError):
+            self.weather.taf("XXXX", now=NOW)
+
+
+if __name__ == "__main__":
+    unittest.main()